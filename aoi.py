@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+AOI - Extract only the part of a flight inside an area of interest
+
+Builds a grid index over the positions of the SRT track, finds the track
+points inside a bounding box or GeoJSON polygon and turns them into frame
+ranges. Only those ranges are decoded (with a seek between them), so decode
+work scales with the part of the flight over the survey area instead of the
+length of the video.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+# Grid cell size in degrees (~100 m of latitude)
+DEFAULT_CELL_SIZE = 0.001
+# Ranges closer than this are merged (seconds); a seek costs about as much
+# as decoding a couple of seconds of video
+DEFAULT_MERGE_GAP = 2.0
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid over a set of points.
+
+    Points are sorted by cell so that every grid row is one contiguous,
+    binary-searchable block; a bounding box query only touches the cells it
+    covers.
+
+    Args:
+        latitudes: Array of latitudes
+        longitudes: Array of longitudes
+        cell_size: Cell size in degrees
+    """
+
+    def __init__(self, latitudes, longitudes, cell_size=DEFAULT_CELL_SIZE):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.cell_size = cell_size
+        if len(self.latitudes) == 0:
+            self._keys = np.zeros(0, dtype=np.int64)
+            self._order = np.zeros(0, dtype=np.int64)
+            return
+        cols = np.floor(self.longitudes / cell_size).astype(np.int64)
+        rows = np.floor(self.latitudes / cell_size).astype(np.int64)
+        self._col0 = int(cols.min())
+        self._row0 = int(rows.min())
+        self._ncols = int(cols.max()) - self._col0 + 1
+        self._nrows = int(rows.max()) - self._row0 + 1
+        keys = (rows - self._row0) * self._ncols + (cols - self._col0)
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def query_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """
+        Return the indices of the points inside a bounding box.
+
+        Returns:
+            Sorted int array of point indices
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64)
+        size = self.cell_size
+        col_lo = max(math.floor(min_lon / size) - self._col0, 0)
+        col_hi = min(math.floor(max_lon / size) - self._col0, self._ncols - 1)
+        row_lo = max(math.floor(min_lat / size) - self._row0, 0)
+        row_hi = min(math.floor(max_lat / size) - self._row0, self._nrows - 1)
+        if col_lo > col_hi or row_lo > row_hi:
+            return np.zeros(0, dtype=np.int64)
+
+        rows = np.arange(row_lo, row_hi + 1, dtype=np.int64) * self._ncols
+        lo = np.searchsorted(self._keys, rows + col_lo, side='left')
+        hi = np.searchsorted(self._keys, rows + col_hi, side='right')
+        if not (hi > lo).any():
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.concatenate(
+            [self._order[a:b] for a, b in zip(lo, hi) if b > a])
+        # Border cells are only partly inside the box
+        lats = self.latitudes[candidates]
+        lons = self.longitudes[candidates]
+        inside = (lats >= min_lat) & (lats <= max_lat) & \
+            (lons >= min_lon) & (lons <= max_lon)
+        return np.sort(candidates[inside])
+
+    def query_polygons(self, polygons):
+        """
+        Return the indices of the points inside any of the polygons.
+
+        Args:
+            polygons: List of polygons, each a list of rings of
+                ``[lon, lat]`` pairs (first ring outside, others holes)
+
+        Returns:
+            Sorted int array of point indices
+        """
+        found = []
+        for rings in polygons:
+            exterior = np.asarray(rings[0], dtype=np.float64)
+            candidates = self.query_bbox(
+                exterior[:, 0].min(), exterior[:, 1].min(),
+                exterior[:, 0].max(), exterior[:, 1].max())
+            if len(candidates) == 0:
+                continue
+            inside = points_in_rings(self.longitudes[candidates],
+                                     self.latitudes[candidates], rings)
+            found.append(candidates[inside])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+
+def points_in_rings(xs, ys, rings):
+    """
+    Even-odd point-in-polygon test, vectorized over the points.
+
+    Holes work because a point inside a hole crosses both the exterior and
+    the hole ring.
+
+    Args:
+        xs: Array of x (longitude) values
+        ys: Array of y (latitude) values
+        rings: List of rings of ``[x, y]`` pairs
+
+    Returns:
+        Boolean array, True for points inside
+    """
+    inside = np.zeros(len(xs), dtype=bool)
+    for ring in rings:
+        ring = np.asarray(ring, dtype=np.float64)
+        x1, y1 = ring[:, 0], ring[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        for ax, ay, bx, by in zip(x1, y1, x2, y2):
+            if ay == by:
+                continue
+            crosses = (ay > ys) != (by > ys)
+            x_cross = ax + (ys - ay) * (bx - ax) / (by - ay)
+            inside ^= crosses & (xs < x_cross)
+    return inside
+
+
+def bbox_polygon(min_lon, min_lat, max_lon, max_lat):
+    """Return a bounding box as a polygon (list with one ring)."""
+    ring = [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat],
+            [min_lon, max_lat], [min_lon, min_lat]]
+    return [ring]
+
+
+def load_polygons(path):
+    """
+    Read the polygons of a GeoJSON file.
+
+    Accepts a Polygon or MultiPolygon geometry, a Feature or a
+    FeatureCollection; other geometry types are ignored.
+
+    Args:
+        path: Path to GeoJSON file
+
+    Returns:
+        List of polygons (see GridIndex.query_polygons)
+
+    Raises:
+        ValueError: If the file contains no polygon
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    polygons = []
+
+    def collect(obj):
+        kind = obj.get('type')
+        if kind == 'FeatureCollection':
+            for feature in obj.get('features', []):
+                collect(feature)
+        elif kind == 'Feature':
+            if obj.get('geometry'):
+                collect(obj['geometry'])
+        elif kind == 'GeometryCollection':
+            for geometry in obj.get('geometries', []):
+                collect(geometry)
+        elif kind == 'Polygon':
+            polygons.append(obj['coordinates'])
+        elif kind == 'MultiPolygon':
+            polygons.extend(obj['coordinates'])
+
+    collect(data)
+    if not polygons:
+        raise ValueError(f"No polygon found in {path}")
+    return polygons
+
+
+def track_arrays(frames_data):
+    """
+    Convert parsed SRT frames to time-sorted NumPy arrays.
+
+    Args:
+        frames_data: List of frame dictionaries from parse_srt_file
+
+    Returns:
+        (times, latitudes, longitudes) arrays; times in seconds
+    """
+    from srt_tag import srt_time_to_seconds
+
+    times = np.array([srt_time_to_seconds(f['timestamp'])
+                      for f in frames_data], dtype=np.float64)
+    order = np.argsort(times, kind='stable')
+    lats = np.array([f['latitude'] for f in frames_data], dtype=np.float64)
+    lons = np.array([f['longitude'] for f in frames_data], dtype=np.float64)
+    return times[order], lats[order], lons[order]
+
+
+def time_ranges(times, inside, merge_gap=DEFAULT_MERGE_GAP, padding=0.0):
+    """
+    Turn the track points inside the AOI into time ranges.
+
+    Each point covers the time until the next point. Runs of inside points
+    become ranges, which are padded and merged when closer than merge_gap.
+
+    Args:
+        times: Sorted point times in seconds
+        inside: Sorted indices of the points inside the AOI
+        merge_gap: Merge ranges separated by less than this (seconds)
+        padding: Seconds added before and after every range
+
+    Returns:
+        List of (start, end) times in seconds
+    """
+    if len(inside) == 0:
+        return []
+    inside = np.asarray(inside)
+    step = float(np.median(np.diff(times))) if len(times) > 1 else 0.0
+    ends = np.append(times[1:], times[-1] + step)
+
+    breaks = np.flatnonzero(np.diff(inside) > 1)
+    firsts = np.concatenate([[inside[0]], inside[breaks + 1]])
+    lasts = np.concatenate([inside[breaks], [inside[-1]]])
+
+    ranges = []
+    for first, last in zip(firsts, lasts):
+        start = max(times[first] - padding, 0.0)
+        end = ends[last] + padding
+        if ranges and start - ranges[-1][1] < merge_gap:
+            ranges[-1] = (ranges[-1][0], max(end, ranges[-1][1]))
+        else:
+            ranges.append((start, end))
+    return [(float(start), float(end)) for start, end in ranges]
+
+
+def frame_ranges(ranges, fps, interval, base_frame=0, pts_index=None):
+    """
+    Convert time ranges to extraction frame ranges on one interval grid.
+
+    Frames are named and located with the extractor's convention (frame
+    ``n`` is at ``n / fps``, or at its PTS index time). Every range starts
+    on the grid ``base_frame + k * interval``, so the frames saved inside the
+    AOI are the same ones a full extraction from ``base_frame`` would save.
+
+    Args:
+        ranges: List of (start, end) times in seconds
+        fps: Video frame rate
+        interval: Extraction interval in frames
+        base_frame: Start frame of the equivalent full extraction
+        pts_index: Optional PtsIndex for variable frame rate video
+
+    Returns:
+        List of (start_frame, end_frame) for FrameExtractionJob
+    """
+    result = []
+    for start, end in ranges:
+        # Frames whose time is in [start, end); the tolerance absorbs the
+        # millisecond rounding of SRT times
+        if pts_index is None:
+            first = max(math.ceil(start * fps - 1e-6), 1)
+            last = math.ceil(end * fps - 1e-6) - 1
+        else:
+            first = pts_index.first_frame_at(start) + 1
+            last = pts_index.first_frame_at(end)
+        if last < first:
+            continue
+        steps = (first - 1 - base_frame) // interval
+        grid_start = base_frame + max(steps, 0) * interval
+        if result and grid_start <= result[-1][1]:
+            result[-1] = (result[-1][0], max(last, result[-1][1]))
+        else:
+            result.append((grid_start, last))
+    return result
+
+
+def plan_aoi(frames_data, polygons, fps, interval, base_frame=0,
+             pts_index=None, merge_gap=DEFAULT_MERGE_GAP, padding=0.0,
+             cell_size=DEFAULT_CELL_SIZE):
+    """
+    Compute the frame ranges of a flight that lie inside an AOI.
+
+    Args:
+        frames_data: List of frame dictionaries from parse_srt_file
+        polygons: AOI polygons (see load_polygons and bbox_polygon)
+        fps: Video frame rate
+        interval: Extraction interval in frames
+        base_frame: Start frame of the equivalent full extraction
+        pts_index: Optional PtsIndex for variable frame rate video
+        merge_gap: Merge ranges separated by less than this (seconds)
+        padding: Seconds added around every range
+        cell_size: Grid cell size in degrees
+
+    Returns:
+        Dict with ``ranges`` (frame ranges), ``time_ranges``, ``points``
+        (track points) and ``inside`` (points inside the AOI)
+    """
+    times, lats, lons = track_arrays(frames_data)
+    index = GridIndex(lats, lons, cell_size)
+    inside = index.query_polygons(polygons)
+    seconds = time_ranges(times, inside, merge_gap, padding)
+    return {'ranges': frame_ranges(seconds, fps, interval, base_frame,
+                                   pts_index),
+            'time_ranges': seconds, 'points': len(times),
+            'inside': len(inside)}
+
+
+def cli_polygons(bbox, polygon_path):
+    """Return the AOI polygons of the command line, or exit on errors."""
+    if bbox:
+        try:
+            min_lon, min_lat, max_lon, max_lat = (
+                float(value) for value in bbox.split(','))
+        except ValueError:
+            print(f"Error: Invalid bounding box: {bbox}")
+            sys.exit(1)
+        return [bbox_polygon(min_lon, min_lat, max_lon, max_lat)]
+    try:
+        return load_polygons(polygon_path)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+def main():
+    import frame_decoders
+
+    parser = argparse.ArgumentParser(
+        description='Extract only the frames of a flight inside an area of '
+                    'interest',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python aoi.py DJI_0123.MP4 -s DJI_0123.SRT -o frames/ \\
+      --bbox=-3.71,40.41,-3.69,40.42 -f 1
+  python aoi.py DJI_0123.MP4 -s DJI_0123.SRT -o frames.zip \\
+      --polygon parcela.geojson --padding 2
+  python aoi.py DJI_0123.MP4 -s DJI_0123.SRT --polygon parcela.geojson \\
+      --profile full=frames/ --profile preview=previews/,size=1920 \\
+      --profile thumb=thumbs.zip,size=320,quality=80
+  python aoi.py DJI_0123.MP4 -s DJI_0123.SRT -o frames/ \\
+      --bbox=-3.71,40.41,-3.69,40.42 --camera mini3.json
+  python aoi.py DJI_0123.MP4 -s DJI_0123.SRT -o frames/ \\
+      --polygon parcela.geojson --cache
+        """
+    )
+    parser.add_argument('video', help='Video file')
+    parser.add_argument('-s', '--srt', required=True,
+                        help='SRT file with the flight track')
+    parser.add_argument('-o', '--output',
+                        help='Output folder or .zip/.tar archive')
+    parser.add_argument('--profile', action='append', default=[],
+                        help='Extra output written from the same decode: '
+                             'name=output[,size=PX][,encoder=NAME]'
+                             '[,preset=NAME][,quality=Q] (repeatable)')
+    area = parser.add_mutually_exclusive_group(required=True)
+    area.add_argument('--bbox',
+                      help='Bounding box: min_lon,min_lat,max_lon,max_lat')
+    area.add_argument('--polygon', help='GeoJSON file with the AOI polygon')
+    parser.add_argument('-f', '--fps-extracted', type=float, default=1.0,
+                        help='Frames saved per second (default: 1)')
+    parser.add_argument('--padding', type=float, default=0.0,
+                        help='Seconds extracted before and after each pass '
+                             'over the AOI (default: 0)')
+    parser.add_argument('--merge-gap', type=float, default=DEFAULT_MERGE_GAP,
+                        help='Merge passes closer than this many seconds '
+                             f'(default: {DEFAULT_MERGE_GAP})')
+    parser.add_argument('--camera',
+                        help='Camera JSON (intrinsics and distortion); '
+                             'frames are undistorted before encoding')
+    parser.add_argument('--decoder', default=frame_decoders.DEFAULT_DECODER,
+                        choices=list(frame_decoders.DECODERS),
+                        help='Decoder backend (default: '
+                             f'{frame_decoders.DEFAULT_DECODER})')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse frames saved by earlier runs from the '
+                             'frame cache and add the new ones to it')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only print the ranges that would be extracted')
+    args = parser.parse_args()
+
+    import output_profiles
+
+    try:
+        profiles = output_profiles.cli_profiles(args.output, args.profile)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for path in (args.video, args.srt, args.polygon, args.camera):
+        if path and not os.path.isfile(path):
+            print(f"Error: File not found: {path}")
+            sys.exit(1)
+    if args.fps_extracted <= 0:
+        print(f"Error: Extracted FPS must be greater than 0, got "
+              f"{args.fps_extracted}")
+        sys.exit(1)
+
+    polygons = cli_polygons(args.bbox, args.polygon)
+
+    import frame_extraction
+    import srt_tag
+    import video_probe
+
+    frames_data = srt_tag.parse_srt_parallel(args.srt)
+    if not frames_data:
+        print("Error: No GPS data found in SRT file")
+        sys.exit(1)
+    info = video_probe.probe_video(args.video)
+    interval = max(1, int(round(info['fps'] / args.fps_extracted)))
+
+    plan = plan_aoi(frames_data, polygons, info['fps'], interval,
+                    merge_gap=args.merge_gap, padding=args.padding)
+    covered = sum(end - start for start, end in plan['ranges'])
+    print(f"{plan['inside']}/{plan['points']} track points inside the AOI, "
+          f"{len(plan['ranges'])} range(s), {covered}/{info['frame_count']} "
+          f"frames to decode")
+    for start, end in plan['time_ranges']:
+        print(f"  {start:.2f}s - {end:.2f}s")
+    if args.dry_run or not plan['ranges']:
+        return
+
+    undistorter = None
+    if args.camera:
+        import undistort
+
+        try:
+            undistorter = undistort.load_camera(args.camera)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    cache = None
+    if args.cache:
+        import frame_cache
+        cache = frame_cache.FrameCache()
+    output_profiles.make_output_dirs(profiles)
+    job = frame_extraction.FrameExtractionJob(
+        args.video, None, 0, 0, interval, info['fps'],
+        track=srt_tag.time_lookup(frames_data), ranges=plan['ranges'],
+        profiles=profiles, undistort=undistorter, cache=cache,
+        decoder=args.decoder)
+    result = job.run()
+    print(f"Extracted {result['extracted']} geotagged frames "
+          f"({result['cached']} from the cache) to "
+          f"{', '.join(result['outputs'].values())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,632 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Measure the cost of the frame extraction pipeline stages
+
+Runs each stage on frames from a real video (--video) or on synthetic frames
+and prints a small report, so settings can be compared on the same input.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+
+def synthetic_frames(count, width, height):
+    """
+    Generate synthetic BGR frames with texture similar to aerial footage.
+
+    Args:
+        count: Number of frames
+        width: Frame width in pixels
+        height: Frame height in pixels
+
+    Returns:
+        List of NumPy arrays
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    frames = []
+    for i in range(count):
+        base = ((x + 4 * i) % 256 + y % 256) // 2
+        noise = rng.integers(0, 48, (height, width), dtype=np.int32)
+        channel = ((base + noise) % 256).astype(np.uint8)
+        frames.append(np.dstack([channel, channel[::-1], channel[:, ::-1]]))
+    return frames
+
+
+def video_frames(video_path, count):
+    """
+    Read up to ``count`` frames from the start of a video.
+
+    Args:
+        video_path: Path to video file
+        count: Maximum number of frames
+
+    Returns:
+        List of NumPy arrays
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def bench_encoders(frames):
+    """
+    Encode the frames with every encoder and preset.
+
+    Args:
+        frames: List of BGR frames
+
+    Returns:
+        List of (label, ms per frame, bytes per frame) tuples
+    """
+    import frame_encoders
+
+    results = []
+    for name in frame_encoders.ENCODERS:
+        for preset in frame_encoders.PRESET_NAMES:
+            encoder = frame_encoders.get_encoder(name, preset)
+            encoder.encode(frames[0])  # warm-up
+            total_bytes = 0
+            start = time.perf_counter()
+            for frame in frames:
+                total_bytes += len(encoder.encode(frame))
+            elapsed = time.perf_counter() - start
+            results.append((encoder.describe(),
+                            elapsed * 1000 / len(frames),
+                            total_bytes / len(frames)))
+    return results
+
+
+def bench_exif(count):
+    """
+    Compare per-frame GPS EXIF generation with piexif and exif_gps.
+
+    Args:
+        count: Number of random positions
+
+    Returns:
+        List of (method, us per frame, max position error in mm) tuples
+    """
+    import numpy as np
+    import piexif
+    import exif_gps
+
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(-80, 80, count)
+    lons = rng.uniform(-180, 180, count)
+    alts = rng.uniform(0, 500, count)
+
+    def legacy_dms(value):
+        d = int(value)
+        m = int((value - d) * 60)
+        s = (value - d - m / 60) * 3600
+        return ((d, 1), (m, 1), (int(s * 100), 100))
+
+    def error_mm(values, dms_list):
+        decoded = np.array([exif_gps.dms_to_degrees(d) for d in dms_list])
+        # One degree of latitude is about 111 km
+        return float(np.max(np.abs(np.abs(values) - decoded))) * 111e6
+
+    start = time.perf_counter()
+    for lat, lon, alt in zip(lats, lons, alts):
+        piexif.dump({"0th": {}, "Exif": {}, "1st": {}, "thumbnail": None,
+                     "GPS": {
+                         piexif.GPSIFD.GPSVersionID: (2, 0, 0, 0),
+                         piexif.GPSIFD.GPSLatitudeRef: 'N',
+                         piexif.GPSIFD.GPSLatitude: legacy_dms(abs(lat)),
+                         piexif.GPSIFD.GPSLongitudeRef: 'E',
+                         piexif.GPSIFD.GPSLongitude: legacy_dms(abs(lon)),
+                         piexif.GPSIFD.GPSAltitudeRef: 0,
+                         piexif.GPSIFD.GPSAltitude: (int(alt * 100), 100)}})
+    piexif_us = (time.perf_counter() - start) * 1e6 / count
+    legacy_error = error_mm(lats, [legacy_dms(abs(v)) for v in lats])
+
+    template = exif_gps.GpsExifTemplate()
+    start = time.perf_counter()
+    for lat, lon, alt in zip(lats.tolist(), lons.tolist(), alts.tolist()):
+        template.build(lat, lon, alt)
+    build_us = (time.perf_counter() - start) * 1e6 / count
+
+    start = time.perf_counter()
+    template.build_batch(lats, lons, alts)
+    batch_us = (time.perf_counter() - start) * 1e6 / count
+    new_error = error_mm(lats, [exif_gps.to_dms(v) for v in lats])
+
+    return [('piexif.dump', piexif_us, legacy_error),
+            ('GpsExifTemplate.build', build_us, new_error),
+            ('GpsExifTemplate.build_batch', batch_us, new_error)]
+
+
+def bench_extraction(video_path, output, interval, workers):
+    """
+    Run a full extraction job and measure time, memory and page faults.
+
+    Args:
+        video_path: Path to video file
+        output: Output folder or archive path
+        interval: Frame interval
+        workers: Number of encoder threads
+
+    Returns:
+        Dict with ``frames``, ``seconds``, ``max_rss_mb`` and
+        ``page_faults`` (None where the platform has no ``resource``)
+    """
+    import cv2
+    import frame_extraction
+
+    try:
+        import resource
+    except ImportError:  # Windows
+        resource = None
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    job = frame_extraction.FrameExtractionJob(
+        video_path, output, 0, total, interval, fps, workers=workers)
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt \
+        if resource else None
+    start = time.perf_counter()
+    result = job.run()
+    elapsed = time.perf_counter() - start
+
+    stats = {'frames': result['extracted'], 'seconds': elapsed,
+             'max_rss_mb': None, 'page_faults': None}
+    if resource:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        stats['page_faults'] = usage.ru_minflt - faults
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        stats['max_rss_mb'] = usage.ru_maxrss / scale
+    return stats
+
+
+def bench_decoders(video_path, interval):
+    """
+    Decode the frames an extraction would save with every decoder backend.
+
+    Each backend runs over the whole video with the frame interval, and in
+    keyframe-only mode. Frames are retrieved but not encoded.
+
+    Args:
+        video_path: Path to video file
+        interval: Frame interval
+
+    Returns:
+        List of (label, frames, seconds) tuples; frames and seconds are None
+        when the backend cannot run (no ffmpeg or ffprobe installed)
+    """
+    import frame_decoders
+    import video_probe
+
+    info = video_probe.probe_video(video_path)
+    ranges = [(0, info['frame_count'])]
+
+    def never():
+        return False
+
+    results = []
+    for name in frame_decoders.DECODERS:
+        for keyframes in (False, True):
+            label = f"{name} keyframes" if keyframes else name
+            start = time.perf_counter()
+            frames = 0
+            try:
+                with frame_decoders.get_decoder(name)(
+                        video_path, info['fps']) as decoder:
+                    if keyframes:
+                        selected = decoder.select_keyframes(
+                            frame_decoders.keyframe_numbers(video_path),
+                            never)
+                    else:
+                        selected = decoder.select(ranges, interval, never)
+                    for _ in selected:
+                        ok, _ = decoder.retrieve()
+                        frames += ok
+            except (OSError, ValueError):
+                results.append((label, None, None))
+                continue
+            results.append((label, frames, time.perf_counter() - start))
+    return results
+
+
+def _checksum(frame):
+    # Reads a sample of the frame, as a consumer would
+    return int(frame[::16, ::16].sum())
+
+
+def _queue_consumer(frames, results):
+    results.put('ready')
+    total = 0
+    while True:
+        frame = frames.get()
+        if frame is None:
+            break
+        total += _checksum(frame)
+    results.put(total)
+
+
+def _ring_consumer(ring, results):
+    results.put('ready')
+    total = 0
+    while True:
+        item = ring.get()
+        if item is None:
+            break
+        total += _checksum(ring.frame(item[0]))
+        ring.release(item[0])
+    ring.close()
+    results.put(total)
+
+
+def write_synthetic_srt(path, blocks):
+    """Write a DJI-style SRT file with one telemetry block per frame."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(blocks):
+            ms = i * 1000 // 30
+            start = (f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:"
+                     f"{ms // 1000 % 60:02d},{ms % 1000:03d}")
+            f.write(f"{i + 1}\n{start} --> {start}\n"
+                    f"<font size=\"28\">FrameCnt: {i + 1}, DiffTime: 33ms\n"
+                    f"[iso: 100] [shutter: 1/640.0] [fnum: 2.8] [ev: 0] "
+                    f"[latitude: {40.0 + i * 1e-6:.6f}] "
+                    f"[longitude: {-3.0 - i * 1e-6:.6f}] "
+                    f"[rel_alt: 50.000 abs_alt: 700.000]"
+                    f"[altitude: {100 + i % 500 * 0.1:.1f}] </font>\n\n")
+
+
+def bench_srt(srt_path, worker_counts):
+    """
+    Compare parse_srt_file with the chunked parallel parser.
+
+    Args:
+        srt_path: SRT file to parse
+        worker_counts: Process counts to try
+
+    Returns:
+        List of (label, seconds, same frames as parse_srt_file) tuples
+    """
+    import srt_tag
+
+    start = time.perf_counter()
+    expected = srt_tag.parse_srt_file(srt_path)
+    results = [('parse_srt_file', time.perf_counter() - start, True)]
+    for workers in worker_counts:
+        start = time.perf_counter()
+        frames = srt_tag.parse_srt_parallel(srt_path, workers, min_bytes=0)
+        results.append((f'parallel, {workers} processes',
+                        time.perf_counter() - start, frames == expected))
+    return results
+
+
+def bench_handoff(frames, consumers, slots=8):
+    """
+    Send frames to consumer processes through a queue and through a ring.
+
+    The queue pickles every frame; the shared memory ring only sends slot
+    numbers. Consumers read a sample of every frame and return a checksum.
+
+    Args:
+        frames: List of frames
+        consumers: Number of consumer processes
+        slots: Ring slots
+
+    Returns:
+        List of (label, seconds, checksum matches) tuples
+    """
+    import multiprocessing
+
+    import shm_ring
+
+    context = multiprocessing.get_context('spawn')
+    expected = sum(_checksum(frame) for frame in frames)
+    count = len(frames) * 4
+    expected *= 4
+    results = []
+    for label in ('queue (pickle)', 'shared memory ring'):
+        done = context.Queue()
+        ring = None
+        if label == 'queue (pickle)':
+            channel = context.Queue(maxsize=slots)
+            target, arg = _queue_consumer, channel
+        else:
+            ring = shm_ring.SharedFrameRing(slots, frames[0].shape,
+                                            frames[0].dtype, context)
+            target, arg = _ring_consumer, ring
+        processes = [context.Process(target=target, args=(arg, done))
+                     for _ in range(consumers)]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            done.get()
+        start = time.perf_counter()
+        for i in range(count):
+            frame = frames[i % len(frames)]
+            if ring is None:
+                channel.put(frame)
+            else:
+                # The decoder would write straight into the slot
+                slot = ring.acquire()
+                ring.frame(slot)[...] = frame
+                ring.publish(slot, i)
+        if ring is None:
+            for _ in processes:
+                channel.put(None)
+        else:
+            ring.finish(len(processes))
+        total = sum(done.get() for _ in processes)
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+        if ring is not None:
+            ring.unlink()
+        results.append((label, elapsed, total == expected))
+    return results
+
+
+def startup_targets(exe=None):
+    """
+    Return the launches measured by the startup benchmark.
+
+    Args:
+        exe: Optional packaged executable (one-file or one-folder build)
+
+    Returns:
+        List of (label, argv) tuples
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    main_script = os.path.join(here, 'extractor_main.py')
+    targets = [
+        ('python: headless command', [sys.executable, main_script, 'tag',
+                                      '--help']),
+        ('python: GUI modules', [sys.executable, '-c',
+                                 'import video_frame_extractor']),
+        ('python: eager imports (reference)',
+         [sys.executable, '-c', 'import cv2, numpy, piexif, tkinter']),
+    ]
+    if exe:
+        targets.append(('executable: headless command', [exe, 'tag',
+                                                         '--help']))
+    return targets
+
+
+def bench_startup(targets, runs):
+    """
+    Measure cold and warm startup time of each launch.
+
+    The cold run is the first one with an empty bytecode cache (a fresh
+    PYTHONPYCACHEPREFIX), so every module is compiled again; the OS file
+    cache is left alone. Warm time is the median of the following runs.
+
+    Args:
+        targets: List of (label, argv) tuples (see startup_targets)
+        runs: Number of warm runs
+
+    Returns:
+        List of (label, cold ms, warm ms) tuples
+    """
+    import statistics
+    import subprocess
+    import tempfile
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for label, argv in targets:
+        with tempfile.TemporaryDirectory() as pycache:
+            env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache)
+            times = []
+            for _ in range(runs + 1):
+                start = time.perf_counter()
+                subprocess.run(argv, cwd=here, env=env, check=True,
+                               stdout=subprocess.DEVNULL)
+                times.append((time.perf_counter() - start) * 1000)
+        results.append((label, times[0], statistics.median(times[1:])))
+    return results
+
+
+def print_table(headers, rows):
+    """Print rows as a fixed-width table."""
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows))
+              for i, h in enumerate(headers)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)).rstrip())
+    print('  '.join('-' * w for w in widths))
+    for row in rows:
+        print('  '.join(str(c).ljust(w) for c, w in zip(row, widths)).rstrip())
+
+
+def load_frames(args):
+    """Load the benchmark input selected on the command line."""
+    if args.video:
+        frames = video_frames(args.video, args.frames)
+        if not frames:
+            print(f"Error: Could not read frames from {args.video}")
+            sys.exit(1)
+        return frames
+    return synthetic_frames(args.frames, args.width, args.height)
+
+
+def cmd_encoders(args):
+    frames = load_frames(args)
+    height, width = frames[0].shape[:2]
+    print(f"Encoding {len(frames)} frames of {width}x{height}\n")
+    rows = [(label, f"{ms:.2f}", f"{size:.0f}")
+            for label, ms, size in bench_encoders(frames)]
+    print_table(('encoder', 'encode ms/frame', 'bytes/frame'), rows)
+
+
+def cmd_exif(args):
+    print(f"Building GPS EXIF for {args.count} positions\n")
+    rows = [(method, f"{us:.2f}", f"{err:.1f}")
+            for method, us, err in bench_exif(args.count)]
+    print_table(('method', 'us/frame', 'max error mm'), rows)
+
+
+def cmd_extract(args):
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        stats = bench_extraction(args.video, tmpdir, args.interval,
+                                 args.workers)
+    print(f"Frames saved:      {stats['frames']}")
+    print(f"Time:              {stats['seconds']:.2f}s "
+          f"({stats['frames'] / stats['seconds']:.1f} frames/s)")
+    if stats['max_rss_mb'] is not None:
+        print(f"Peak RSS:          {stats['max_rss_mb']:.0f} MB")
+        print(f"Minor page faults: {stats['page_faults']}")
+
+
+def cmd_decoders(args):
+    print(f"Decoding every {args.interval}th frame of {args.video}\n")
+    rows = []
+    for label, frames, seconds in bench_decoders(args.video, args.interval):
+        if frames is None:
+            rows.append((label, '-', '-', 'not available'))
+        else:
+            rows.append((label, frames, f"{seconds:.2f}",
+                         f"{frames / seconds:.1f}" if seconds else '-'))
+    print_table(('decoder', 'frames', 'seconds', 'frames/s'), rows)
+
+
+def cmd_handoff(args):
+    frames = load_frames(args)
+    height, width = frames[0].shape[:2]
+    count = len(frames) * 4
+    print(f"Handing {count} frames of {width}x{height} to "
+          f"{args.consumers} process(es)\n")
+    rows = [(label, f"{seconds:.2f}", f"{count / seconds:.1f}",
+             'ok' if ok else 'MISMATCH')
+            for label, seconds, ok in bench_handoff(frames, args.consumers)]
+    print_table(('handoff', 'seconds', 'frames/s', 'checksum'), rows)
+
+
+def cmd_srt(args):
+    import tempfile
+
+    srt_path = args.srt
+    if srt_path is None:
+        handle, srt_path = tempfile.mkstemp(suffix='.SRT')
+        os.close(handle)
+        write_synthetic_srt(srt_path, args.blocks)
+    try:
+        size = os.path.getsize(srt_path) / 1e6
+        print(f"Parsing {srt_path} ({size:.0f} MB)\n")
+        counts = sorted({n for n in (2, 4, 8, os.cpu_count() or 1)
+                         if n <= (os.cpu_count() or 1) and n > 1})
+        rows = [(label, f"{seconds:.2f}", f"{size / seconds:.0f}",
+                 'ok' if same else 'MISMATCH')
+                for label, seconds, same in bench_srt(srt_path, counts)]
+        print_table(('parser', 'seconds', 'MB/s', 'frames'), rows)
+    finally:
+        if args.srt is None:
+            os.remove(srt_path)
+
+
+def cmd_startup(args):
+    print(f"Startup time, cold run and median of {args.runs} warm runs\n")
+    rows = [(label, f"{cold:.0f}", f"{warm:.0f}")
+            for label, cold, warm in bench_startup(
+                startup_targets(args.exe), args.runs)]
+    print_table(('launch', 'cold ms', 'warm ms'), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the frame extraction pipeline stages',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python benchmark.py encoders
+  python benchmark.py encoders --video DJI_0123.MP4 --frames 50
+  python benchmark.py exif --count 100000
+  python benchmark.py extract --video DJI_0123.MP4 --interval 30
+  python benchmark.py decoders --video DJI_0123.MP4 --interval 30
+  python benchmark.py handoff --width 3840 --height 2160 --consumers 3
+  python benchmark.py srt --srt day.SRT
+  python benchmark.py startup --exe dist/VideoFrameExtractor/vfe.exe
+        """
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    encoders = subparsers.add_parser(
+        'encoders', help='Encode time and size per encoder preset')
+    encoders.add_argument('--video', help='Video to take frames from')
+    encoders.add_argument('--frames', type=int, default=20,
+                          help='Number of frames to encode (default: 20)')
+    encoders.add_argument('--width', type=int, default=1920,
+                          help='Synthetic frame width (default: 1920)')
+    encoders.add_argument('--height', type=int, default=1080,
+                          help='Synthetic frame height (default: 1080)')
+    encoders.set_defaults(func=cmd_encoders)
+
+    exif = subparsers.add_parser(
+        'exif', help='GPS EXIF generation time and coordinate precision')
+    exif.add_argument('--count', type=int, default=10000,
+                      help='Number of positions (default: 10000)')
+    exif.set_defaults(func=cmd_exif)
+
+    extract = subparsers.add_parser(
+        'extract', help='Full extraction: time, peak memory, page faults')
+    extract.add_argument('--video', required=True, help='Video to extract')
+    extract.add_argument('--interval', type=int, default=30,
+                         help='Save one frame every N frames (default: 30)')
+    extract.add_argument('--workers', type=int, default=None,
+                         help='Encoder threads (default: up to 4)')
+    extract.set_defaults(func=cmd_extract)
+
+    decoders = subparsers.add_parser(
+        'decoders', help='Decode speed of every decoder backend')
+    decoders.add_argument('--video', required=True, help='Video to decode')
+    decoders.add_argument('--interval', type=int, default=30,
+                          help='Decode one frame every N frames '
+                               '(default: 30)')
+    decoders.set_defaults(func=cmd_decoders)
+
+    handoff = subparsers.add_parser(
+        'handoff', help='Frame handoff to other processes: queue vs ring')
+    handoff.add_argument('--video', help='Video to take frames from')
+    handoff.add_argument('--frames', type=int, default=10,
+                         help='Distinct frames, each sent 4 times '
+                              '(default: 10)')
+    handoff.add_argument('--width', type=int, default=3840,
+                         help='Synthetic frame width (default: 3840)')
+    handoff.add_argument('--height', type=int, default=2160,
+                         help='Synthetic frame height (default: 2160)')
+    handoff.add_argument('--consumers', type=int, default=2,
+                         help='Consumer processes (default: 2)')
+    handoff.set_defaults(func=cmd_handoff)
+
+    srt = subparsers.add_parser(
+        'srt', help='SRT parse time, single process vs parallel chunks')
+    srt.add_argument('--srt', help='SRT file to parse (default: synthetic)')
+    srt.add_argument('--blocks', type=int, default=300000,
+                     help='Blocks of the synthetic file (default: 300000)')
+    srt.set_defaults(func=cmd_srt)
+
+    startup = subparsers.add_parser(
+        'startup', help='Cold and warm startup time of the entry points')
+    startup.add_argument('--runs', type=int, default=5,
+                         help='Warm runs per launch (default: 5)')
+    startup.add_argument('--exe',
+                         help='Also time a packaged executable')
+    startup.set_defaults(func=cmd_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+EXIF GPS - Minimal EXIF writer for GPS position and time
+
+Serializes a GPS-only EXIF block once as a template and patches the
+coordinate, altitude and time rationals in place for every frame, which is
+much cheaper than building and dumping a full piexif dictionary. Degrees are
+converted to degree/minute/second rationals in integer arithmetic, over whole
+NumPy arrays at once, with a fine seconds denominator (1/10000 of an arc
+second is about 3 mm on the ground instead of about 30 cm for 1/100).
+
+The blocks start with the ``Exif\\0\\0`` header, like ``piexif.dump``, so
+they can be passed straight to the frame encoders or to ``piexif.insert``.
+"""
+
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+
+SECONDS_DENOMINATOR = 10000
+ALTITUDE_DENOMINATOR = 1000
+TIME_DENOMINATOR = 1000
+
+EXIF_HEADER = b'Exif\x00\x00'
+
+# TIFF field types
+_BYTE = 1
+_ASCII = 2
+_LONG = 4
+_RATIONAL = 5
+
+_GPS_INFO_TAG = 0x8825
+
+
+def dms_rationals(values, seconds_denominator=SECONDS_DENOMINATOR):
+    """
+    Convert decimal degrees to degree/minute/second rationals.
+
+    The sign is ignored (it goes into the N/S or E/W reference). Rounding
+    happens once on the total number of second fractions, so minutes and
+    seconds never overflow to 60.
+
+    Args:
+        values: Scalar or array of decimal degrees
+        seconds_denominator: Denominator of the seconds rational
+
+    Returns:
+        int64 array of shape (..., 6) holding
+        ``d, 1, m, 1, s_numerator, seconds_denominator``
+    """
+    values = np.abs(np.asarray(values, dtype=np.float64))
+    total = np.rint(values * (3600 * seconds_denominator)).astype(np.int64)
+    degrees, rest = np.divmod(total, 3600 * seconds_denominator)
+    minutes, seconds = np.divmod(rest, 60 * seconds_denominator)
+    ones = np.ones_like(degrees)
+    return np.stack([degrees, ones, minutes, ones, seconds,
+                     np.full_like(degrees, seconds_denominator)], axis=-1)
+
+
+def _dms_scalar(value, seconds_denominator):
+    # Same integer arithmetic as dms_rationals, without NumPy call overhead
+    total = int(round(abs(value) * 3600 * seconds_denominator))
+    degrees, rest = divmod(total, 3600 * seconds_denominator)
+    minutes, seconds = divmod(rest, 60 * seconds_denominator)
+    return degrees, 1, minutes, 1, seconds, seconds_denominator
+
+
+def to_dms(value, seconds_denominator=SECONDS_DENOMINATOR):
+    """
+    Convert one coordinate to piexif-style ``((d, 1), (m, 1), (s, den))``.
+
+    Args:
+        value: Decimal degrees
+        seconds_denominator: Denominator of the seconds rational
+
+    Returns:
+        Tuple of three (numerator, denominator) tuples
+    """
+    r = _dms_scalar(value, seconds_denominator)
+    return ((r[0], r[1]), (r[2], r[3]), (r[4], r[5]))
+
+
+def dms_to_degrees(dms):
+    """Convert ``((d, 1), (m, 1), (s, den))`` rationals back to degrees."""
+    (d, dd), (m, md), (s, sd) = dms
+    return d / dd + m / md / 60 + s / sd / 3600
+
+
+class GpsExifTemplate:
+    """
+    Prebuilt GPS EXIF block with patchable position and time fields.
+
+    Args:
+        altitude: Include GPSAltitudeRef/GPSAltitude
+        timestamp: Include GPSTimeStamp/GPSDateStamp (UTC)
+        seconds_denominator: Denominator of the DMS seconds rationals
+    """
+
+    def __init__(self, altitude=True, timestamp=False,
+                 seconds_denominator=SECONDS_DENOMINATOR):
+        self.altitude = altitude
+        self.timestamp = timestamp
+        self.seconds_denominator = seconds_denominator
+
+        entries = [
+            (0x0000, _BYTE, 4, bytes([2, 0, 0, 0]), None),
+            (0x0001, _ASCII, 2, b'N\x00', 'lat_ref'),
+            (0x0002, _RATIONAL, 3, bytes(24), 'lat'),
+            (0x0003, _ASCII, 2, b'E\x00', 'lon_ref'),
+            (0x0004, _RATIONAL, 3, bytes(24), 'lon'),
+        ]
+        if altitude:
+            entries += [
+                (0x0005, _BYTE, 1, b'\x00', 'alt_ref'),
+                (0x0006, _RATIONAL, 1, bytes(8), 'alt'),
+            ]
+        if timestamp:
+            entries += [
+                (0x0007, _RATIONAL, 3, bytes(24), 'time'),
+                (0x001D, _ASCII, 11, b'1970:01:01\x00', 'date'),
+            ]
+        self._template, self._offsets = self._serialize(entries)
+
+    @staticmethod
+    def _serialize(entries):
+        # Layout: Exif header, TIFF header, IFD0 with a single GPSInfo
+        # pointer, then the GPS IFD followed by its out-of-line values.
+        # Offsets inside the TIFF structure are relative to the TIFF header.
+        base = len(EXIF_HEADER)
+        ifd0_size = 2 + 12 + 4
+        gps_ifd = 8 + ifd0_size
+        data_pos = gps_ifd + 2 + 12 * len(entries) + 4
+
+        tiff = bytearray(b'MM\x00\x2a' + struct.pack('>I', 8))
+        tiff += struct.pack('>HHHII', 1, _GPS_INFO_TAG, _LONG, 1, gps_ifd)
+        tiff += struct.pack('>I', 0)
+        tiff += struct.pack('>H', len(entries))
+
+        offsets = {}
+        data_area = bytearray()
+        for tag, field_type, count, value, key in entries:
+            tiff += struct.pack('>HHI', tag, field_type, count)
+            if len(value) <= 4:
+                position = len(tiff)
+                tiff += value.ljust(4, b'\x00')
+            else:
+                position = data_pos + len(data_area)
+                tiff += struct.pack('>I', position)
+                data_area += value
+            if key:
+                offsets[key] = base + position
+        tiff += struct.pack('>I', 0)
+        tiff += data_area
+        return EXIF_HEADER + bytes(tiff), offsets
+
+    def build(self, latitude, longitude, altitude=None, when=None):
+        """
+        Build the EXIF block for one position.
+
+        Args:
+            latitude: Latitude in decimal degrees
+            longitude: Longitude in decimal degrees
+            altitude: Altitude in meters (used if the template has altitude)
+            when: datetime or UNIX timestamp (used if the template has time)
+
+        Returns:
+            EXIF bytes starting with the ``Exif\\0\\0`` header
+        """
+        data = bytearray(self._template)
+        offsets = self._offsets
+        den = self.seconds_denominator
+        data[offsets['lat_ref']] = ord('N' if latitude >= 0 else 'S')
+        struct.pack_into('>6I', data, offsets['lat'],
+                         *_dms_scalar(latitude, den))
+        data[offsets['lon_ref']] = ord('E' if longitude >= 0 else 'W')
+        struct.pack_into('>6I', data, offsets['lon'],
+                         *_dms_scalar(longitude, den))
+
+        if self.altitude and altitude is not None:
+            data[offsets['alt_ref']] = 0 if altitude >= 0 else 1
+            struct.pack_into(
+                '>2I', data, offsets['alt'],
+                int(round(abs(altitude) * ALTITUDE_DENOMINATOR)),
+                ALTITUDE_DENOMINATOR)
+
+        if self.timestamp and when is not None:
+            if isinstance(when, datetime):
+                when = when.timestamp()
+            self._patch_time(data, when)
+        return bytes(data)
+
+    def _patch_time(self, data, when):
+        moment = datetime.fromtimestamp(when, timezone.utc)
+        millis = min(int(round((when % 60) * TIME_DENOMINATOR)),
+                     60 * TIME_DENOMINATOR - 1)
+        struct.pack_into('>6I', data, self._offsets['time'],
+                         moment.hour, 1, moment.minute, 1,
+                         millis, TIME_DENOMINATOR)
+        date = moment.strftime('%Y:%m:%d').encode('ascii')
+        data[self._offsets['date']:self._offsets['date'] + 10] = date
+
+    def build_batch(self, latitudes, longitudes, altitudes=None, times=None):
+        """
+        Build EXIF blocks for many positions at once.
+
+        The coordinate conversion and patching run as NumPy array operations
+        over all rows; only the final split into bytes objects is per frame.
+
+        Args:
+            latitudes: Array of latitudes in decimal degrees
+            longitudes: Array of longitudes in decimal degrees
+            altitudes: Optional array of altitudes in meters
+            times: Optional array of UNIX timestamps
+
+        Returns:
+            List of EXIF byte strings, one per position
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        count = len(latitudes)
+        blocks = np.tile(np.frombuffer(self._template, dtype=np.uint8),
+                         (count, 1))
+        offsets = self._offsets
+        den = self.seconds_denominator
+
+        def put(key, values):
+            raw = np.ascontiguousarray(values, dtype='>u4').view(np.uint8)
+            raw = raw.reshape(count, -1)
+            blocks[:, offsets[key]:offsets[key] + raw.shape[1]] = raw
+
+        blocks[:, offsets['lat_ref']] = np.where(
+            latitudes >= 0, ord('N'), ord('S'))
+        put('lat', dms_rationals(latitudes, den))
+        blocks[:, offsets['lon_ref']] = np.where(
+            longitudes >= 0, ord('E'), ord('W'))
+        put('lon', dms_rationals(longitudes, den))
+
+        if self.altitude and altitudes is not None:
+            altitudes = np.asarray(altitudes, dtype=np.float64)
+            blocks[:, offsets['alt_ref']] = np.where(altitudes >= 0, 0, 1)
+            put('alt', np.stack([
+                np.rint(np.abs(altitudes) * ALTITUDE_DENOMINATOR),
+                np.full(count, ALTITUDE_DENOMINATOR)], axis=-1))
+
+        blocks = [row.tobytes() for row in blocks]
+        if self.timestamp and times is not None:
+            for i, when in enumerate(times):
+                data = bytearray(blocks[i])
+                self._patch_time(data, float(when))
+                blocks[i] = bytes(data)
+        return blocks
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Extractor Main - Entry point of the packaged executables
+
+Without arguments it opens the GUI. With a command name as first argument
+it runs that command-line tool instead, so the same build can be scripted:
+
+    VideoFrameExtractor tag -s DJI_0123.SRT -d frames/ -p 30 -x jpg -f 1
+    VideoFrameExtractor serve --port 8765
+
+Nothing heavy is imported here: the headless tools never load tkinter, and
+each tool imports OpenCV, NumPy or piexif only on the paths that use them.
+"""
+
+import importlib
+import multiprocessing
+import sys
+
+# Command name -> module with a main() function
+COMMANDS = {
+    'tag': 'srt_tag',
+    'concat': 'srt_concat',
+    'aoi': 'aoi',
+    'ingest': 'ingest_daemon',
+    'serve': 'job_server',
+    'shard': 'shard_extract',
+    'bench': 'benchmark',
+}
+
+
+def usage():
+    """Return the help text listing the commands."""
+    lines = ['usage: VideoFrameExtractor [COMMAND [ARGS...]]', '',
+             'Without a command the graphical interface is opened.', '',
+             'Commands:']
+    lines += [f'  {name:<8} {module}.py' for name, module in COMMANDS.items()]
+    lines += ['', 'Run "VideoFrameExtractor COMMAND --help" for the options '
+              'of a command.']
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """
+    Run the GUI or the command named in ``argv``.
+
+    Args:
+        argv: Arguments without the program name (default: sys.argv[1:])
+    """
+    # In a frozen build, the worker processes of the parallel tools start
+    # this executable again; this runs their task and exits before any
+    # argument is parsed as a command
+    multiprocessing.freeze_support()
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv:
+        import video_frame_extractor
+        video_frame_extractor.main()
+        return
+    if argv[0] in ('-h', '--help'):
+        print(usage())
+        return
+    if argv[0] not in COMMANDS:
+        print(f"Error: Unknown command '{argv[0]}'\n")
+        print(usage())
+        sys.exit(1)
+
+    module = importlib.import_module(COMMANDS[argv[0]])
+    # The tools read their options from sys.argv
+    sys.argv = [f'VideoFrameExtractor {argv[0]}'] + argv[1:]
+    module.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Flight Track - Flight path of an SRT file, decimated for drawing
+
+A DJI SRT file holds one position per video frame, so a long flight has
+100k+ points; drawing all of them on a Tk canvas takes seconds and every
+resize would redraw them. The track is projected to metres once and every
+point gets its Douglas-Peucker significance: the largest tolerance at which
+the simplification still keeps it. Any level of detail is then a single
+comparison over the array, and a view picks the tolerance matching one
+screen pixel every time it is redrawn.
+
+Loading (parsing and significance) is the slow part and is meant to run off
+the UI thread; decimate and CanvasTransform are cheap enough for redraws.
+"""
+
+import math
+
+import numpy as np
+
+# Mean Earth radius in metres
+EARTH_RADIUS = 6371008.8
+# Smallest tolerance computed, relative to the size of the track: segments
+# flatter than this are not subdivided further (GPS noise on a hovering
+# drone would otherwise cost a subdivision per point)
+MIN_TOLERANCE_RATIO = 1e-4
+
+
+def project(latitudes, longitudes):
+    """
+    Project positions to metres on a plane around their mean position.
+
+    Equirectangular projection, accurate enough for the extent of a flight.
+
+    Returns:
+        (x, y) arrays in metres, x east and y north
+    """
+    lat0 = float(np.mean(latitudes))
+    lon0 = float(np.mean(longitudes))
+    parallel_radius = math.cos(math.radians(lat0)) * EARTH_RADIUS
+    x = np.radians(longitudes - lon0) * parallel_radius
+    y = np.radians(latitudes - lat0) * EARTH_RADIUS
+    return x, y
+
+
+def significance(x, y, min_tolerance=0.0):
+    """
+    Compute the Douglas-Peucker significance of every point.
+
+    Simplifying with tolerance ``t`` keeps exactly the points whose
+    significance is at least ``t``. The end points are always kept.
+
+    Args:
+        x, y: Point coordinates
+        min_tolerance: Segments whose farthest point is closer than this
+            are not subdivided; their inner points get significance 0
+
+    Returns:
+        Float array, ``inf`` for the end points
+    """
+    count = len(x)
+    result = np.zeros(count, dtype=np.float64)
+    if count == 0:
+        return result
+    result[0] = result[-1] = np.inf
+    # Iterative to avoid recursion limits on long tracks
+    stack = [(0, count - 1, np.inf)]
+    while stack:
+        first, last, parent = stack.pop()
+        if last - first < 2:
+            continue
+        dx = x[last] - x[first]
+        dy = y[last] - y[first]
+        px = x[first + 1:last] - x[first]
+        py = y[first + 1:last] - y[first]
+        length = math.hypot(dx, dy)
+        if length > 0:
+            distances = np.abs(px * dy - py * dx) / length
+        else:
+            # Closed segment (the drone came back): distance to the point
+            distances = np.hypot(px, py)
+        farthest = int(np.argmax(distances))
+        distance = float(distances[farthest])
+        if distance < min_tolerance:
+            continue
+        middle = first + 1 + farthest
+        # A point is only reached when its parent segment was split, so it
+        # can never be more significant than the parent
+        result[middle] = min(distance, parent)
+        stack.append((first, middle, result[middle]))
+        stack.append((middle, last, result[middle]))
+    return result
+
+
+class FlightTrack:
+    """
+    Flight path with times, projected coordinates and significances.
+
+    Args:
+        times: Point times in seconds from the start of the video, sorted
+        latitudes: Point latitudes
+        longitudes: Point longitudes
+    """
+
+    def __init__(self, times, latitudes, longitudes):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        if len(self.times) == 0:
+            raise ValueError("Track has no points")
+        self.x, self.y = project(self.latitudes, self.longitudes)
+        min_x, min_y, max_x, max_y = self.bounds()
+        self.significance = significance(
+            self.x, self.y,
+            max(max_x - min_x, max_y - min_y) * MIN_TOLERANCE_RATIO)
+
+    @classmethod
+    def from_srt(cls, srt_path):
+        """
+        Load the track of an SRT file.
+
+        Raises:
+            ValueError: If the file has no GPS positions
+        """
+        import aoi
+        import srt_tag
+
+        frames_data = srt_tag.parse_srt_file(srt_path)
+        if not frames_data:
+            raise ValueError(f"No GPS data in {srt_path}")
+        return cls(*aoi.track_arrays(frames_data))
+
+    def __len__(self):
+        return len(self.times)
+
+    def bounds(self):
+        """Return ``(min_x, min_y, max_x, max_y)`` in metres."""
+        return (float(self.x.min()), float(self.y.min()),
+                float(self.x.max()), float(self.y.max()))
+
+    def decimate(self, tolerance, first=0, last=None):
+        """
+        Return the indices of the points kept at a tolerance.
+
+        Args:
+            tolerance: Largest allowed deviation from the full track, in
+                metres
+            first, last: Optional index range; both ends are always kept
+
+        Returns:
+            Sorted integer array
+        """
+        last = len(self) - 1 if last is None else last
+        indices = first + np.flatnonzero(
+            self.significance[first:last + 1] >= tolerance)
+        return np.union1d(indices, [first, last])
+
+    def index_at(self, seconds):
+        """Return the index of the last point at or before a time."""
+        index = int(np.searchsorted(self.times, seconds, side='right')) - 1
+        return min(max(index, 0), len(self) - 1)
+
+    def nearest(self, x, y):
+        """Return the index of the point closest to ``(x, y)`` in metres."""
+        return int(np.argmin((self.x - x) ** 2 + (self.y - y) ** 2))
+
+
+class CanvasTransform:
+    """
+    Maps a track onto a canvas of a given size, keeping its aspect ratio.
+
+    Args:
+        track: FlightTrack
+        width, height: Canvas size in pixels
+        margin: Empty border in pixels
+    """
+
+    def __init__(self, track, width, height, margin=10):
+        min_x, min_y, max_x, max_y = track.bounds()
+        span_x = max(max_x - min_x, 1e-9)
+        span_y = max(max_y - min_y, 1e-9)
+        usable_x = max(width - 2 * margin, 1)
+        usable_y = max(height - 2 * margin, 1)
+        self.track = track
+        self.scale = min(usable_x / span_x, usable_y / span_y)
+        # Centre the track; canvas y grows downwards
+        self.offset_x = (width - span_x * self.scale) / 2 - min_x * self.scale
+        self.offset_y = (height + span_y * self.scale) / 2 + min_y * self.scale
+
+    @property
+    def tolerance(self):
+        """Half a pixel in metres: decimation invisible at this scale."""
+        return 0.5 / self.scale
+
+    def coords(self, indices):
+        """Return the flat ``[x0, y0, x1, y1...]`` canvas coordinates."""
+        points = np.empty((len(indices), 2))
+        points[:, 0] = self.track.x[indices] * self.scale + self.offset_x
+        points[:, 1] = self.offset_y - self.track.y[indices] * self.scale
+        return points.ravel().tolist()
+
+    def to_track(self, canvas_x, canvas_y):
+        """Return the track coordinates in metres of a canvas point."""
+        return ((canvas_x - self.offset_x) / self.scale,
+                (self.offset_y - canvas_y) / self.scale)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Frame Cache - Content-addressed store of encoded frames
+
+Extraction is often rerun on the same video with a slightly different time
+range or frame interval. The cache keeps every encoded frame under a key
+made of the video content, the frame number, the transform (size,
+undistortion), the encoder settings and the EXIF block, so a rerun finds
+the frames it already produced, links them into the new output and decodes
+only the rest.
+
+Entries are files named after their key, indexed in SQLite with their size
+and last use; once the cache grows past its size limit the least recently
+used entries are deleted. Entries are read-only: outputs get hard links to
+them where the file system allows it, and a tool that rewrote an output
+file in place would otherwise change the cached copy too.
+
+The cache lives in ``~/.cache/video_to_photo_gps/frames``; set the
+``FRAME_CACHE`` environment variable to use another folder.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import stat
+import threading
+import time
+
+CACHE_ENV = 'FRAME_CACHE'
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+# Bytes hashed at each end of a video for its fingerprint
+FINGERPRINT_BYTES = 1024 * 1024
+INDEX_NAME = 'index.sqlite'
+
+
+def _make_writable(path):
+    # Windows refuses to delete or replace a read-only file
+    try:
+        os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+    except FileNotFoundError:
+        pass
+
+
+def default_cache_dir():
+    """Return the frame cache folder (honours FRAME_CACHE)."""
+    if os.environ.get(CACHE_ENV):
+        return os.environ[CACHE_ENV]
+    return os.path.join(os.path.expanduser('~'), '.cache',
+                        'video_to_photo_gps', 'frames')
+
+
+def video_fingerprint(video_path):
+    """
+    Identify a video by its content without reading all of it.
+
+    The size and the first and last megabyte are hashed, so a copy of the
+    same clip in another folder shares its cached frames.
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha1()
+    size = os.path.getsize(video_path)
+    digest.update(str(size).encode('ascii'))
+    with open(video_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+            digest.update(f.read(FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+
+def frame_key(video, frame_number, settings, exif=None):
+    """
+    Build the cache key of one encoded frame.
+
+    Args:
+        video: Video fingerprint (see video_fingerprint)
+        frame_number: Frame number in the video
+        settings: String describing the transform and encoder settings
+        exif: EXIF bytes embedded in the frame, or None
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha1()
+    digest.update(f'{video}\0{frame_number}\0{settings}\0'.encode('utf-8'))
+    digest.update(exif or b'')
+    return digest.hexdigest()
+
+
+class FrameCache:
+    """
+    Size-bounded LRU store of encoded frames.
+
+    Every call opens its own short-lived SQLite connection, so one cache can
+    be used from the encoder threads and from several processes.
+
+    Args:
+        path: Cache folder (default: default_cache_dir())
+        max_bytes: Size above which least recently used entries are evicted
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS frames ('
+                'key TEXT PRIMARY KEY, size INTEGER, last_used REAL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS frames_last_used '
+                         'ON frames (last_used)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A connection used as a context manager only commits; close it too
+        conn = sqlite3.connect(os.path.join(self.path, INDEX_NAME),
+                               timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def entry_path(self, key):
+        """Return the file of a cache entry."""
+        return os.path.join(self.path, key[:2], key)
+
+    def get_many(self, keys):
+        """
+        Look up several entries at once and mark them as used.
+
+        Returns:
+            Dict mapping every key found to its file
+        """
+        keys = list(keys)
+        found = {}
+        with self._connect() as conn:
+            # SQLite limits the number of parameters of one statement
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key FROM frames WHERE key IN "
+                    f"({','.join('?' * len(chunk))})", chunk).fetchall()
+                for (key,) in rows:
+                    path = self.entry_path(key)
+                    if os.path.exists(path):
+                        found[key] = path
+            now = time.time()
+            conn.executemany('UPDATE frames SET last_used = ? WHERE key = ?',
+                             [(now, key) for key in found])
+        return found
+
+    def put(self, key, data):
+        """Store the bytes of an encoded frame."""
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+        _make_writable(path)
+        os.replace(tmp_path, path)
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO frames VALUES (?, ?, ?)',
+                         (key, len(data), time.time()))
+
+    def size(self):
+        """Return the total size of the entries in bytes."""
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM frames').fetchone()[0]
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits max_bytes.
+
+        Returns:
+            Number of entries deleted
+        """
+        with self._connect() as conn:
+            total = conn.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM frames').fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            deleted = []
+            for key, size in conn.execute(
+                    'SELECT key, size FROM frames ORDER BY last_used').fetchall():
+                if total <= self.max_bytes:
+                    break
+                path = self.entry_path(key)
+                try:
+                    _make_writable(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # Still open on Windows; left for a later eviction
+                    continue
+                deleted.append(key)
+                total -= size
+            conn.executemany('DELETE FROM frames WHERE key = ?',
+                             [(key,) for key in deleted])
+        return len(deleted)
+
+
+def settings_key(profile, undistort=None):
+    """
+    Describe everything besides the frame that decides an output file.
+
+    Args:
+        profile: OutputProfile (size and encoder)
+        undistort: Optional Undistorter
+
+    Returns:
+        String for frame_key
+    """
+    encoder = profile.encoder
+    parts = {'size': profile.max_size, 'encoder': encoder.name,
+             'options': encoder.options}
+    if undistort is not None:
+        parts['undistort'] = undistort.fingerprint()
+    # default=str covers option values JSON has no type for
+    return json.dumps(parts, sort_keys=True, default=str)
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Frame Decoders - Interchangeable video decoding backends
+
+A decoder walks the frames an extraction selects and hands out their pixels
+on request. Frame numbers follow OpenCV's position after reading a frame
+(frame number ``n`` is the 0-based frame ``n - 1``), whatever the backend.
+
+Backends:
+    opencv  cv2.VideoCapture; frames that are not saved are only grabbed
+    ffmpeg  An ffmpeg process per decode range writing raw BGR frames to a
+            pipe. ffmpeg decodes with several threads and its ``select``
+            filter drops the frames that are not saved before they are
+            converted or copied, so Python only sees the saved ones.
+
+Both can also decode keyframes only (see ``select_keyframes``): the OpenCV
+backend seeks from keyframe to keyframe, which decodes nothing else, and
+the ffmpeg backend tells the decoder to skip every non-key frame
+(``-skip_frame nokey``).
+
+OpenCV and NumPy are imported by the backends that use them, so the GUI can
+list the backends without loading either.
+"""
+
+import subprocess
+
+# Between ranges closer than this many frames it is cheaper to keep
+# decoding than to seek (a seek decodes from the previous keyframe)
+SEEK_GAP = 60
+# The ffmpeg keyframe decoder keeps running across up to this many unwanted
+# keyframes instead of starting a new process
+KEYFRAME_GAP = 8
+
+
+def frame_time(frame_index, fps, pts_index=None):
+    """Return the time in seconds of a 0-based frame index."""
+    if pts_index is not None and frame_index < len(pts_index):
+        return float(pts_index.times[frame_index])
+    return frame_index / fps
+
+
+def keyframe_numbers(video_path, pts_index=None):
+    """
+    Return the frame numbers of the keyframes of a video.
+
+    Keyframes come from the PTS index when it has them, otherwise from the
+    video probe (ffprobe).
+
+    Raises:
+        ValueError: If the keyframe positions are unknown (no ffprobe)
+    """
+    if pts_index is not None and pts_index.keyframes.any():
+        return [int(i) + 1 for i in pts_index.keyframes.nonzero()[0]]
+    import video_probe
+
+    keyframes = video_probe.probe_video(video_path)['keyframes']
+    if not keyframes:
+        raise ValueError(f"Keyframe positions of {video_path} are unknown "
+                         f"(ffprobe is required)")
+    return [index + 1 for index in keyframes]
+
+
+class FrameDecoder:
+    """
+    Base class for decoders.
+
+    ``select`` and ``select_keyframes`` yield frame numbers; right after a
+    number is yielded, ``retrieve`` returns the pixels of that frame.
+    Decoders are context managers.
+
+    Args:
+        video_path: Path to the video file
+        fps: Video frame rate
+        pts_index: Optional PtsIndex giving the real time of every frame
+    """
+
+    name = None
+
+    def __init__(self, video_path, fps, pts_index=None):
+        self.video_path = video_path
+        self.fps = fps
+        self.pts_index = pts_index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def select(self, ranges, interval, should_stop):
+        """
+        Yield every ``interval``-th frame number of each range.
+
+        Args:
+            ranges: Sorted list of ``(start_frame, end_frame)``; frames
+                ``start_frame + interval``, ``start_frame + 2 * interval``...
+                up to ``end_frame`` are selected
+            interval: Frame interval
+            should_stop: Callable returning True to stop decoding
+        """
+        raise NotImplementedError
+
+    def select_keyframes(self, frames, should_stop):
+        """
+        Yield the given keyframe numbers, decoding only keyframes.
+
+        Args:
+            frames: Sorted frame numbers, all of them keyframes
+            should_stop: Callable returning True to stop decoding
+        """
+        raise NotImplementedError
+
+    def retrieve(self, buffer=None):
+        """
+        Return ``(ok, frame)`` for the frame number last yielded.
+
+        Args:
+            buffer: Optional array of the frame's shape to decode into
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the decoder."""
+
+
+class OpenCVDecoder(FrameDecoder):
+    """Decoding with cv2.VideoCapture."""
+
+    name = 'opencv'
+
+    def __init__(self, video_path, fps, pts_index=None):
+        import cv2
+
+        super().__init__(video_path, fps, pts_index)
+        self._cv2 = cv2
+        self._cap = cv2.VideoCapture(video_path)
+
+    def _seek(self, start_frame):
+        # Returns the index of the next frame to be grabbed, or None when it
+        # has to be identified from the timestamp of the first grabbed frame
+        cv2 = self._cv2
+        if self.pts_index is None:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            return int(self._cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if start_frame >= len(self.pts_index):
+            return start_frame
+        # OpenCV converts frame seeks to time with the average frame rate,
+        # which is wrong for VFR video; seek to the frame's real time instead
+        self._cap.set(cv2.CAP_PROP_POS_MSEC,
+                      self.pts_index.times[start_frame] * 1000.0)
+        return None
+
+    def select(self, ranges, interval, should_stop):
+        # Frames that are not saved are only grabbed: they are decoded but
+        # never converted or copied out of the capture. The position is
+        # counted here instead of querying the capture for every frame.
+        next_index = None
+        for start_frame, end_frame in ranges:
+            # After a range, next_index is also the number of the last
+            # grabbed frame, which may already belong to this range
+            if next_index is None or next_index > start_frame + 1 or \
+                    start_frame - next_index > SEEK_GAP:
+                next_index = self._seek(start_frame)
+            elif start_frame < next_index <= end_frame and \
+                    (next_index - start_frame) % interval == 0:
+                yield next_index
+
+            while True:
+                if should_stop() or not self._cap.grab():
+                    return
+
+                if next_index is None:
+                    next_index = self.pts_index.nearest_frame(
+                        self._cap.get(self._cv2.CAP_PROP_POS_MSEC) / 1000.0)
+                current_frame = next_index + 1
+                next_index += 1
+
+                if current_frame > end_frame:
+                    break
+
+                if current_frame <= start_frame:
+                    continue
+
+                if (current_frame - start_frame) % interval == 0:
+                    yield current_frame
+
+    def select_keyframes(self, frames, should_stop):
+        # A seek lands on the previous keyframe and decodes forward to the
+        # target, so seeking to a keyframe decodes that frame alone
+        for frame_number in frames:
+            if should_stop():
+                return
+            self._seek(frame_number - 1)
+            if not self._cap.grab():
+                return
+            yield frame_number
+
+    def retrieve(self, buffer=None):
+        return self._cap.retrieve(buffer)
+
+    def close(self):
+        self._cap.release()
+
+
+class FfmpegDecoder(FrameDecoder):
+    """
+    Decoding in an ffmpeg subprocess, frames read from a pipe.
+
+    Args:
+        video_path, fps, pts_index: See FrameDecoder
+        threads: ffmpeg decoder threads (0: one per core)
+        executable: Command starting ffmpeg, as a string or a list
+            (default: ``ffmpeg`` on the PATH)
+        size: Optional ``(width, height)`` of the frames (default: probed)
+    """
+
+    name = 'ffmpeg'
+
+    def __init__(self, video_path, fps, pts_index=None, threads=0,
+                 executable=None, size=None):
+        super().__init__(video_path, fps, pts_index)
+        self.threads = threads
+        if executable is None:
+            executable = ['ffmpeg']
+        elif isinstance(executable, str):
+            executable = [executable]
+        self.executable = list(executable)
+        if size is None:
+            import video_probe
+
+            info = video_probe.probe_video(video_path)
+            size = (info['width'], info['height'])
+        self.width, self.height = size
+        self._process = None
+        self._pending = False
+        self._frame = None
+        self._scratch = None
+
+    def _seek_time(self, frame_index):
+        # Half a frame before the frame, so that it is the first one kept
+        # by the exact seek whatever the rounding of the timestamps
+        if frame_index <= 0:
+            return 0.0
+        before = frame_time(frame_index - 1, self.fps, self.pts_index)
+        return (before + frame_time(frame_index, self.fps,
+                                    self.pts_index)) / 2
+
+    def _start(self, frame_index, count, select=None, keyframes=False):
+        self._stop_process()
+        self._pending = False
+        self._frame = None
+        command = self.executable + ['-v', 'error', '-nostdin',
+                                     '-threads', str(self.threads)]
+        if keyframes:
+            command += ['-skip_frame', 'nokey']
+        seek = self._seek_time(frame_index)
+        if seek > 0:
+            command += ['-ss', f"{seek:.6f}"]
+        # Rotation metadata is ignored, like the frame size from the probe
+        command += ['-noautorotate', '-i', self.video_path, '-map', '0:v:0']
+        if select:
+            command += ['-vf', f"select='{select}'"]
+        # Passthrough: no frame duplicated or dropped to keep a frame rate
+        command += ['-vsync', '0', '-frames:v', str(count),
+                    '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+        self._process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+
+    def _stop_process(self):
+        if self._process is None:
+            return
+        self._process.stdout.close()
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._process = None
+
+    def _read(self, buffer):
+        # Fills the buffer with the next frame of the pipe; False at the end
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        while filled < len(view):
+            read = self._process.stdout.readinto(view[filled:])
+            if not read:
+                return False
+            filled += read
+        return True
+
+    def _next(self):
+        # Reads and drops a frame the caller did not retrieve, then marks
+        # the next frame of the pipe as pending
+        if self._pending:
+            if self._scratch is None:
+                self._scratch = self._empty()
+            if not self._read(self._scratch):
+                return False
+        # Nothing left in the pipe: the video ended before the range
+        if not self._process.stdout.peek(1):
+            return False
+        self._pending = True
+        self._frame = None
+        return True
+
+    def _empty(self):
+        import numpy as np
+
+        return np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+    def _groups(self, ranges, interval):
+        # Ranges on the same interval grid and closer than SEEK_GAP share a
+        # process; frames between them are decoded and dropped
+        groups = []
+        for start, end in ranges:
+            if groups and start - groups[-1][1] <= SEEK_GAP and \
+                    (start - groups[-1][0]) % interval == 0:
+                groups[-1][1] = end
+                groups[-1][2].append((start, end))
+            else:
+                groups.append([start, end, [(start, end)]])
+        return groups
+
+    def select(self, ranges, interval, should_stop):
+        for first, last, members in self._groups(ranges, interval):
+            count = (last - first) // interval
+            if count <= 0:
+                continue
+            # The process starts at 0-based frame ``first``, which is frame
+            # number first + 1; ffmpeg's n counts from 0 there
+            self._start(first, count,
+                        select=f"not(mod(n+1\\,{interval}))")
+            for step in range(1, count + 1):
+                if should_stop() or not self._next():
+                    return
+                frame_number = first + step * interval
+                if any(start < frame_number <= end
+                       for start, end in members):
+                    yield frame_number
+            self._stop_process()
+
+    def _keyframe_groups(self, frames):
+        # Consecutive runs of wanted frames, split where more than
+        # KEYFRAME_GAP unwanted keyframes lie between two of them
+        keyframes = keyframe_numbers(self.video_path, self.pts_index)
+        position = {number: i for i, number in enumerate(keyframes)}
+        groups = []
+        for frame_number in frames:
+            if frame_number not in position:
+                raise ValueError(f"Frame {frame_number} is not a keyframe")
+            i = position[frame_number]
+            if groups and i - groups[-1][-1] - 1 <= KEYFRAME_GAP:
+                groups[-1].append(i)
+            else:
+                groups.append([i])
+        return keyframes, groups
+
+    def select_keyframes(self, frames, should_stop):
+        keyframes, groups = self._keyframe_groups(frames)
+        for group in groups:
+            wanted = set(group)
+            self._start(keyframes[group[0]] - 1, group[-1] - group[0] + 1,
+                        keyframes=True)
+            for i in range(group[0], group[-1] + 1):
+                if should_stop() or not self._next():
+                    return
+                if i in wanted:
+                    yield keyframes[i]
+            self._stop_process()
+
+    def retrieve(self, buffer=None):
+        if self._pending:
+            if buffer is None:
+                buffer = self._empty()
+            self._pending = False
+            if not self._read(buffer):
+                return False, None
+            self._frame = buffer
+            return True, buffer
+        if self._frame is None:
+            return False, None
+        # Retrieved again: copy the frame already read
+        if buffer is None:
+            return True, self._frame.copy()
+        buffer[...] = self._frame
+        return True, buffer
+
+    def close(self):
+        self._stop_process()
+
+
+DECODERS = {decoder.name: decoder
+            for decoder in (OpenCVDecoder, FfmpegDecoder)}
+DEFAULT_DECODER = 'opencv'
+
+
+def get_decoder(name=DEFAULT_DECODER, **options):
+    """
+    Return a factory creating decoders of a backend.
+
+    Args:
+        name: Backend name (see DECODERS)
+        **options: Backend options, e.g. ``threads`` for ffmpeg
+
+    Returns:
+        Callable ``factory(video_path, fps, pts_index)`` returning a
+        FrameDecoder
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if name not in DECODERS:
+        raise ValueError(f"Unknown decoder '{name}', "
+                         f"choose from: {', '.join(DECODERS)}")
+    decoder = DECODERS[name]
+
+    def factory(video_path, fps, pts_index=None):
+        return decoder(video_path, fps, pts_index, **options)
+    factory.name = name
+    return factory
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Frame Encoders - Image encoder backends for extracted frames
+
+Provides interchangeable encoders (OpenCV JPEG, Pillow JPEG, PNG and WebP)
+with named presets that trade encoding speed against output size. Every
+encoder turns a BGR frame into the bytes of an image file and can embed an
+EXIF block (as produced by ``piexif.dump``) while doing so.
+"""
+
+import io
+import struct
+import zlib
+
+PRESET_NAMES = ('fast', 'balanced', 'small')
+DEFAULT_ENCODER = 'opencv-jpeg'
+DEFAULT_PRESET = 'balanced'
+
+EXIF_HEADER = b'Exif\x00\x00'
+
+
+def insert_jpeg_exif(data, exif):
+    """
+    Insert an EXIF APP1 segment into encoded JPEG bytes.
+
+    The segment is placed right after SOI, or after the JFIF APP0 segment
+    when the encoder wrote one.
+
+    Args:
+        data: Encoded JPEG bytes
+        exif: EXIF bytes starting with the ``Exif\\0\\0`` header
+
+    Returns:
+        JPEG bytes including the EXIF segment
+    """
+    app1 = b'\xff\xe1' + struct.pack('>H', len(exif) + 2) + exif
+    pos = 2
+    if data[2:4] == b'\xff\xe0':
+        pos = 4 + struct.unpack('>H', data[4:6])[0]
+    return data[:pos] + app1 + data[pos:]
+
+
+def insert_png_exif(data, exif):
+    """
+    Insert an ``eXIf`` chunk into encoded PNG bytes, right after IHDR.
+
+    Args:
+        data: Encoded PNG bytes
+        exif: EXIF bytes, with or without the ``Exif\\0\\0`` header
+
+    Returns:
+        PNG bytes including the eXIf chunk
+    """
+    if exif.startswith(EXIF_HEADER):
+        exif = exif[len(EXIF_HEADER):]
+    # Signature (8) + IHDR chunk (4 length + 4 type + 13 data + 4 CRC)
+    pos = 8 + 25
+    body = b'eXIf' + exif
+    crc = zlib.crc32(body) & 0xffffffff
+    chunk = struct.pack('>I', len(exif)) + body + struct.pack('>I', crc)
+    return data[:pos] + chunk + data[pos:]
+
+
+class FrameEncoder:
+    """
+    Base class for frame encoders.
+
+    Subclasses define ``name``, ``extension`` and a ``presets`` dict that maps
+    every name in PRESET_NAMES to the encoder options for that preset.
+    """
+
+    name = None
+    extension = None
+    presets = {}
+
+    def __init__(self, preset=DEFAULT_PRESET, **options):
+        if preset not in self.presets:
+            raise ValueError(
+                f"Unknown preset '{preset}' for {self.name}, "
+                f"expected one of: {', '.join(PRESET_NAMES)}")
+        self.preset = preset
+        self.options = dict(self.presets[preset])
+        self.options.update(options)
+
+    def describe(self):
+        """Return a short ``name:preset`` label for logs and reports."""
+        return f"{self.name}:{self.preset}"
+
+    def encode(self, frame, exif=None):
+        """
+        Encode a frame.
+
+        Args:
+            frame: BGR image as a NumPy array (as returned by OpenCV)
+            exif: Optional EXIF bytes to embed in the output
+
+        Returns:
+            Encoded image file as bytes
+        """
+        raise NotImplementedError
+
+    def _imencode(self, frame, params):
+        import cv2
+
+        ok, buffer = cv2.imencode('.' + self.extension, frame, params)
+        if not ok:
+            raise ValueError(f"{self.describe()} failed to encode frame")
+        return buffer.tobytes()
+
+
+class OpenCVJpegEncoder(FrameEncoder):
+    """JPEG through ``cv2.imencode``; 'balanced' matches cv2.imwrite."""
+
+    name = 'opencv-jpeg'
+    extension = 'jpg'
+    presets = {
+        'fast': {'quality': 90, 'optimize': False},
+        'balanced': {'quality': 95, 'optimize': False},
+        'small': {'quality': 85, 'optimize': True},
+    }
+
+    def encode(self, frame, exif=None):
+        import cv2
+
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.options['quality'],
+                  cv2.IMWRITE_JPEG_OPTIMIZE, int(self.options['optimize'])]
+        data = self._imencode(frame, params)
+        if exif:
+            data = insert_jpeg_exif(data, exif)
+        return data
+
+
+class PillowJpegEncoder(FrameEncoder):
+    """JPEG through Pillow, with Huffman optimization and progressive scans."""
+
+    name = 'pillow-jpeg'
+    extension = 'jpg'
+    presets = {
+        'fast': {'quality': 90, 'optimize': False, 'progressive': False},
+        'balanced': {'quality': 92, 'optimize': True, 'progressive': False},
+        'small': {'quality': 85, 'optimize': True, 'progressive': True},
+    }
+
+    def encode(self, frame, exif=None):
+        import cv2
+        from PIL import Image
+
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        output = io.BytesIO()
+        kwargs = dict(self.options)
+        if exif:
+            kwargs['exif'] = exif
+        image.save(output, 'JPEG', **kwargs)
+        return output.getvalue()
+
+
+class PngEncoder(FrameEncoder):
+    """Lossless PNG through ``cv2.imencode`` with a zlib compression level."""
+
+    name = 'png'
+    extension = 'png'
+    presets = {
+        'fast': {'compression': 1},
+        'balanced': {'compression': 3},
+        'small': {'compression': 9},
+    }
+
+    def encode(self, frame, exif=None):
+        import cv2
+
+        data = self._imencode(
+            frame, [cv2.IMWRITE_PNG_COMPRESSION, self.options['compression']])
+        if exif:
+            data = insert_png_exif(data, exif)
+        return data
+
+
+class WebpEncoder(FrameEncoder):
+    """WebP through Pillow; ``method`` is libwebp's speed/size knob (0-6)."""
+
+    name = 'webp'
+    extension = 'webp'
+    presets = {
+        'fast': {'quality': 80, 'method': 0},
+        'balanced': {'quality': 80, 'method': 4},
+        'small': {'quality': 75, 'method': 6},
+    }
+
+    def encode(self, frame, exif=None):
+        import cv2
+        from PIL import Image
+
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        output = io.BytesIO()
+        kwargs = dict(self.options)
+        if exif:
+            kwargs['exif'] = exif
+        image.save(output, 'WEBP', **kwargs)
+        return output.getvalue()
+
+
+ENCODERS = {
+    encoder.name: encoder
+    for encoder in (OpenCVJpegEncoder, PillowJpegEncoder, PngEncoder,
+                    WebpEncoder)
+}
+
+
+def get_encoder(name=DEFAULT_ENCODER, preset=DEFAULT_PRESET, **options):
+    """
+    Create an encoder by name.
+
+    Args:
+        name: One of the keys of ENCODERS
+        preset: One of PRESET_NAMES
+        **options: Overrides for individual preset options
+
+    Returns:
+        FrameEncoder instance
+
+    Raises:
+        ValueError: If the encoder or preset name is unknown
+    """
+    if name not in ENCODERS:
+        raise ValueError(
+            f"Unknown encoder '{name}', expected one of: "
+            f"{', '.join(ENCODERS)}")
+    return ENCODERS[name](preset, **options)
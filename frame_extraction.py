@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Frame Extraction - Headless frame extraction pipeline
+
+Decodes a frame range from a video, encodes every N-th frame and stores it
+in a frame sink with optional GPS EXIF. Nothing here touches the GUI, so a
+job can run on a worker thread, from scripts or from services; progress is
+reported through a callback and a threading.Event requests cancellation.
+"""
+
+import contextlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import exif_gps
+import frame_cache
+import frame_decoders
+import frame_encoders
+import frame_sinks
+import output_profiles
+from frame_buffers import FramePool
+
+# Encoding releases the GIL, so threads scale across cores
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def frame_filename(frame_number, timestamp, extension):
+    """
+    Build the file name of an extracted frame.
+
+    Args:
+        frame_number: Frame position in the video
+        timestamp: Frame time in seconds
+        extension: Image file extension
+
+    Returns:
+        File name such as ``frame_000030_t1.00s.jpg``
+    """
+    return f"frame_{frame_number:06d}_t{timestamp:.2f}s.{extension}"
+
+
+class FrameExtractionJob:
+    """
+    Extract every ``interval``-th frame of ``[start_frame, end_frame]``.
+
+    Args:
+        video_path: Path to the video file
+        output: Output folder, or .zip/.tar archive path
+        start_frame: First frame of the range
+        end_frame: Last frame of the range
+        interval: Save one frame every ``interval`` frames
+        fps: Video frame rate, used for frame timestamps
+        encoder: FrameEncoder instance (default: OpenCV JPEG, balanced)
+        gps: Optional dict with ``latitude``, ``longitude`` and ``altitude``
+            applied to every frame
+        track: Optional callable mapping a frame time in seconds to a dict
+            with ``latitude``, ``longitude`` and ``altitude`` (or None);
+            each frame gets its own position, which overrides ``gps``. A
+            track with a ``preload(times)`` method (gps_tracks.TrackLookup)
+            receives the times of all planned frames first
+        workers: Number of encoder threads (default: DEFAULT_WORKERS)
+        pts_index: Optional PtsIndex; when given, frame times come from the
+            index instead of ``frame / fps`` and the start is found by
+            timestamp, which stays exact for variable frame rate video
+        ranges: Optional sorted list of ``(start_frame, end_frame)`` ranges
+            extracted one after the other, seeking between them; replaces
+            ``start_frame``/``end_frame``
+        profiles: Optional list of OutputProfile; every saved frame is
+            written to each profile (its own output, size and encoder) from
+            the same decoded frame, and ``output``/``encoder`` are ignored
+        undistort: Optional Undistorter; frames are remapped on the encoder
+            threads before they are resized and encoded
+        cache: Optional FrameCache; frames it already holds for the same
+            video, settings and EXIF are linked into the outputs instead of
+            being decoded, and newly encoded frames are added to it
+        decoder: Decoder backend name (see frame_decoders.DECODERS) or a
+            factory from frame_decoders.get_decoder (default: OpenCV)
+        keyframes_only: Save only keyframes inside the ranges, at least
+            ``interval`` frames apart; nothing but keyframes is decoded
+
+    Frame numbers follow OpenCV's position after reading a frame, so the
+    first saved frame is ``start_frame + interval`` for ``start_frame`` 0.
+    """
+
+    def __init__(self, video_path, output, start_frame, end_frame, interval,
+                 fps, encoder=None, gps=None, workers=None, pts_index=None,
+                 track=None, ranges=None, profiles=None, undistort=None,
+                 cache=None, decoder=None, keyframes_only=False):
+        if interval < 1:
+            raise ValueError("interval must be at least 1")
+        if fps <= 0:
+            raise ValueError("fps must be greater than 0")
+        self.video_path = video_path
+        self.output = output
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.interval = interval
+        self.fps = fps
+        self.encoder = encoder or frame_encoders.get_encoder()
+        if profiles is not None:
+            output_profiles.check_profiles(profiles)
+            self.output = profiles[0].output
+            self.encoder = profiles[0].encoder
+        self.profiles = profiles or [
+            output_profiles.OutputProfile('default', output, self.encoder)]
+        self.gps = gps
+        self.workers = workers or DEFAULT_WORKERS
+        self.pts_index = pts_index
+        self.track = track
+        self.undistort = undistort
+        self.cache = cache
+        if decoder is None or isinstance(decoder, str):
+            decoder = frame_decoders.get_decoder(
+                decoder or frame_decoders.DEFAULT_DECODER)
+        self.decoder = decoder
+        self.keyframes_only = keyframes_only
+        self.ranges = [tuple(r) for r in ranges] if ranges else \
+            [(start_frame, end_frame)]
+        self.start_frame = self.ranges[0][0]
+        self.end_frame = self.ranges[-1][1]
+
+    @classmethod
+    def for_time_range(cls, video_path, output, start_time, end_time,
+                       interval, fps, pts_index=None, **kwargs):
+        """
+        Create a job for a time range in seconds.
+
+        Without a PTS index the range is converted with the nominal frame
+        rate; with one, it covers exactly the frames whose presentation time
+        falls inside ``[start_time, end_time]``.
+        """
+        if pts_index is None:
+            start_frame = int(start_time * fps)
+            end_frame = int(end_time * fps)
+        else:
+            start_frame = pts_index.first_frame_at(start_time)
+            end_frame = pts_index.last_frame_until(end_time)
+        return cls(video_path, output, start_frame, end_frame, interval, fps,
+                   pts_index=pts_index, **kwargs)
+
+    def total_to_extract(self):
+        """Return the number of frames the job will save."""
+        if self.keyframes_only:
+            return len(self.planned_frames())
+        return sum(len(self._range_frames(start, end))
+                   for start, end in self.ranges)
+
+    def planned_frames(self):
+        """Return the numbers of the frames the job saves, in order."""
+        if self.keyframes_only:
+            return self._keyframes()
+        frames = []
+        for start, end in self.ranges:
+            frames.extend(self._range_frames(start, end))
+        return frames
+
+    def _range_frames(self, start, end):
+        # Frames saved from one range: the first is one interval after start
+        return range(start + self.interval, end + 1, self.interval)
+
+    def _keyframes(self):
+        # Keyframes inside the ranges, thinned to one per ``interval``
+        frames = []
+        keyframes = frame_decoders.keyframe_numbers(self.video_path,
+                                                    self.pts_index)
+        for frame in keyframes:
+            if not any(start < frame <= end for start, end in self.ranges):
+                continue
+            if not frames or frame - frames[-1] >= self.interval:
+                frames.append(frame)
+        return frames
+
+    def _gps_record(self):
+        if not self.gps:
+            return None, {}
+        lat = self.gps.get('latitude', 0)
+        lon = self.gps.get('longitude', 0)
+        alt = self.gps.get('altitude')
+        # The position is static, so the EXIF block is built once
+        template = exif_gps.GpsExifTemplate(altitude=alt is not None)
+        record = {'latitude': lat, 'longitude': lon, 'altitude': alt}
+        return template.build(lat, lon, alt), record
+
+    @staticmethod
+    def _track_templates():
+        # EXIF templates by whether the position has an altitude: positions
+        # without one get no altitude tags rather than an empty rational
+        return {True: exif_gps.GpsExifTemplate(),
+                False: exif_gps.GpsExifTemplate(altitude=False)}
+
+    def _preload_track(self, frames):
+        # Tracks that can interpolate many times at once get every time of
+        # the plan up front, in one call
+        if hasattr(self.track, 'preload'):
+            self.track.preload(self.timestamp(frame) for frame in frames)
+
+    def _track_record(self, templates, timestamp):
+        position = self.track(timestamp)
+        if position is None:
+            return None, {}
+        lat = position['latitude']
+        lon = position['longitude']
+        alt = position.get('altitude')
+        record = {'latitude': lat, 'longitude': lon, 'altitude': alt}
+        return templates[alt is not None].build(lat, lon, alt), record
+
+    def _frame_metadata(self, frame_number, exif, position, templates):
+        # Returns the timestamp, EXIF bytes and index record of a frame;
+        # ``exif``/``position`` are the static GPS values, used when there
+        # are no track templates
+        timestamp = self.timestamp(frame_number)
+        if templates is not None:
+            exif, position = self._track_record(templates, timestamp)
+        record = {'frame': frame_number, 'timestamp': f"{timestamp:.3f}"}
+        record.update(position)
+        return timestamp, exif, record
+
+    def _cache_lookup(self, metadata):
+        # Returns the cached files of the frames whose every profile is in
+        # the cache, and the cache keys of every planned frame
+        video = frame_cache.video_fingerprint(self.video_path)
+        settings = {profile.name: frame_cache.settings_key(profile,
+                                                           self.undistort)
+                    for profile in self.profiles}
+        keys = {frame: {name: frame_cache.frame_key(video, frame, setting,
+                                                    exif)
+                        for name, setting in settings.items()}
+                for frame, (_, exif, _) in metadata.items()}
+        found = self.cache.get_many(key for frame_keys in keys.values()
+                                    for key in frame_keys.values())
+        hits = {frame: {name: found[key] for name, key in frame_keys.items()}
+                for frame, frame_keys in keys.items()
+                if all(key in found for key in frame_keys.values())}
+        return hits, keys
+
+    def _cache_plan(self, exif, position, templates):
+        # Returns the metadata, cached files and cache keys of the planned
+        # frames, and what is still to decode (ranges, or keyframe numbers)
+        if self.cache is None:
+            return {}, {}, {}, self.planned_frames() if \
+                self.keyframes_only else self.ranges
+        # Keys depend on the EXIF of each frame, so the metadata of every
+        # planned frame is computed up front
+        metadata = {frame: self._frame_metadata(frame, exif, position,
+                                                templates)
+                    for frame in self.planned_frames()}
+        hits, keys = self._cache_lookup(metadata)
+        if self.keyframes_only:
+            return metadata, hits, keys, [frame for frame in metadata
+                                          if frame not in hits]
+        return metadata, hits, keys, self._miss_ranges(hits)
+
+    def _miss_ranges(self, hits):
+        # Decode ranges covering only the frames missing from the cache: a
+        # range starts one interval before its first frame, so the same
+        # frame numbers are selected and the hits in between are skipped
+        ranges = []
+        for start, end in self.ranges:
+            group = None
+            for frame in self._range_frames(start, end):
+                if frame in hits:
+                    group = None
+                elif group is None:
+                    group = [frame - self.interval, frame]
+                    ranges.append(group)
+                else:
+                    group[1] = frame
+        return [tuple(r) for r in ranges]
+
+    def timestamp(self, frame_number):
+        """Return the time in seconds of a frame number."""
+        if self.pts_index is not None:
+            return self.pts_index.timestamp(frame_number)
+        return frame_number / self.fps
+
+    def _frame_pool(self, frame):
+        if self.undistort is not None:
+            # Build or load the remap tables before the workers need them
+            self.undistort.maps(frame.shape[1], frame.shape[0])
+        # Enough buffers for every worker plus one being decoded and one
+        # queued
+        return FramePool.like(frame, self.workers + 2)
+
+    def _write_frame(self, sinks, frame, timestamp, exif, record,
+                     keys=None):
+        if self.undistort is not None:
+            frame = self.undistort.apply(frame)
+        # Every profile gets the frame under the same name and record
+        for profile, image in output_profiles.render(frame, self.profiles):
+            data = profile.encoder.encode(image, exif=exif)
+            sinks[profile.name].write(
+                frame_filename(record['frame'], timestamp,
+                               profile.encoder.extension),
+                data, record)
+            if keys is not None:
+                self.cache.put(keys[profile.name], data)
+
+    def _link_frame(self, sinks, files, timestamp, record):
+        for profile in self.profiles:
+            sinks[profile.name].link(
+                frame_filename(record['frame'], timestamp,
+                               profile.encoder.extension),
+                files[profile.name], record)
+
+    def _decode(self, decoder, selection, should_stop):
+        # Frame numbers of the frames to decode, from _cache_plan
+        if self.keyframes_only:
+            return decoder.select_keyframes(selection, should_stop)
+        return decoder.select(selection, self.interval, should_stop)
+
+    def run(self, progress=None, cancel_event=None):
+        """
+        Run the extraction.
+
+        Frames are decoded on the calling thread into buffers from a
+        FramePool and encoded and written by a pool of worker threads;
+        each buffer returns to the pool once its frame has been written.
+
+        Args:
+            progress: Optional callable ``progress(extracted, total)`` called
+                after every saved frame (from a worker thread)
+            cancel_event: Optional threading.Event; when set, the job stops
+                decoding, finishes the frames in flight and closes the
+                output cleanly
+
+        Returns:
+            Dict with ``extracted``, ``total``, ``cancelled``, ``output``,
+            ``records`` (index record of every saved frame, by name),
+            ``outputs`` (output of every profile, by profile name) and
+            ``cached`` (frames taken from the cache)
+        """
+        exif_bytes, gps_record = self._gps_record()
+        templates = self._track_templates() if self.track else None
+        planned = self.planned_frames()
+        total = len(planned)
+        self._preload_track(planned)
+        lock = threading.Lock()
+        state = {'extracted': 0, 'error': None}
+        pool = None
+        records = []
+        metadata, hits, keys, selection = self._cache_plan(
+            exif_bytes, gps_record, templates)
+
+        def cancelled():
+            return cancel_event is not None and cancel_event.is_set()
+
+        def should_stop():
+            return cancelled() or state['error'] is not None
+
+        def save(sinks, frame, current_frame):
+            try:
+                timestamp, exif, record = metadata.get(current_frame) or \
+                    self._frame_metadata(current_frame, exif_bytes,
+                                         gps_record, templates)
+                self._write_frame(sinks, frame, timestamp, exif, record,
+                                  keys.get(current_frame))
+            finally:
+                pool.release(frame)
+
+        def saved(future):
+            with lock:
+                if future.exception() is not None:
+                    state['error'] = state['error'] or future.exception()
+                    return
+                state['extracted'] += 1
+                if progress is not None:
+                    progress(state['extracted'], total)
+
+        try:
+            with contextlib.ExitStack() as stack:
+                decoder = stack.enter_context(self.decoder(
+                    self.video_path, self.fps, self.pts_index))
+                sinks = {profile.name: stack.enter_context(
+                    frame_sinks.open_sink(profile.output))
+                    for profile in self.profiles}
+                executor = stack.enter_context(
+                    ThreadPoolExecutor(self.workers))
+                for frame_number, files in sorted(hits.items()):
+                    timestamp, _, record = metadata[frame_number]
+                    executor.submit(
+                        self._link_frame, sinks, files, timestamp,
+                        record).add_done_callback(saved)
+                for current_frame in self._decode(decoder, selection,
+                                                  should_stop):
+                    if pool is None:
+                        ret, frame = decoder.retrieve()
+                        if not ret:
+                            break
+                        pool = self._frame_pool(frame)
+
+                    buffer = pool.acquire()
+                    ret, frame = decoder.retrieve(buffer)
+                    if not ret:
+                        pool.release(buffer)
+                        break
+                    executor.submit(
+                        save, sinks, frame, current_frame).add_done_callback(
+                        saved)
+            records = sorted(sinks[self.profiles[0].name].records,
+                             key=lambda r: r['name'])
+        finally:
+            if self.cache is not None:
+                self.cache.evict()
+
+        if state['error'] is not None:
+            raise state['error']
+        return {'extracted': state['extracted'], 'total': total,
+                'cancelled': cancelled(), 'output': self.output,
+                'records': records,
+                'outputs': {profile.name: profile.output
+                            for profile in self.profiles},
+                'cached': len(hits)}
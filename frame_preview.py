@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Frame Preview - Frames decoded on demand for scrubbing through a video
+
+Picking start and end times means looking at the video, and a 4K frame
+takes tens of milliseconds to decode, more after a seek: a seek lands on
+the previous keyframe and decodes every frame up to the target. The
+previewer keeps a small decoder on a worker thread:
+
+- Only the latest request is decoded; requests made while it was busy
+  replace each other, so a fast drag never queues up stale frames.
+- With known keyframes a request can snap to the keyframe at or before
+  it, which decodes a single frame; the GUI does this while the slider
+  moves and asks for the exact frame once it stops.
+- When the target is after the current position within the same group of
+  pictures, decoding continues forward instead of seeking again.
+- Decoded frames are downscaled and kept, ready for Tk, in an LRU cache
+  bounded in bytes; while idle the worker prefetches the neighbouring
+  frames so that scrubbing back and forth is served from memory.
+
+Frames are numbered from 0 here (``index``), like the slider positions.
+"""
+
+import bisect
+import queue
+import threading
+from collections import OrderedDict
+
+from frame_decoders import SEEK_GAP
+
+# Largest preview size (width, height); frames are never upscaled
+PREVIEW_SIZE = (640, 360)
+# A 640x360 preview takes ~690 KB, so this holds ~180 frames
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+# Neighbours prefetched on each side of the requested frame
+PREFETCH_RADIUS = 3
+
+
+def to_ppm(frame, max_size=PREVIEW_SIZE):
+    """
+    Downscale a BGR frame and encode it as binary PPM.
+
+    Tk reads PPM data directly (``tk.PhotoImage(data=...)``) without any
+    conversion on the UI thread.
+    """
+    import cv2
+
+    height, width = frame.shape[:2]
+    scale = min(max_size[0] / width, max_size[1] / height, 1.0)
+    if scale < 1.0:
+        size = (max(int(width * scale), 1), max(int(height * scale), 1))
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    header = f"P6 {rgb.shape[1]} {rgb.shape[0]} 255\n".encode('ascii')
+    return header + rgb.tobytes()
+
+
+class PreviewCache:
+    """
+    Least recently used cache bounded by the total size of its values.
+
+    Thread-safe; values are bytes.
+
+    Args:
+        max_bytes: Largest total size of the values kept
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        """Return the value of a key (marking it as used), or None."""
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used ones."""
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            if len(value) > self.max_bytes:
+                return
+            self._items[key] = value
+            self.nbytes += len(value)
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+
+class FramePreviewer:
+    """
+    Decodes preview frames of a video on a worker thread.
+
+    ``request`` returns at once; frames that are not cached are delivered
+    later through ``poll``. Call ``close`` when done.
+
+    Args:
+        video_path: Path to the video file
+        frame_count: Number of frames of the video
+        keyframes: Optional 0-based keyframe indices; without them every
+            request seeks to the exact frame
+        step: Distance in frames between the prefetched neighbours of an
+            exact request
+        max_size: Largest preview size ``(width, height)``
+        max_bytes: Memory bound of the preview cache
+    """
+
+    def __init__(self, video_path, frame_count, keyframes=None, step=1,
+                 max_size=PREVIEW_SIZE, max_bytes=DEFAULT_MAX_BYTES):
+        self.video_path = video_path
+        self.frame_count = frame_count
+        self.keyframes = sorted(keyframes) if keyframes else None
+        self.step = max(int(step), 1)
+        self.max_size = max_size
+        self.cache = PreviewCache(max_bytes)
+        self._results = queue.Queue()
+        self._condition = threading.Condition()
+        self._pending = None
+        self._closed = False
+        # Index of the next frame the capture will decode (-1: unknown)
+        self._position = -1
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def keyframe_at(self, index):
+        """Return the keyframe at or before an index (the index if unknown)."""
+        if self.keyframes is None:
+            return index
+        slot = bisect.bisect_right(self.keyframes, index) - 1
+        return self.keyframes[max(slot, 0)]
+
+    def _neighbours(self, index, snap):
+        if snap and self.keyframes is not None:
+            slot = bisect.bisect_left(self.keyframes, index)
+            after = self.keyframes[slot + 1:slot + 1 + PREFETCH_RADIUS]
+            before = self.keyframes[max(slot - PREFETCH_RADIUS, 0):slot]
+            candidates = after + before[::-1]
+        else:
+            # Forward first: those continue decoding from the target
+            offsets = range(1, PREFETCH_RADIUS + 1)
+            candidates = [index + k * self.step for k in offsets] + \
+                [index - k * self.step for k in offsets]
+        return [i for i in candidates if 0 <= i < self.frame_count]
+
+    def request(self, index, snap=False):
+        """
+        Ask for the preview of a frame.
+
+        Args:
+            index: 0-based frame index
+            snap: Use the keyframe at or before ``index`` instead (a single
+                frame to decode)
+
+        Returns:
+            ``(index, image)``: the index actually requested, and its PPM
+            data if cached or None if it will be delivered by ``poll``
+        """
+        index = min(max(int(index), 0), self.frame_count - 1)
+        if snap:
+            index = self.keyframe_at(index)
+        image = self.cache.get(index)
+        with self._condition:
+            # Even a cached frame replaces the pending one and gets its
+            # neighbours prefetched
+            self._pending = (index, image, self._neighbours(index, snap))
+            self._condition.notify()
+        return index, image
+
+    def poll(self, timeout=0):
+        """
+        Return the next decoded ``(index, image)``, or None if none is ready.
+
+        ``image`` is None when the frame could not be decoded.
+        """
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Stop the worker thread and release the video."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _interrupted(self):
+        return self._pending is not None or self._closed
+
+    def _run(self):
+        import cv2
+
+        capture = cv2.VideoCapture(self.video_path)
+        try:
+            while True:
+                with self._condition:
+                    while self._pending is None and not self._closed:
+                        self._condition.wait()
+                    if self._closed:
+                        return
+                    index, image, neighbours = self._pending
+                    self._pending = None
+                if image is None:
+                    self._results.put((index, self._decode(capture, index)))
+                for neighbour in neighbours:
+                    if self._interrupted():
+                        break
+                    if neighbour not in self.cache:
+                        self._decode(capture, neighbour)
+        finally:
+            capture.release()
+
+    def _decode(self, capture, index):
+        import cv2
+
+        start = self.keyframe_at(index)
+        # Keep decoding forward when the target is in the group of pictures
+        # being decoded, or (keyframes unknown) close enough
+        if self.keyframes is None:
+            start = max(self._position, 0)
+            if not 0 <= index - self._position <= SEEK_GAP:
+                start = index
+        if not 0 <= start <= self._position <= index:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+            self._position = start
+        while self._position < index:
+            if not capture.grab():
+                self._position = -1
+                return None
+            self._position += 1
+        ok, frame = capture.read()
+        if not ok:
+            self._position = -1
+            return None
+        self._position += 1
+        image = to_ppm(frame, self.max_size)
+        self.cache.put(index, image)
+        return image
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Frame Sinks - Output destinations for extracted frames
+
+A sink receives encoded frames one at a time and stores them either as
+loose files in a folder or streamed into a single zip (stored, not deflated)
+or tar archive. Archive sinks also write an index listing every frame with
+its frame number, timestamp and position.
+
+Folders with 100k+ files make every directory operation slow, above all
+over SMB. A folder created with create_sharded_dir uses the sharded layout
+instead: frames go into subfolders by frame number range (``0000000/``,
+``0010000/``...) and an index at the top lets tools find them without
+listing any folder (see list_frames).
+
+Files in folders are written under a temporary name and renamed into place,
+so a crash never leaves a half-written image behind. Frames that already
+exist as files (see frame_cache) are hard-linked into folders instead of
+being copied.
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
+
+INDEX_NAME = 'index.csv'
+INDEX_FIELDS = ('name', 'frame', 'timestamp', 'latitude', 'longitude',
+                'altitude')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar')
+LAYOUT_NAME = 'layout.json'
+FOLDER_LAYOUTS = ('flat', 'sharded')
+TMP_SUFFIX = '.tmp'
+# Video frames per subfolder of a sharded folder
+DEFAULT_SHARD_SPAN = 10000
+
+FRAME_NUMBER_RE = re.compile(r'frame_(\d+)')
+
+
+def is_archive(path):
+    """Return True if the path names a frame archive (zip or tar)."""
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def write_atomic(path, data):
+    """
+    Write a file under a temporary name and rename it into place.
+
+    Readers see either the previous file or the complete new one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}{TMP_SUFFIX}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def link_or_copy(source, path):
+    """
+    Place an existing file at ``path``, as a hard link when possible.
+
+    Falls back to a copy across file systems or where links are not
+    supported. Like write_atomic, the file appears complete or not at all.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}{TMP_SUFFIX}"
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def create_sharded_dir(path, shard_span=DEFAULT_SHARD_SPAN):
+    """
+    Create a folder that uses the sharded layout.
+
+    An existing sharded folder keeps its layout.
+
+    Args:
+        path: Folder path
+        shard_span: Video frames per subfolder
+    """
+    if shard_span < 1:
+        raise ValueError("shard_span must be at least 1")
+    os.makedirs(path, exist_ok=True)
+    if read_layout(path) is None:
+        layout = {'layout': 'sharded', 'shard_span': shard_span}
+        write_atomic(os.path.join(path, LAYOUT_NAME),
+                     json.dumps(layout).encode('utf-8'))
+
+
+def read_layout(path):
+    """Return the layout dict of a sharded folder, or None."""
+    try:
+        with open(os.path.join(path, LAYOUT_NAME), 'r',
+                  encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def format_index(records):
+    """
+    Serialize index records as CSV text.
+
+    Args:
+        records: Iterable of dicts with the INDEX_FIELDS keys
+
+    Returns:
+        CSV text with a header row
+    """
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=INDEX_FIELDS,
+                            extrasaction='ignore', lineterminator='\n')
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+    return output.getvalue()
+
+
+def parse_index(text):
+    """
+    Parse CSV index text written by format_index.
+
+    Args:
+        text: CSV text
+
+    Returns:
+        List of dicts keyed by INDEX_FIELDS (values as strings)
+    """
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+class FrameSink:
+    """
+    Base class for frame sinks.
+
+    Sinks are context managers; ``write`` may be called from several threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def write(self, name, data, record=None):
+        """
+        Store one encoded frame.
+
+        Args:
+            name: File name of the frame
+            data: Encoded image bytes
+            record: Optional dict with INDEX_FIELDS values for the index
+        """
+        with self._lock:
+            self._write(name, data)
+            self._add_record(name, record)
+
+    def link(self, name, source, record=None):
+        """
+        Store one frame that already exists as a file.
+
+        Args:
+            name: File name of the frame
+            source: Path of the encoded image
+            record: Optional dict with INDEX_FIELDS values for the index
+        """
+        with open(source, 'rb') as f:
+            data = f.read()
+        self.write(name, data, record)
+
+    def _add_record(self, name, record):
+        entry = {'name': name}
+        if record:
+            entry.update(record)
+        self.records.append(entry)
+
+    def _write(self, name, data):
+        raise NotImplementedError
+
+    def _index_bytes(self):
+        # Frames may arrive out of order from parallel encoders
+        records = sorted(self.records, key=lambda record: record['name'])
+        return format_index(records).encode('utf-8')
+
+    def close(self):
+        """Flush pending data and release the output."""
+
+
+class DirectorySink(FrameSink):
+    """Loose image files inside a folder."""
+
+    def write(self, name, data, record=None):
+        # Separate files need no lock; only the records list does
+        self._write(name, data)
+        with self._lock:
+            self._add_record(name, record)
+
+    def link(self, name, source, record=None):
+        self._link(name, source)
+        with self._lock:
+            self._add_record(name, record)
+
+    def _write(self, name, data):
+        write_atomic(os.path.join(self.path, name), data)
+
+    def _link(self, name, source):
+        link_or_copy(source, os.path.join(self.path, name))
+
+
+class ShardedDirectorySink(DirectorySink):
+    """
+    Image files in subfolders by frame number range, with an index.
+
+    Frames are stored as ``<first frame of the range>/<name>`` and listed in
+    ``index.csv`` at the top of the folder. An index left by a previous
+    extraction is merged into the new one; it is removed while frames are
+    being written, so after a crash tools fall back to scanning the
+    subfolders instead of trusting an incomplete index.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        layout = read_layout(path) or {}
+        self.shard_span = int(layout.get('shard_span', DEFAULT_SHARD_SPAN))
+        self._previous = read_folder_index(path) or []
+        if self._previous:
+            os.remove(os.path.join(path, INDEX_NAME))
+        self._shards = set()
+
+    def shard_name(self, name, record=None):
+        """Return the subfolder of a frame, from its record or its name."""
+        frame = record.get('frame') if record else None
+        if frame is None:
+            match = FRAME_NUMBER_RE.match(os.path.basename(name))
+            frame = int(match.group(1)) if match else 0
+        return f"{int(frame) // self.shard_span * self.shard_span:07d}"
+
+    def write(self, name, data, record=None):
+        super().write(f"{self.shard_name(name, record)}/{name}", data,
+                      record)
+
+    def link(self, name, source, record=None):
+        super().link(f"{self.shard_name(name, record)}/{name}", source,
+                     record)
+
+    def _make_shard(self, name):
+        shard = name.split('/', 1)[0]
+        if shard not in self._shards:
+            os.makedirs(os.path.join(self.path, shard), exist_ok=True)
+            self._shards.add(shard)
+
+    def _write(self, name, data):
+        self._make_shard(name)
+        super()._write(name, data)
+
+    def _link(self, name, source):
+        self._make_shard(name)
+        super()._link(name, source)
+
+    def close(self):
+        if self._previous is None:
+            return
+        records = {record['name']: record for record in self._previous}
+        records.update((record['name'], record) for record in self.records)
+        records = sorted(records.values(), key=lambda r: r['name'])
+        write_atomic(os.path.join(self.path, INDEX_NAME),
+                     format_index(records).encode('utf-8'))
+        self._previous = None
+
+
+class ZipSink(FrameSink):
+    """Frames streamed into an uncompressed zip archive."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED)
+
+    def _write(self, name, data):
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        self._zip.writestr(info, data)
+
+    def close(self):
+        if self._zip is None:
+            return
+        self._write(INDEX_NAME, self._index_bytes())
+        self._zip.close()
+        self._zip = None
+
+
+class TarSink(FrameSink):
+    """Frames streamed into an uncompressed tar archive."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._tar = tarfile.open(path, 'w')
+
+    def _write(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        if self._tar is None:
+            return
+        self._write(INDEX_NAME, self._index_bytes())
+        self._tar.close()
+        self._tar = None
+
+
+def open_sink(path):
+    """
+    Open the sink matching an output path.
+
+    Paths ending in .zip or .tar become archives; anything else is treated
+    as an existing folder.
+
+    Args:
+        path: Output folder or archive path
+
+    Returns:
+        FrameSink instance
+    """
+    lower = path.lower()
+    if lower.endswith('.zip'):
+        return ZipSink(path)
+    if lower.endswith('.tar'):
+        return TarSink(path)
+    if read_layout(path) is not None:
+        return ShardedDirectorySink(path)
+    return DirectorySink(path)
+
+
+def read_folder_index(path):
+    """Return the index records of a sharded folder, or None if missing."""
+    try:
+        with open(os.path.join(path, INDEX_NAME), 'r', encoding='utf-8',
+                  newline='') as f:
+            return parse_index(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def list_frames(path):
+    """
+    List the frame files of an output folder or archive.
+
+    Sharded folders are read from their index when it is there, and from
+    their subfolders otherwise (after an interrupted extraction). Index,
+    layout and temporary files are left out.
+
+    Args:
+        path: Output folder, or .zip/.tar archive
+
+    Returns:
+        Sorted names relative to the output (``0010000/frame_...jpg`` in a
+        sharded folder)
+    """
+    if is_archive(path):
+        names = archive_names(path)
+    elif read_layout(path) is None:
+        names = os.listdir(path)
+    else:
+        records = read_folder_index(path)
+        if records is not None:
+            names = [record['name'] for record in records]
+        else:
+            names = [f"{entry.name}/{name}"
+                     for entry in os.scandir(path) if entry.is_dir()
+                     for name in os.listdir(entry.path)]
+    skip = (INDEX_NAME, LAYOUT_NAME)
+    return sorted(name for name in names
+                  if name not in skip and not name.endswith(TMP_SUFFIX))
+
+
+def archive_names(path):
+    """
+    List the file members of a frame archive.
+
+    Args:
+        path: Path to a .zip or .tar archive
+
+    Returns:
+        List of member names in archive order
+    """
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            return [info.filename for info in archive.infolist()
+                    if not info.is_dir()]
+    with tarfile.open(path) as archive:
+        return [member.name for member in archive.getmembers()
+                if member.isfile()]
+
+
+def iter_archive(path):
+    """
+    Iterate over the members of a frame archive without extracting it.
+
+    Args:
+        path: Path to a .zip or .tar archive
+
+    Yields:
+        (name, data) tuples in archive order
+    """
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, archive.read(info)
+    else:
+        with tarfile.open(path) as archive:
+            for member in archive:
+                if member.isfile():
+                    yield member.name, archive.extractfile(member).read()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Geo Outputs - Image positions written as metadata files
+
+Writing GPS into the EXIF of every image means rewriting every full image.
+WebODM/ODM and most photogrammetry tools also accept the positions in a
+separate file, so these writers stream all positions into a single geo.txt,
+CSV or GeoJSON file, or into one small XMP sidecar per image, without ever
+opening the images. The cost depends on the number of images, not on their
+size.
+
+Every writer takes an iterable of ``(name, latitude, longitude, altitude)``
+tuples and consumes it one row at a time.
+"""
+
+import csv
+import json
+import os
+
+GEO_FORMATS = ('geotxt', 'csv', 'geojson', 'xmp')
+DEFAULT_NAMES = {'geotxt': 'geo.txt', 'csv': 'geo.csv',
+                 'geojson': 'flight.geojson'}
+
+
+def write_geo_txt(path, positions):
+    """
+    Write an ODM/WebODM ``geo.txt`` file (WGS84, one image per line).
+
+    Args:
+        path: Output file
+        positions: Iterable of (name, latitude, longitude, altitude)
+
+    Returns:
+        Number of images written
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('EPSG:4326\n')
+        for name, lat, lon, alt in positions:
+            # geo.txt lists x (longitude) before y (latitude)
+            f.write(f'{name} {lon:.8f} {lat:.8f} {alt:.3f}\n')
+            count += 1
+    return count
+
+
+def write_csv(path, positions):
+    """
+    Write positions as CSV with a ``name,latitude,longitude,altitude`` header.
+
+    Returns:
+        Number of images written
+    """
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(('name', 'latitude', 'longitude', 'altitude'))
+        for name, lat, lon, alt in positions:
+            writer.writerow((name, f'{lat:.8f}', f'{lon:.8f}', f'{alt:.3f}'))
+            count += 1
+    return count
+
+
+def write_geojson(path, positions):
+    """
+    Write a GeoJSON FeatureCollection with one point per image followed by
+    the flight line through all of them.
+
+    Points are streamed as they come; only the line coordinates are kept in
+    memory until the end. A LineString needs two positions, so there is no
+    flight line for fewer than two images.
+
+    Returns:
+        Number of images written
+    """
+    line = []
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"type": "FeatureCollection", "features": [')
+        separator = '\n'
+        for name, lat, lon, alt in positions:
+            coordinates = [round(lon, 8), round(lat, 8), round(alt, 3)]
+            feature = {'type': 'Feature',
+                       'geometry': {'type': 'Point',
+                                    'coordinates': coordinates},
+                       'properties': {'name': name}}
+            f.write(separator + json.dumps(feature))
+            separator = ',\n'
+            line.append(coordinates)
+        if len(line) >= 2:
+            flight_line = {'type': 'Feature',
+                           'geometry': {'type': 'LineString',
+                                        'coordinates': line},
+                           'properties': {'name': 'flight_line',
+                                          'images': len(line)}}
+            f.write(separator + json.dumps(flight_line))
+        f.write('\n]}\n')
+    return len(line)
+
+
+def xmp_coordinate(value, positive, negative):
+    """
+    Format a coordinate the way XMP stores GPS values (``DDD,MM.mmmmmmR``).
+
+    Args:
+        value: Decimal degrees
+        positive: Reference letter for values >= 0 ('N' or 'E')
+        negative: Reference letter for negative values ('S' or 'W')
+
+    Returns:
+        Coordinate string such as ``40,25.006500N``
+    """
+    ref = positive if value >= 0 else negative
+    minutes = round(abs(value) * 60, 6)
+    degrees, minutes = divmod(minutes, 60)
+    return f'{int(degrees)},{minutes:09.6f}{ref}'
+
+
+def xmp_sidecar(latitude, longitude, altitude):
+    """
+    Build an XMP sidecar with the GPS position of one image.
+
+    Returns:
+        XMP packet as text
+    """
+    alt_ref = 0 if altitude >= 0 else 1
+    altitude = int(round(abs(altitude) * 1000))
+    return (
+        '<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+        '<x:xmpmeta xmlns:x="adobe:ns:meta/">\n'
+        ' <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">\n'
+        '  <rdf:Description rdf:about=""\n'
+        '    xmlns:exif="http://ns.adobe.com/exif/1.0/"\n'
+        '    exif:GPSVersionID="2.2.0.0"\n'
+        f'    exif:GPSLatitude="{xmp_coordinate(latitude, "N", "S")}"\n'
+        f'    exif:GPSLongitude="{xmp_coordinate(longitude, "E", "W")}"\n'
+        f'    exif:GPSAltitudeRef="{alt_ref}"\n'
+        f'    exif:GPSAltitude="{altitude}/1000"/>\n'
+        ' </rdf:RDF>\n'
+        '</x:xmpmeta>\n'
+        '<?xpacket end="w"?>\n')
+
+
+def sidecar_name(image_name):
+    """Return the sidecar name of an image (``frame.jpg`` -> ``frame.xmp``)."""
+    return os.path.splitext(image_name)[0] + '.xmp'
+
+
+def write_xmp_sidecars(folder, positions):
+    """
+    Write one XMP sidecar per image into a folder, keeping the relative
+    path of each image.
+
+    Returns:
+        Number of sidecars written
+    """
+    count = 0
+    for name, lat, lon, alt in positions:
+        # Images in the subfolders of a sharded output get their sidecar
+        # in the same subfolder
+        path = os.path.join(folder, sidecar_name(name))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(xmp_sidecar(lat, lon, alt))
+        count += 1
+    return count
+
+
+WRITERS = {
+    'geotxt': write_geo_txt,
+    'csv': write_csv,
+    'geojson': write_geojson,
+    'xmp': write_xmp_sidecars,
+}
+
+
+def default_target(fmt, images_path):
+    """
+    Return where a format is written by default for an image location.
+
+    Files go inside an image folder (where ODM looks for ``geo.txt``) or
+    next to an archive, named after it. XMP sidecars always go into a
+    folder.
+
+    Args:
+        fmt: One of GEO_FORMATS
+        images_path: Image folder or .zip/.tar archive
+
+    Returns:
+        Output file or folder path
+    """
+    if os.path.isdir(images_path):
+        if fmt == 'xmp':
+            return images_path
+        return os.path.join(images_path, DEFAULT_NAMES[fmt])
+    base = os.path.splitext(images_path)[0]
+    if fmt == 'xmp':
+        return base + '_xmp'
+    return f'{base}_{DEFAULT_NAMES[fmt]}'
+
+
+def write_positions(fmt, target, positions):
+    """
+    Write positions in one of GEO_FORMATS.
+
+    Args:
+        fmt: Output format
+        target: Output file, or folder for 'xmp'
+        positions: Iterable of (name, latitude, longitude, altitude)
+
+    Returns:
+        Number of images written
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if fmt not in WRITERS:
+        raise ValueError(
+            f"Unknown geo format '{fmt}'. Available: {', '.join(GEO_FORMATS)}")
+    if fmt == 'xmp':
+        os.makedirs(target, exist_ok=True)
+    return WRITERS[fmt](target, positions)
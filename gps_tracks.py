@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+GPS Tracks - Positions from external GNSS loggers (GPX, CSV, JSON)
+
+Besides DJI SRT files, positions come from loggers that record their own
+track. The readers stream the points one at a time (``iterparse`` for GPX,
+``csv`` rows, one JSON value at a time), so a track of millions of points
+never exists as a list of dicts: the values go straight into flat arrays,
+sorted once by time into a TrackIndex.
+
+Looking up a time is a binary search plus a linear interpolation between
+the two neighbouring points (``np.interp``), for one frame or for any
+number of frames in one vectorized call. ``TrackIndex.lookup`` returns a
+callable that can be passed as ``track`` to FrameExtractionJob, so every
+frame gets its own position while it is extracted; the job interpolates
+the positions of all its frames up front, in one call.
+
+Video and logger clocks differ; the offset given to ``lookup`` says where
+the video starts in the track (see TrackIndex.lookup).
+
+Formats:
+    gpx   ``trkpt``/``rtept`` elements with ``lat``/``lon``, ``ele`` and
+          ``time`` (ISO 8601)
+    csv   A header naming the time, latitude, longitude and (optional)
+          altitude columns; common names are recognised (``time``,
+          ``timestamp``, ``lat``, ``latitude``, ``lon``, ``lng``, ``ele``...)
+    json  An array of point objects, JSON Lines (one object per line), or
+          an object with the points in ``points``; the keys are those of
+          the CSV columns
+Times are ISO 8601 (UTC when no zone is given) or numbers of seconds.
+"""
+
+import calendar
+import csv
+import json
+import math
+import os
+import re
+from array import array
+
+TRACK_FORMATS = ('gpx', 'csv', 'json')
+
+# Recognised CSV columns / JSON keys, compared in lower case
+TIME_KEYS = ('time', 'timestamp', 'datetime', 'date_time', 'utc', 'seconds')
+LATITUDE_KEYS = ('latitude', 'lat')
+LONGITUDE_KEYS = ('longitude', 'lon', 'lng', 'long')
+ALTITUDE_KEYS = ('altitude', 'alt', 'ele', 'elevation', 'height')
+
+ISO_TIME_RE = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d(?:\.\d+)?)'
+    r'\s*(Z|[+-]\d\d(?::?\d\d)?)?$', re.IGNORECASE)
+# Size of the reads of the streaming JSON parser
+JSON_CHUNK_SIZE = 1024 * 1024
+
+
+def parse_time(value):
+    """
+    Convert an ISO 8601 time or a number of seconds to seconds.
+
+    Returns:
+        Seconds since the Unix epoch for ISO times, or the number itself
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    match = ISO_TIME_RE.match(text)
+    if not match:
+        raise ValueError(f"Invalid time: {value!r}")
+    year, month, day, hour, minute = (int(g) for g in match.groups()[:5])
+    seconds = calendar.timegm((year, month, day, hour, minute, 0)) + \
+        float(match.group(6))
+    zone = match.group(7)
+    if zone and zone.upper() != 'Z':
+        sign = -1 if zone[0] == '-' else 1
+        digits = zone[1:].replace(':', '')
+        minutes = int(digits[:2]) * 60 + int(digits[2:] or 0)
+        seconds -= sign * minutes * 60
+    return seconds
+
+
+def _local_name(tag):
+    # GPX 1.0 and 1.1 use different namespaces
+    return tag.rsplit('}', 1)[-1]
+
+
+def read_gpx(path):
+    """
+    Yield the ``(time, latitude, longitude, altitude)`` points of a GPX file.
+
+    Track and route points without a time or position are skipped; the
+    altitude is None when the point has no ``ele``.
+    """
+    import xml.etree.ElementTree as ET
+
+    # Open elements; a processed point is removed from its parent, so the
+    # tree never holds more than the point being read
+    parents = []
+    try:
+        for event, element in ET.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                parents.append(element)
+                continue
+            parents.pop()
+            if _local_name(element.tag) not in ('trkpt', 'rtept'):
+                continue
+            values = {_local_name(child.tag): child.text
+                      for child in element}
+            lat, lon = element.get('lat'), element.get('lon')
+            if parents:
+                parents[-1].remove(element)
+            if not values.get('time') or lat is None or lon is None:
+                continue
+            altitude = values.get('ele')
+            yield (parse_time(values['time']), float(lat), float(lon),
+                   float(altitude) if altitude else None)
+    except ET.ParseError as e:
+        raise ValueError(f"{path}: {e}")
+
+
+def _find_key(keys, names):
+    lowered = {key.strip().lower(): key for key in keys}
+    for name in names:
+        if name in lowered:
+            return lowered[name]
+    return None
+
+
+def _point(values, keys=None):
+    # Converts a row or JSON object to a point tuple, or None without time
+    # or position; ``keys`` are the names found for a CSV header
+    if keys is None:
+        keys = [_find_key(values, names) for names in
+                (TIME_KEYS, LATITUDE_KEYS, LONGITUDE_KEYS, ALTITUDE_KEYS)]
+    time_key, lat_key, lon_key, alt_key = keys
+    if time_key is None or lat_key is None or lon_key is None:
+        return None
+    time_value, lat, lon = (values.get(k) for k in keys[:3])
+    if time_value in (None, '') or lat in (None, '') or lon in (None, ''):
+        return None
+    altitude = values.get(alt_key) if alt_key else None
+    return (parse_time(time_value), float(lat), float(lon),
+            None if altitude in (None, '') else float(altitude))
+
+
+def read_csv(path):
+    """
+    Yield the ``(time, latitude, longitude, altitude)`` points of a CSV file.
+
+    Raises:
+        ValueError: If the header has no time, latitude or longitude column
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(f, dialect=dialect)
+        header = reader.fieldnames or []
+        keys = [_find_key(header, names) for names in
+                (TIME_KEYS, LATITUDE_KEYS, LONGITUDE_KEYS, ALTITUDE_KEYS)]
+        if None in keys[:3]:
+            raise ValueError(f"{path}: a time, latitude and longitude "
+                             f"column is required")
+        for row in reader:
+            point = _point(row, keys)
+            if point is not None:
+                yield point
+
+
+def _json_values(f):
+    # Yields the values of a top-level JSON array, or the successive
+    # top-level values of a JSON Lines file, reading the file in chunks
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    in_array = None
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer):
+            if in_array is None:
+                in_array = buffer[position] == '['
+                position += in_array
+                continue
+            if in_array and buffer[position] == ']':
+                return
+            try:
+                value, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield value
+                continue
+        elif eof:
+            return
+        # The value continues in the next chunk; reads grow with the value
+        # so that a large one is not decoded again and again
+        chunk = f.read(max(JSON_CHUNK_SIZE, len(buffer) - position))
+        eof = not chunk
+        buffer, position = buffer[position:] + chunk, 0
+
+
+def read_json(path):
+    """
+    Yield the ``(time, latitude, longitude, altitude)`` points of a JSON file.
+
+    Arrays and JSON Lines are streamed. An object with a ``points`` list is
+    read whole; an object that is itself a point gives a single point.
+    """
+    with open(path, encoding='utf-8') as f:
+        for value in _json_values(f):
+            if not isinstance(value, dict):
+                continue
+            if isinstance(value.get('points'), list):
+                items = value['points']
+            else:
+                items = [value]
+            for item in items:
+                point = _point(item) if isinstance(item, dict) else None
+                if point is not None:
+                    yield point
+
+
+READERS = {'gpx': read_gpx, 'csv': read_csv, 'json': read_json}
+
+
+def track_format(path):
+    """
+    Return the track format of a file from its extension.
+
+    ``.jsonl``/``.ndjson`` and ``.txt`` count as JSON and CSV.
+
+    Raises:
+        ValueError: If the extension is not a track format
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    extension = {'jsonl': 'json', 'ndjson': 'json',
+                 'txt': 'csv'}.get(extension, extension)
+    if extension not in READERS:
+        raise ValueError(f"Unknown track format: {path} (expected "
+                         f"{', '.join(TRACK_FORMATS)})")
+    return extension
+
+
+class TrackIndex:
+    """
+    Time-sorted track arrays with linear interpolation between points.
+
+    Args:
+        times: Point times in seconds, in any order
+        latitudes, longitudes: Point positions
+        altitudes: Optional altitudes, NaN where unknown
+    """
+
+    def __init__(self, times, latitudes, longitudes, altitudes=None):
+        import numpy as np
+
+        times = np.asarray(times, dtype=np.float64)
+        if len(times) == 0:
+            raise ValueError("Track has no points")
+        if altitudes is None:
+            altitudes = np.full(len(times), np.nan)
+        order = np.argsort(times, kind='stable')
+        self.times = times[order]
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)[order]
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)[order]
+        self.altitudes = np.asarray(altitudes, dtype=np.float64)[order]
+
+    @classmethod
+    def from_points(cls, points):
+        """
+        Build the index from an iterable of point tuples.
+
+        Returns:
+            TrackIndex, or None if there are no points
+        """
+        columns = [array('d'), array('d'), array('d'), array('d')]
+        for time_value, lat, lon, alt in points:
+            columns[0].append(time_value)
+            columns[1].append(lat)
+            columns[2].append(lon)
+            columns[3].append(math.nan if alt is None else alt)
+        if not columns[0]:
+            return None
+        return cls(*columns)
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def start(self):
+        """Time of the first point."""
+        return float(self.times[0])
+
+    @property
+    def duration(self):
+        """Seconds between the first and the last point."""
+        return float(self.times[-1] - self.times[0])
+
+    def positions(self, times):
+        """
+        Interpolate the positions at many times in one call.
+
+        Args:
+            times: Times in the track clock (seconds)
+
+        Returns:
+            ``(latitudes, longitudes, altitudes)`` arrays; NaN outside the
+            track and, for the altitude, where it is unknown
+        """
+        import numpy as np
+
+        times = np.asarray(times, dtype=np.float64)
+        outside = (times < self.times[0]) | (times > self.times[-1])
+        result = []
+        for values in (self.latitudes, self.longitudes, self.altitudes):
+            interpolated = np.interp(times, self.times, values)
+            interpolated[outside] = np.nan
+            result.append(interpolated)
+        return tuple(result)
+
+    def lookup(self, offset=0.0):
+        """
+        Build a function returning the position at a video time.
+
+        Video time ``t`` is track time ``start + offset + t``: with offset 0
+        the video starts at the first point; a positive offset means it
+        started that many seconds later, a negative one earlier.
+
+        Returns:
+            TrackLookup; it can be passed as ``track`` to FrameExtractionJob
+        """
+        return TrackLookup(self, self.start + offset)
+
+
+def _position(lat, lon, alt):
+    # Position dict of one interpolated point, or None outside the track
+    if math.isnan(lat):
+        return None
+    return {'latitude': lat, 'longitude': lon,
+            'altitude': None if math.isnan(alt) else alt}
+
+
+class TrackLookup:
+    """
+    Position at a video time, interpolated from a TrackIndex.
+
+    Calling ``lookup(seconds)`` returns a dict with ``latitude``,
+    ``longitude`` and ``altitude`` (None if unknown), or None outside the
+    track. ``preload`` interpolates many times in one vectorized call;
+    FrameExtractionJob calls it with the times of all its planned frames,
+    so the call for each frame is a dictionary read.
+
+    Args:
+        index: TrackIndex
+        origin: Track time of the start of the video
+    """
+
+    def __init__(self, index, origin):
+        self.index = index
+        self.origin = origin
+        self._preloaded = {}
+
+    def preload(self, times):
+        """Interpolate the positions at many video times at once."""
+        import numpy as np
+
+        times = np.asarray(list(times), dtype=np.float64)
+        lats, lons, alts = self.index.positions(self.origin + times)
+        self._preloaded = {
+            seconds: _position(lat, lon, alt) for seconds, lat, lon, alt in
+            zip(times.tolist(), lats.tolist(), lons.tolist(), alts.tolist())}
+
+    def __call__(self, seconds):
+        if seconds in self._preloaded:
+            return self._preloaded[seconds]
+        lats, lons, alts = self.index.positions([self.origin + seconds])
+        return _position(float(lats[0]), float(lons[0]), float(alts[0]))
+
+
+def load_track(path, fmt=None):
+    """
+    Read a GPX, CSV or JSON track file into a TrackIndex.
+
+    Args:
+        path: Track file
+        fmt: 'gpx', 'csv' or 'json' (default: from the extension)
+
+    Raises:
+        ValueError: If the format is unknown, a value is invalid or the
+            file has no timed points
+    """
+    fmt = fmt or track_format(path)
+    if fmt not in READERS:
+        raise ValueError(f"Unknown track format: {fmt}")
+    index = TrackIndex.from_points(READERS[fmt](path))
+    if index is None:
+        raise ValueError(f"No timed positions in {path}")
+    return index
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""
+Ingest Daemon - Watch a folder and process DJI video/SRT pairs
+
+Watches an ingest folder (e.g. where SD cards are offloaded), pairs every
+video with the SRT recorded next to it and queues an extract + tag job for
+it. The queue is a SQLite file, so pending and interrupted jobs survive a
+restart, and jobs run concurrently on a pool of worker threads (decoding and
+encoding release the GIL), each reporting its progress in the queue.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from srt_concat import find_srt_for_video
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov')
+OUTPUT_FORMATS = ('dir', 'sharded', 'zip', 'tar')
+QUEUE_NAME = 'ingest_queue.sqlite'
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# Seconds between progress writes to the queue for one job
+PROGRESS_INTERVAL = 1.0
+
+
+class JobQueue:
+    """
+    Persistent queue of ingest jobs stored in SQLite.
+
+    Every call opens its own connection, so the queue can be used from
+    several threads, and claiming a job is atomic across processes.
+
+    Args:
+        path: SQLite file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'video TEXT UNIQUE NOT NULL, srt TEXT NOT NULL, '
+                'output TEXT NOT NULL, status TEXT NOT NULL, '
+                'extracted INTEGER DEFAULT 0, total INTEGER DEFAULT 0, '
+                'tagged INTEGER DEFAULT 0, error TEXT, '
+                'created REAL, updated REAL)')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def enqueue(self, video, srt, output):
+        """
+        Queue a job unless the video was already queued.
+
+        Args:
+            video: Path to video file
+            srt: Path to its SRT file
+            output: Output folder or archive for the frames
+
+        Returns:
+            True if a new job was queued
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO jobs '
+                '(video, srt, output, status, created, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (os.path.abspath(video), os.path.abspath(srt), output,
+                 STATUS_QUEUED, now, now))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def claim(self):
+        """
+        Take the oldest queued job and mark it as running.
+
+        Returns:
+            Job dict, or None if nothing is queued
+        """
+        conn = self._connect()
+        try:
+            # Write lock first, so two workers never claim the same job
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1',
+                (STATUS_QUEUED,)).fetchone()
+            if row is not None:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, updated = ? WHERE id = ?',
+                    (STATUS_RUNNING, time.time(), row['id']))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job['status'] = STATUS_RUNNING
+        return job
+
+    def update(self, job_id, **fields):
+        """Update the status or progress fields of a job."""
+        fields['updated'] = time.time()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        self._execute(f'UPDATE jobs SET {columns} WHERE id = ?',
+                      tuple(fields.values()) + (job_id,))
+
+    def requeue_interrupted(self):
+        """
+        Queue again the jobs left running by a stopped daemon.
+
+        Returns:
+            Number of jobs queued again
+        """
+        rows = self._execute(
+            'SELECT id FROM jobs WHERE status = ?', (STATUS_RUNNING,))
+        self._execute(
+            'UPDATE jobs SET status = ?, extracted = 0, tagged = 0 '
+            'WHERE status = ?', (STATUS_QUEUED, STATUS_RUNNING))
+        return len(rows)
+
+    def retry_failed(self):
+        """Queue failed jobs again and return how many there were."""
+        rows = self._execute(
+            'SELECT id FROM jobs WHERE status = ?', (STATUS_FAILED,))
+        self._execute(
+            'UPDATE jobs SET status = ?, error = NULL, extracted = 0, '
+            'tagged = 0 WHERE status = ?', (STATUS_QUEUED, STATUS_FAILED))
+        return len(rows)
+
+    def jobs(self, status=None):
+        """
+        List jobs in queue order.
+
+        Args:
+            status: Only jobs with this status (default: all)
+
+        Returns:
+            List of job dicts
+        """
+        if status is None:
+            rows = self._execute('SELECT * FROM jobs ORDER BY id')
+        else:
+            rows = self._execute(
+                'SELECT * FROM jobs WHERE status = ? ORDER BY id', (status,))
+        return [dict(row) for row in rows]
+
+
+def find_pairs(watch_dir, settle_seconds=0):
+    """
+    Find the videos in a folder that have an SRT file next to them.
+
+    Args:
+        watch_dir: Folder to scan (subfolders included)
+        settle_seconds: Skip files modified less than this many seconds
+            ago, which may still be copying
+
+    Returns:
+        Sorted list of (video, srt) paths
+    """
+    pairs = []
+    now = time.time()
+    for root, _, files in os.walk(watch_dir):
+        for name in files:
+            if not name.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            video = os.path.join(root, name)
+            srt = find_srt_for_video(video)
+            if srt is None:
+                continue
+            try:
+                newest = max(os.path.getmtime(video), os.path.getmtime(srt))
+            except OSError:
+                continue
+            if now - newest >= settle_seconds:
+                pairs.append((video, srt))
+    return sorted(pairs)
+
+
+def output_path(output_dir, video, output_format, watch_dir=None):
+    """
+    Return the frame output folder or archive for a video.
+
+    Videos in subfolders of ``watch_dir`` get the subfolders in the name
+    (``card1/DJI_0001.MP4`` -> ``card1_DJI_0001_frames``), so clips with
+    the same name from different card offloads do not share an output.
+    """
+    name = os.path.basename(video)
+    if watch_dir is not None:
+        name = os.path.relpath(video, watch_dir).replace(os.sep, '_')
+    stem = os.path.splitext(name)[0]
+    if output_format in ('dir', 'sharded'):
+        return os.path.join(output_dir, f'{stem}_frames')
+    return os.path.join(output_dir, f'{stem}_frames.{output_format}')
+
+
+def process_job(job, fps_extracted, encoder=None, encoder_workers=None,
+                progress=None, cancel_event=None):
+    """
+    Extract and geotag the frames of one queued job.
+
+    Args:
+        job: Job dict from JobQueue.claim
+        fps_extracted: Frames to extract per second of video
+        encoder: FrameEncoder instance (default: OpenCV JPEG)
+        encoder_workers: Encoder threads for this job
+        progress: Optional callable ``progress(extracted, total)``
+        cancel_event: Optional threading.Event to stop the extraction
+
+    Returns:
+        Extraction result dict (see FrameExtractionJob.run) with the
+        number of ``tagged`` images added
+
+    Raises:
+        RuntimeError: If the SRT file has no GPS data
+    """
+    import frame_extraction
+    import frame_sinks
+    import srt_tag
+    import video_probe
+
+    info = video_probe.probe_video(job['video'])
+    fps = info['fps']
+    if fps <= 0:
+        raise ValueError(f"Cannot read frame rate of {job['video']}")
+    interval = max(1, int(round(fps / fps_extracted)))
+
+    # Positions are embedded by frame time while the frames are written
+    frames_data = srt_tag.parse_srt_file(job['srt'])
+    if not frames_data:
+        raise RuntimeError(f"No GPS data in {job['srt']}")
+
+    output = job['output']
+    if not frame_sinks.is_archive(output):
+        os.makedirs(output, exist_ok=True)
+
+    extraction = frame_extraction.FrameExtractionJob(
+        job['video'], output, 0, info['frame_count'], interval, fps,
+        encoder=encoder, workers=encoder_workers,
+        track=srt_tag.time_lookup(frames_data))
+    result = extraction.run(progress=progress, cancel_event=cancel_event)
+    result['tagged'] = 0 if result['cancelled'] else result['extracted']
+    return result
+
+
+class IngestDaemon:
+    """
+    Watch folder daemon running ingest jobs on a worker pool.
+
+    Args:
+        watch_dir: Folder to watch for video/SRT pairs
+        output_dir: Folder where frame outputs are written
+        queue_path: SQLite queue file (default: ``ingest_queue.sqlite`` in
+            output_dir)
+        workers: Number of jobs processed at the same time
+        fps_extracted: Frames to extract per second of video
+        output_format: 'dir', 'zip' or 'tar'
+        encoder_name: Frame encoder name (see frame_encoders.ENCODERS)
+        preset: Encoder preset
+        settle_seconds: Age a file must have before it is queued
+    """
+
+    def __init__(self, watch_dir, output_dir, queue_path=None, workers=2,
+                 fps_extracted=1.0, output_format='dir', encoder_name=None,
+                 preset=None, settle_seconds=10):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.watch_dir = watch_dir
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.queue = JobQueue(
+            queue_path or os.path.join(output_dir, QUEUE_NAME))
+        self.workers = workers
+        self.fps_extracted = fps_extracted
+        self.output_format = output_format
+        self.encoder_name = encoder_name
+        self.preset = preset
+        self.settle_seconds = settle_seconds
+        self.stop_event = threading.Event()
+        self._slots = threading.Semaphore(workers)
+
+    def scan(self):
+        """Queue new video/SRT pairs and return how many were added."""
+        added = 0
+        for video, srt in find_pairs(self.watch_dir, self.settle_seconds):
+            output = output_path(self.output_dir, video, self.output_format,
+                                 self.watch_dir)
+            if self.queue.enqueue(video, srt, output):
+                if self.output_format == 'sharded':
+                    import frame_sinks
+                    frame_sinks.create_sharded_dir(output)
+                print(f"Queued {video}")
+                added += 1
+        return added
+
+    def _encoder(self):
+        import frame_encoders
+        return frame_encoders.get_encoder(
+            self.encoder_name or frame_encoders.DEFAULT_ENCODER,
+            self.preset or frame_encoders.DEFAULT_PRESET)
+
+    def _run_job(self, job):
+        import frame_extraction
+
+        last_update = [0.0]
+
+        def progress(extracted, total):
+            now = time.monotonic()
+            if now - last_update[0] >= PROGRESS_INTERVAL or \
+                    extracted == total:
+                last_update[0] = now
+                self.queue.update(job['id'], extracted=extracted,
+                                  total=total)
+
+        print(f"Processing {job['video']}")
+        try:
+            # Split the cores between the jobs running at the same time
+            result = process_job(
+                job, self.fps_extracted, self._encoder(),
+                max(1, frame_extraction.DEFAULT_WORKERS // self.workers),
+                progress, self.stop_event)
+            if result['cancelled']:
+                # Stopped by shutdown: run again on the next start
+                self.queue.update(job['id'], status=STATUS_QUEUED,
+                                  extracted=0)
+                return
+            self.queue.update(
+                job['id'], status=STATUS_DONE, extracted=result['extracted'],
+                total=result['total'], tagged=result['tagged'])
+            print(f"Done {job['video']}: {result['extracted']} frames")
+        except Exception as e:
+            self.queue.update(job['id'], status=STATUS_FAILED, error=str(e))
+            print(f"Failed {job['video']}: {e}")
+        finally:
+            self._slots.release()
+
+    def run(self, poll_interval=5.0, once=False):
+        """
+        Watch the folder and process jobs until stopped.
+
+        Args:
+            poll_interval: Seconds between folder scans
+            once: Process what is queued now and return instead of watching
+        """
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"Resuming {requeued} interrupted job(s)")
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            try:
+                self._loop(executor, poll_interval, once)
+            except KeyboardInterrupt:
+                print("Stopping, interrupted jobs will resume on the next "
+                      "start")
+                # Running extractions stop early and are queued again
+                self.stop()
+
+    def _loop(self, executor, poll_interval, once):
+        while not self.stop_event.is_set():
+            self.scan()
+            while self._slots.acquire(blocking=False):
+                job = self.queue.claim()
+                if job is None:
+                    self._slots.release()
+                    break
+                executor.submit(self._run_job, job)
+
+            if once:
+                # Wait for the running jobs, then stop if nothing is left
+                for _ in range(self.workers):
+                    self._slots.acquire()
+                for _ in range(self.workers):
+                    self._slots.release()
+                if not self.queue.jobs(STATUS_QUEUED):
+                    return
+                continue
+            self.stop_event.wait(poll_interval)
+
+    def stop(self):
+        """Stop watching and cancel the running extractions."""
+        self.stop_event.set()
+
+
+def print_status(queue):
+    """Print one line per job with its status and progress."""
+    jobs = queue.jobs()
+    if not jobs:
+        print("No jobs")
+        return
+    for job in jobs:
+        line = f"{job['id']:4d}  {job['status']:8s}  "
+        line += f"{job['extracted']}/{job['total']}  {job['video']}"
+        if job['error']:
+            line += f"  ({job['error']})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Watch a folder and extract/geotag DJI video+SRT pairs',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python ingest_daemon.py watch /media/ingest -o /data/frames -w 3 -f 1
+  python ingest_daemon.py watch /media/ingest -o /data/frames --once
+  python ingest_daemon.py status -o /data/frames
+  python ingest_daemon.py retry -o /data/frames
+        """
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    watch = subparsers.add_parser('watch', help='Watch a folder for videos')
+    watch.add_argument('folder', help='Ingest folder to watch')
+    watch.add_argument('-w', '--workers', type=int, default=2,
+                       help='Videos processed at the same time (default: 2)')
+    watch.add_argument('-f', '--fps-extracted', type=float, default=1.0,
+                       help='Frames extracted per second of video '
+                            '(default: 1)')
+    watch.add_argument('--format', choices=OUTPUT_FORMATS, default='dir',
+                       help='Frame output: folder, folder with subfolders '
+                            'and an index (sharded), zip or tar '
+                            '(default: dir)')
+    watch.add_argument('--encoder', help='Frame encoder (default: '
+                                         'opencv-jpeg)')
+    watch.add_argument('--preset', help='Encoder preset (default: balanced)')
+    watch.add_argument('--poll', type=float, default=5.0,
+                       help='Seconds between folder scans (default: 5)')
+    watch.add_argument('--settle', type=float, default=10.0,
+                       help='Minimum file age in seconds before a video is '
+                            'queued, so copies in progress are skipped '
+                            '(default: 10)')
+    watch.add_argument('--once', action='store_true',
+                       help='Process the current contents and exit')
+
+    status = subparsers.add_parser('status', help='Show the job queue')
+    retry = subparsers.add_parser('retry', help='Queue failed jobs again')
+
+    for sub in (watch, status, retry):
+        sub.add_argument('-o', '--output', required=True,
+                         help='Output folder (holds the job queue)')
+        sub.add_argument('--queue',
+                         help=f'Queue file (default: OUTPUT/{QUEUE_NAME})')
+
+    args = parser.parse_args()
+    queue_path = args.queue or os.path.join(args.output, QUEUE_NAME)
+
+    if args.command == 'status':
+        print_status(JobQueue(queue_path))
+        return
+    if args.command == 'retry':
+        print(f"Queued {JobQueue(queue_path).retry_failed()} failed job(s)")
+        return
+
+    if not os.path.isdir(args.folder):
+        print(f"Error: Folder not found: {args.folder}")
+        sys.exit(1)
+    if args.workers < 1:
+        print(f"Error: Workers must be at least 1, got {args.workers}")
+        sys.exit(1)
+    if args.fps_extracted <= 0:
+        print(
+            f"Error: Extracted FPS must be greater than 0, got "
+            f"{args.fps_extracted}")
+        sys.exit(1)
+
+    daemon = IngestDaemon(
+        args.folder, args.output, queue_path, args.workers,
+        args.fps_extracted, args.format, args.encoder, args.preset,
+        args.settle)
+    print(f"Watching {args.folder} with {args.workers} worker(s)")
+    daemon.run(args.poll, once=args.once)
+
+
+if __name__ == '__main__':
+    main()
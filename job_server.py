@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""
+Job Server - HTTP API for frame extraction and geotagging jobs
+
+A small asyncio HTTP service (standard library only) on top of the headless
+extraction and tagging functions, for tools that cannot drive the Tk GUI or
+the shell scripts. Jobs run on a bounded thread pool; clients follow their
+progress by polling or through a server-sent events stream and fetch the
+output manifest when they finish.
+
+Endpoints:
+    POST   /jobs                 Submit a job (JSON body, see JobManager.submit)
+    GET    /jobs                 List all jobs
+    GET    /jobs/<id>            Job status and progress
+    GET    /jobs/<id>/events     Progress as server-sent events
+    GET    /jobs/<id>/manifest   Output manifest of a finished job
+    DELETE /jobs/<id>            Cancel a job
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+FINAL_STATUSES = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+DEFAULT_PORT = 8765
+MAX_BODY_SIZE = 1024 * 1024
+PROFILE_FIELDS = ('name', 'output', 'size', 'encoder', 'preset', 'quality',
+                  'layout')
+
+REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request',
+           404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 413: 'Payload Too Large'}
+
+
+class JobError(Exception):
+    """Invalid job request; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    """
+    State of one submitted job.
+
+    Progress is written from a worker thread and read from the event loop,
+    so every change goes through ``lock`` and wakes up the event streams.
+    """
+
+    def __init__(self, job_id, spec):
+        self.id = job_id
+        self.spec = spec
+        self.status = STATUS_QUEUED
+        self.extracted = 0
+        self.total = 0
+        self.error = None
+        self.manifest = None
+        self.created = time.time()
+        self.finished = None
+        self.version = 0
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self._waiters = []
+
+    def snapshot(self):
+        """
+        Return the public state of the job as a dict.
+
+        ``output`` is None for jobs with ``profiles``; their outputs are in
+        ``outputs``, by profile name.
+        """
+        outputs = {item['name']: item['output']
+                   for item in self.spec.get('profiles') or []}
+        with self.lock:
+            return {'id': self.id, 'status': self.status,
+                    'extracted': self.extracted, 'total': self.total,
+                    'error': self.error, 'video': self.spec['video'],
+                    'output': self.spec.get('output'), 'outputs': outputs,
+                    'created': self.created, 'finished': self.finished,
+                    'version': self.version}
+
+    def update(self, **fields):
+        """Change job fields and notify the waiting event streams."""
+        with self.lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            if self.status in FINAL_STATUSES and self.finished is None:
+                self.finished = time.time()
+            self.version += 1
+            waiters, self._waiters = self._waiters, []
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait_change(self, version, timeout=None):
+        """
+        Wait until the job changes past ``version`` (event loop side).
+
+        Returns:
+            True if it changed, False on timeout
+        """
+        event = asyncio.Event()
+        with self.lock:
+            if self.version != version:
+                return True
+            self._waiters.append((asyncio.get_running_loop(), event))
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+def _number(spec, name, default=None, minimum=None, integer=False):
+    value = spec.get(name, default)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise JobError(f"'{name}' must be a number")
+    if integer and not isinstance(value, int):
+        raise JobError(f"'{name}' must be an integer")
+    if minimum is not None and value < minimum:
+        raise JobError(f"'{name}' must be at least {minimum}")
+    return value
+
+
+def _profiles(spec):
+    # Output profiles of a job, or None when it has a single 'output'
+    import output_profiles
+
+    items = spec.get('profiles')
+    if items is None:
+        return None
+    if not isinstance(items, list) or \
+            not all(isinstance(item, dict) for item in items):
+        raise JobError("'profiles' must be a list of objects")
+    profiles = []
+    for item in items:
+        unknown = set(item) - set(PROFILE_FIELDS)
+        if unknown:
+            raise JobError(f"Unknown profile field(s): "
+                           f"{', '.join(sorted(unknown))}")
+        for name in ('name', 'output'):
+            if not isinstance(item.get(name), str) or not item[name]:
+                raise JobError(f"Profile '{name}' is required")
+        _number(item, 'size', minimum=1)
+        _number(item, 'quality', minimum=1)
+        try:
+            profiles.append(output_profiles.make_profile(**item))
+        except ValueError as e:
+            raise JobError(str(e))
+    try:
+        output_profiles.check_profiles(profiles)
+    except ValueError as e:
+        raise JobError(str(e))
+    return profiles
+
+
+def _check_decoding(spec):
+    import frame_decoders
+
+    for name in ('cache', 'keyframes_only'):
+        if not isinstance(spec.get(name, False), bool):
+            raise JobError(f"'{name}' must be true or false")
+    if spec.get('decoder', frame_decoders.DEFAULT_DECODER) not in \
+            frame_decoders.DECODERS:
+        raise JobError(f"'decoder' must be one of "
+                       f"{', '.join(frame_decoders.DECODERS)}")
+
+
+def _check_track(spec):
+    if spec.get('track') is None:
+        if 'track_offset' in spec:
+            raise JobError("'track_offset' requires 'track'")
+        return
+    if spec.get('srt') is not None:
+        raise JobError("Give either 'srt' or 'track'")
+    if not isinstance(spec['track'], str) or \
+            not os.path.isfile(spec['track']):
+        raise JobError(f"Track file not found: {spec['track']}")
+    import gps_tracks
+    try:
+        gps_tracks.track_format(spec['track'])
+    except ValueError as e:
+        raise JobError(str(e))
+    _number(spec, 'track_offset')
+
+
+def _check_camera(path):
+    import undistort
+
+    if not os.path.isfile(path):
+        raise JobError(f"Camera file not found: {path}")
+    try:
+        undistort.load_camera(path)
+    except ValueError as e:
+        raise JobError(str(e))
+
+
+class JobManager:
+    """
+    Validates, schedules and tracks jobs on a bounded executor.
+
+    Args:
+        max_workers: Jobs running at the same time; further jobs wait
+        encoder_workers: Encoder threads inside each job
+    """
+
+    def __init__(self, max_workers=2, encoder_workers=None):
+        self.jobs = {}
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.encoder_workers = encoder_workers
+
+    def submit(self, spec):
+        """
+        Validate a job request and queue it.
+
+        Args:
+            spec: Dict with
+                ``video`` (required): path to the video file;
+                ``output`` (required): output folder or .zip/.tar archive;
+                ``layout``: 'flat' (default) or 'sharded' folder layout;
+                or ``profiles``: list of outputs written from the same
+                decode, each an object with ``name``, ``output`` and
+                optional ``size`` (longest side in pixels), ``encoder``,
+                ``preset``, ``quality`` and ``layout``;
+                ``srt``: SRT file used to geotag the frames;
+                or ``track``: GPX, CSV or JSON track file giving every frame
+                its position while it is extracted, with ``track_offset``:
+                seconds from the first track point to the start of the
+                video (default 0);
+                ``start_time`` / ``end_time``: range in seconds (default:
+                whole video);
+                ``interval``: save one frame every N frames, or
+                ``fps_extracted``: frames to save per second (default 1);
+                ``encoder`` / ``preset``: frame encoder settings;
+                ``vfr``: use the per-frame PTS index (variable frame rate);
+                ``camera``: camera JSON file used to undistort the frames;
+                ``cache``: reuse and store frames in the frame cache;
+                ``decoder``: decoder backend ('opencv' or 'ffmpeg');
+                ``keyframes_only``: save only keyframes, at least
+                ``interval`` frames apart
+
+        Returns:
+            Job instance
+
+        Raises:
+            JobError: If the request is invalid
+        """
+        import frame_encoders
+        import frame_sinks
+
+        if not isinstance(spec, dict):
+            raise JobError("Job must be a JSON object")
+        if 'output' in spec and 'profiles' in spec:
+            raise JobError("Give either 'output' or 'profiles'")
+        for name in ('video',) if 'profiles' in spec else ('video', 'output'):
+            if not isinstance(spec.get(name), str) or not spec[name]:
+                raise JobError(f"'{name}' is required")
+        if not os.path.isfile(spec['video']):
+            raise JobError(f"Video not found: {spec['video']}")
+        if spec.get('srt') is not None and not os.path.isfile(spec['srt']):
+            raise JobError(f"SRT file not found: {spec['srt']}")
+        if 'interval' in spec and 'fps_extracted' in spec:
+            raise JobError("Give either 'interval' or 'fps_extracted'")
+        start_time = _number(spec, 'start_time', default=0, minimum=0)
+        end_time = _number(spec, 'end_time', minimum=0)
+        if end_time is not None and start_time >= end_time:
+            raise JobError("'start_time' must be before 'end_time'")
+        _number(spec, 'interval', minimum=1, integer=True)
+        if _number(spec, 'fps_extracted') is not None and \
+                spec['fps_extracted'] <= 0:
+            raise JobError("'fps_extracted' must be greater than 0")
+        _profiles(spec)
+        if spec.get('layout', 'flat') not in frame_sinks.FOLDER_LAYOUTS:
+            raise JobError(f"'layout' must be one of "
+                           f"{', '.join(frame_sinks.FOLDER_LAYOUTS)}")
+        if spec.get('camera') is not None:
+            _check_camera(spec['camera'])
+        _check_track(spec)
+        _check_decoding(spec)
+        try:
+            frame_encoders.get_encoder(
+                spec.get('encoder', frame_encoders.DEFAULT_ENCODER),
+                spec.get('preset', frame_encoders.DEFAULT_PRESET))
+        except ValueError as e:
+            raise JobError(str(e))
+
+        job = Job(uuid.uuid4().hex[:12], spec)
+        self.jobs[job.id] = job
+        self.executor.submit(self._run, job)
+        return job
+
+    def cancel(self, job_id):
+        """Request cancellation of a job and return it."""
+        job = self.jobs[job_id]
+        job.cancel_event.set()
+        if job.status == STATUS_QUEUED:
+            job.update(status=STATUS_CANCELLED)
+        return job
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            return
+        job.update(status=STATUS_RUNNING)
+        try:
+            job.update(**run_job(job.spec, job.update, job.cancel_event,
+                                 self.encoder_workers))
+        except Exception as e:
+            job.update(status=STATUS_FAILED, error=str(e))
+
+    def shutdown(self):
+        """Cancel every job and wait for the workers to stop."""
+        for job in self.jobs.values():
+            job.cancel_event.set()
+        self.executor.shutdown(wait=True)
+
+
+def run_job(spec, update, cancel_event=None, encoder_workers=None):
+    """
+    Extract the frames described by a job spec, with their positions.
+
+    Args:
+        spec: Validated job spec (see JobManager.submit)
+        update: Callable receiving progress fields as keyword arguments
+        cancel_event: Optional threading.Event to stop the extraction
+        encoder_workers: Encoder threads (default: extraction default)
+
+    Returns:
+        Final job fields: ``status`` and ``manifest``
+    """
+    import frame_encoders
+    import frame_extraction
+    import output_profiles
+    import srt_tag
+    import video_probe
+
+    info = video_probe.probe_video(spec['video'])
+    fps = info['fps']
+    if fps <= 0:
+        raise ValueError(f"Cannot read frame rate of {spec['video']}")
+    if 'interval' in spec:
+        interval = spec['interval']
+    else:
+        interval = max(1, int(round(fps / spec.get('fps_extracted', 1.0))))
+
+    index = None
+    if spec.get('vfr'):
+        import pts_index
+        index = pts_index.load_or_build(spec['video'])
+
+    profiles = _profiles(spec)
+    track = None
+    if profiles is None:
+        profiles = [output_profiles.OutputProfile(
+            'output', spec['output'], frame_encoders.get_encoder(
+                spec.get('encoder', frame_encoders.DEFAULT_ENCODER),
+                spec.get('preset', frame_encoders.DEFAULT_PRESET)),
+            layout=spec.get('layout', 'flat'))]
+    if spec.get('srt'):
+        # Positions are embedded by frame time as each image is written
+        frames_data = srt_tag.parse_srt_file(spec['srt'])
+        if not frames_data:
+            raise RuntimeError(f"No GPS data in {spec['srt']}")
+        track = srt_tag.time_lookup(frames_data)
+    if spec.get('track'):
+        import gps_tracks
+        track = gps_tracks.load_track(spec['track']).lookup(
+            spec.get('track_offset', 0))
+    undistorter = None
+    if spec.get('camera'):
+        import undistort
+        undistorter = undistort.load_camera(spec['camera'])
+    cache = None
+    if spec.get('cache'):
+        import frame_cache
+        cache = frame_cache.FrameCache()
+    output_profiles.make_output_dirs(profiles)
+    job = frame_extraction.FrameExtractionJob.for_time_range(
+        spec['video'], None, spec.get('start_time', 0),
+        spec.get('end_time', info['duration']), interval, fps,
+        pts_index=index, workers=encoder_workers, track=track,
+        profiles=profiles, undistort=undistorter, cache=cache,
+        decoder=spec.get('decoder'),
+        keyframes_only=spec.get('keyframes_only', False))
+
+    def progress(extracted, total):
+        update(extracted=extracted, total=total)
+
+    update(total=job.total_to_extract())
+    result = job.run(progress=progress, cancel_event=cancel_event)
+    if result['cancelled']:
+        return {'status': STATUS_CANCELLED}
+
+    encoder = profiles[0].encoder
+    manifest = {'video': spec['video'], 'output': result['output'],
+                'outputs': result['outputs'],
+                'extracted': result['extracted'],
+                'tagged': track is not None,
+                'encoder': encoder.describe(),
+                'profiles': [profile.describe() for profile in profiles],
+                'interval': interval, 'fps': fps,
+                'frames': result['records']}
+    return {'status': STATUS_DONE, 'manifest': manifest}
+
+
+class JobServer:
+    """
+    Minimal HTTP/1.1 server exposing a JobManager.
+
+    Args:
+        manager: JobManager instance
+        host: Address to listen on
+        port: Port (0 picks a free one)
+    """
+
+    def __init__(self, manager, host='127.0.0.1', port=DEFAULT_PORT):
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        """Start listening; sets ``port`` to the bound port."""
+        self.server = await asyncio.start_server(
+            self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Start the server if needed and serve until cancelled."""
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await self._read_request(reader)
+            if request is not None:
+                await self._dispatch(writer, *request)
+        except JobError as e:
+            self._send_json(writer, e.status, {'error': str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise JobError("Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise JobError("Invalid Content-Length header")
+        if length > MAX_BODY_SIZE:
+            raise JobError("Request body too large", 413)
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target.split('?', 1)[0], body
+
+    async def _dispatch(self, writer, method, path, body):
+        parts = [part for part in path.split('/') if part]
+        if not parts or parts[0] != 'jobs' or len(parts) > 3:
+            raise JobError(f"Unknown path: {path}", 404)
+
+        if len(parts) == 1:
+            if method == 'GET':
+                jobs = [job.snapshot() for job in self.manager.jobs.values()]
+                self._send_json(writer, 200, {'jobs': jobs})
+            elif method == 'POST':
+                try:
+                    spec = json.loads(body.decode('utf-8') or 'null')
+                except ValueError:
+                    raise JobError("Body is not valid JSON")
+                job = self.manager.submit(spec)
+                self._send_json(writer, 202, job.snapshot())
+            else:
+                raise JobError(f"Method {method} not allowed", 405)
+            return
+
+        job = self.manager.jobs.get(parts[1])
+        if job is None:
+            raise JobError(f"Unknown job: {parts[1]}", 404)
+        action = parts[2] if len(parts) == 3 else None
+
+        if action is None and method == 'GET':
+            self._send_json(writer, 200, job.snapshot())
+        elif action is None and method == 'DELETE':
+            self._send_json(writer, 200, self.manager.cancel(job.id).snapshot())
+        elif action == 'manifest' and method == 'GET':
+            if job.status != STATUS_DONE:
+                raise JobError(f"Job is {job.status}, no manifest yet", 409)
+            self._send_json(writer, 200, job.manifest)
+        elif action == 'events' and method == 'GET':
+            await self._stream_events(writer, job)
+        else:
+            raise JobError(f"Unknown path: {path}", 404)
+
+    async def _stream_events(self, writer, job):
+        writer.write(b'HTTP/1.1 200 OK\r\n'
+                     b'Content-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\n'
+                     b'Connection: close\r\n\r\n')
+        while True:
+            state = job.snapshot()
+            writer.write(f"event: {state['status']}\n"
+                         f"data: {json.dumps(state)}\n\n".encode('utf-8'))
+            await writer.drain()
+            if state['status'] in FINAL_STATUSES:
+                return
+            if not await job.wait_change(state['version'], timeout=15):
+                # Comment line keeps proxies from closing an idle stream
+                writer.write(b': keep-alive\n\n')
+
+    @staticmethod
+    def _send_json(writer, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + body)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='HTTP API for frame extraction and geotagging jobs',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python job_server.py --port 8765 --jobs 2
+  curl -X POST localhost:8765/jobs -d '{"video": "DJI_0123.MP4",
+      "srt": "DJI_0123.SRT", "output": "frames.zip", "fps_extracted": 1}'
+  curl localhost:8765/jobs/<id>/events
+  curl localhost:8765/jobs/<id>/manifest
+        """
+    )
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('-j', '--jobs', type=int, default=2,
+                        help='Jobs running at the same time (default: 2)')
+    args = parser.parse_args()
+
+    manager = JobManager(max_workers=max(1, args.jobs))
+    server = JobServer(manager, args.host, args.port)
+
+    async def serve():
+        await server.start()
+        print(f"Listening on http://{server.host}:{server.port}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("Stopping, cancelling running jobs")
+    finally:
+        manager.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Output Profiles - Several image outputs from one decoded frame
+
+A profile names one output of an extraction: its folder or archive, its
+maximum size and its encoder. A FrameExtractionJob given several profiles
+decodes every selected frame once and writes it to all of them (full
+resolution for photogrammetry, a preview size for review, thumbnails for a
+catalog...), instead of re-reading the saved images in later resize passes.
+
+Smaller profiles are resized from the next larger one rather than from the
+full frame, which is cheaper and looks the same with area interpolation.
+"""
+
+import os
+
+import cv2
+
+import frame_encoders
+import frame_sinks
+
+
+PROFILE_KEYS = ('size', 'encoder', 'preset', 'quality', 'layout')
+
+
+class OutputProfile:
+    """
+    One named output of an extraction.
+
+    Args:
+        name: Profile name, used in logs and result dicts
+        output: Output folder, or .zip/.tar archive path
+        encoder: FrameEncoder instance (default: OpenCV JPEG, balanced)
+        max_size: Maximum length in pixels of the longest side, or None to
+            keep the full resolution; frames are never enlarged
+        layout: Folder layout, 'flat' or 'sharded' (see frame_sinks);
+            ignored for archives
+    """
+
+    def __init__(self, name, output, encoder=None, max_size=None,
+                 layout='flat'):
+        if max_size is not None and max_size < 1:
+            raise ValueError(f"Profile '{name}': size must be at least 1")
+        if layout not in frame_sinks.FOLDER_LAYOUTS:
+            raise ValueError(
+                f"Profile '{name}': layout must be one of "
+                f"{', '.join(frame_sinks.FOLDER_LAYOUTS)}")
+        self.name = name
+        self.output = output
+        self.encoder = encoder or frame_encoders.get_encoder()
+        self.max_size = max_size
+        self.layout = layout
+
+    def describe(self):
+        """Return a short label such as ``preview:1920:opencv-jpeg:fast``."""
+        size = self.max_size or 'full'
+        return f"{self.name}:{size}:{self.encoder.describe()}"
+
+    def resize(self, frame):
+        """
+        Return the frame scaled down to the profile size.
+
+        The frame itself is returned when it already fits.
+        """
+        height, width = frame.shape[:2]
+        longest = max(height, width)
+        if self.max_size is None or longest <= self.max_size:
+            return frame
+        scale = self.max_size / longest
+        size = (max(1, int(round(width * scale))),
+                max(1, int(round(height * scale))))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def make_profile(name, output, size=None, encoder=None, preset=None,
+                 quality=None, layout='flat'):
+    """
+    Create a profile from plain settings (as given on a command line or in
+    a JSON job).
+
+    Args:
+        name: Profile name
+        output: Output folder or archive
+        size: Longest side in pixels, or None for full resolution
+        encoder: Encoder name (default: frame_encoders.DEFAULT_ENCODER)
+        preset: Encoder preset (default: frame_encoders.DEFAULT_PRESET)
+        quality: Optional quality overriding the preset (lossy encoders)
+        layout: Folder layout, 'flat' or 'sharded'
+
+    Returns:
+        OutputProfile instance
+
+    Raises:
+        ValueError: If a setting is invalid
+    """
+    encoder = encoder or frame_encoders.DEFAULT_ENCODER
+    options = {}
+    if quality is not None:
+        if encoder not in frame_encoders.ENCODERS or \
+                'quality' not in frame_encoders.ENCODERS[encoder].presets[
+                    frame_encoders.DEFAULT_PRESET]:
+            raise ValueError(
+                f"Profile '{name}': encoder '{encoder}' has no quality "
+                f"setting")
+        if not 1 <= quality <= 100:
+            raise ValueError(
+                f"Profile '{name}': quality must be between 1 and 100")
+        options['quality'] = quality
+    return OutputProfile(
+        name, output,
+        frame_encoders.get_encoder(
+            encoder, preset or frame_encoders.DEFAULT_PRESET, **options),
+        size, layout)
+
+
+def parse_profile(text):
+    """
+    Parse a profile given as ``name=output[,key=value...]``.
+
+    Keys are ``size``, ``encoder``, ``preset``, ``quality`` and ``layout``,
+    for example ``preview=previews/,size=1920,quality=85``.
+
+    Returns:
+        OutputProfile instance
+
+    Raises:
+        ValueError: If the text is malformed or a setting is invalid
+    """
+    parts = [part.strip() for part in text.split(',')]
+    name, _, output = parts[0].partition('=')
+    if not name or not output:
+        raise ValueError(f"Invalid profile '{text}', expected "
+                         f"name=output[,key=value...]")
+    settings = {}
+    for part in parts[1:]:
+        key, _, value = part.partition('=')
+        if key not in PROFILE_KEYS or not value:
+            raise ValueError(f"Invalid profile setting '{part}' in '{text}'")
+        if key in ('size', 'quality'):
+            try:
+                value = int(value)
+            except ValueError:
+                raise ValueError(
+                    f"Profile '{name}': {key} must be a whole number")
+        settings[key] = value
+    return make_profile(name, output, **settings)
+
+
+def cli_profiles(output, texts):
+    """
+    Build the profiles of a command line with ``-o`` and ``--profile``.
+
+    Args:
+        output: Main output (``-o``), or None; kept at full resolution with
+            the default encoder as profile 'output'
+        texts: ``--profile`` values (see parse_profile)
+
+    Returns:
+        Checked list of OutputProfile
+
+    Raises:
+        ValueError: If a profile is invalid or none is given
+    """
+    profiles = [OutputProfile('output', output)] if output else []
+    profiles.extend(parse_profile(text) for text in texts)
+    check_profiles(profiles)
+    return profiles
+
+
+def check_profiles(profiles):
+    """
+    Validate a list of profiles for one extraction.
+
+    Raises:
+        ValueError: If the list is empty or names or outputs repeat
+    """
+    if not profiles:
+        raise ValueError("At least one output profile is required")
+    for attr in ('name', 'output'):
+        values = [getattr(profile, attr) for profile in profiles]
+        if len(set(values)) != len(values):
+            raise ValueError(f"Output profiles must have different {attr}s")
+
+
+def make_output_dirs(profiles):
+    """Create the output folders of profiles that do not write archives."""
+    for profile in profiles:
+        if frame_sinks.is_archive(profile.output):
+            continue
+        if profile.layout == 'sharded':
+            frame_sinks.create_sharded_dir(profile.output)
+        else:
+            os.makedirs(profile.output, exist_ok=True)
+
+
+def render(frame, profiles):
+    """
+    Yield ``(profile, image)`` for every profile, largest first.
+
+    Each image is resized from the previous (larger) one, so the full frame
+    is scaled down only once however many small profiles there are.
+    """
+    order = sorted(profiles,
+                   key=lambda p: -(p.max_size or float('inf')))
+    image = frame
+    for profile in order:
+        image = profile.resize(image)
+        yield profile, image
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+PTS Index - Per-frame presentation timestamps for variable frame rate video
+
+DJI and phone footage is often variable frame rate, so ``frame / fps`` drifts
+away from the real frame times. This module builds an index with the
+presentation timestamp of every frame in one pass (ffprobe packet scan when
+available, OpenCV grab pass otherwise) and caches it in a sidecar file next
+to the video, keyed by the video size and modification time.
+
+Frame indices are 0-based positions in display order; frame *numbers* as
+used in file names (``frame_000030_...``) are 1-based, so frame number ``n``
+is at index ``n - 1``.
+"""
+
+import os
+import subprocess
+
+import numpy as np
+
+import video_probe
+
+SIDECAR_SUFFIX = '.pts.npz'
+
+
+class PtsIndex:
+    """
+    Presentation timestamps of every frame of a video.
+
+    Args:
+        times: Sequence of frame times in seconds, in display order
+        keyframes: Optional sequence of booleans marking keyframes
+    """
+
+    def __init__(self, times, keyframes=None):
+        self.times = np.asarray(times, dtype=np.float64)
+        if keyframes is None:
+            keyframes = np.zeros(len(self.times), dtype=bool)
+        self.keyframes = np.asarray(keyframes, dtype=bool)
+
+    @classmethod
+    def constant(cls, fps, count):
+        """Index for a constant frame rate video."""
+        return cls(np.arange(count, dtype=np.float64) / fps)
+
+    def __len__(self):
+        return len(self.times)
+
+    def timestamp(self, frame_number):
+        """Return the time in seconds of a 1-based frame number."""
+        return float(self.times[frame_number - 1])
+
+    def first_frame_at(self, seconds):
+        """Return the 0-based index of the first frame at or after a time."""
+        return int(np.searchsorted(self.times, seconds, side='left'))
+
+    def last_frame_until(self, seconds):
+        """Return the 1-based number of the last frame at or before a time."""
+        return int(np.searchsorted(self.times, seconds, side='right'))
+
+    def nearest_frame(self, seconds):
+        """Return the 0-based index of the frame closest to a time."""
+        pos = int(np.searchsorted(self.times, seconds))
+        if pos <= 0:
+            return 0
+        if pos >= len(self.times):
+            return len(self.times) - 1
+        before, after = self.times[pos - 1], self.times[pos]
+        return pos - 1 if seconds - before <= after - seconds else pos
+
+    def duration(self):
+        """Return the video duration, including the last frame."""
+        if len(self.times) == 0:
+            return 0.0
+        if len(self.times) == 1:
+            return float(self.times[0])
+        last_step = self.times[-1] - self.times[-2]
+        return float(self.times[-1] + last_step)
+
+    def average_fps(self):
+        """Return the mean frame rate over the whole video."""
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / float(self.times[-1] - self.times[0])
+
+    def is_variable_rate(self, tolerance=0.01):
+        """True if frame intervals differ by more than ``tolerance``."""
+        if len(self.times) < 3:
+            return False
+        steps = np.diff(self.times)
+        mean = steps.mean()
+        return bool(np.max(np.abs(steps - mean)) > tolerance * mean)
+
+
+def _probe_with_opencv(video_path):
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    times = []
+    try:
+        while cap.grab():
+            times.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+    finally:
+        cap.release()
+    times = np.asarray(times, dtype=np.float64)
+    if len(times):
+        times -= times[0]
+    return times, None
+
+
+def build_index(video_path):
+    """
+    Scan a video and build its PTS index.
+
+    Uses ffprobe (packet timestamps, no decoding) when it is installed and
+    falls back to an OpenCV grab pass.
+
+    Args:
+        video_path: Path to video file
+
+    Returns:
+        PtsIndex instance
+    """
+    try:
+        times, keyframes = video_probe.ffprobe_packets(video_path)
+        if len(times):
+            return PtsIndex(times, keyframes)
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        pass
+    times, keyframes = _probe_with_opencv(video_path)
+    return PtsIndex(times, keyframes)
+
+
+def sidecar_path(video_path):
+    """Return the path of the cached index for a video."""
+    return video_path + SIDECAR_SUFFIX
+
+
+def _fingerprint(video_path):
+    stat = os.stat(video_path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def save_index(index, video_path, path=None):
+    """
+    Write an index to its sidecar file.
+
+    Args:
+        index: PtsIndex instance
+        video_path: Video the index belongs to
+        path: Sidecar path (default: sidecar_path(video_path))
+    """
+    path = path or sidecar_path(video_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, times=index.times, keyframes=index.keyframes,
+                 fingerprint=_fingerprint(video_path))
+    os.replace(tmp_path, path)
+
+
+def load_index(video_path, path=None):
+    """
+    Read a cached index if it matches the current video file.
+
+    Args:
+        video_path: Path to video file
+        path: Sidecar path (default: sidecar_path(video_path))
+
+    Returns:
+        PtsIndex instance, or None if missing or stale
+    """
+    path = path or sidecar_path(video_path)
+    try:
+        with np.load(path) as data:
+            if not np.array_equal(data['fingerprint'],
+                                  _fingerprint(video_path)):
+                return None
+            return PtsIndex(data['times'], data['keyframes'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def load_or_build(video_path, cache=True):
+    """
+    Return the PTS index of a video, building and caching it if needed.
+
+    Args:
+        video_path: Path to video file
+        cache: Read and write the sidecar file
+
+    Returns:
+        PtsIndex instance
+    """
+    if cache:
+        index = load_index(video_path)
+        if index is not None:
+            return index
+    index = build_index(video_path)
+    if cache:
+        try:
+            save_index(index, video_path)
+        except OSError:
+            # Read-only media: the index still works for this run
+            pass
+    return index
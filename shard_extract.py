@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Shard Extract - Split extraction across processes and machines
+
+The coordinator splits a long video, or a list of clips, into frame-range
+shards and writes them as small JSON files into a shared directory (e.g. an
+NFS or SMB share). Workers on any node claim shards by renaming them from
+``pending/`` to ``claimed/`` (a rename succeeds for exactly one worker),
+extract and geotag their range and move them to ``done/``. A claimed shard
+whose heartbeat stops for longer than the timeout (crashed or disconnected
+worker) goes back to ``pending/`` for another worker.
+
+Shard boundaries fall on the extraction interval and frames get their GPS
+position from the SRT as they are written, so the frames and their EXIF are
+identical to a single-node run over the same range.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+MANIFEST_NAME = 'manifest.json'
+STATES = ('pending', 'claimed', 'done', 'failed')
+DEFAULT_SHARD_FRAMES = 1800
+DEFAULT_TIMEOUT = 300
+MAX_ATTEMPTS = 3
+
+
+def _write_json(path, data):
+    # Readers on other nodes must never see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def shard_ranges(start_frame, end_frame, interval, shard_frames):
+    """
+    Split a frame range into shards aligned on the extraction interval.
+
+    A job saves the frames ``start + k * interval`` after its start, so
+    shards that start on that grid save exactly the frames a single job over
+    the whole range would.
+
+    Args:
+        start_frame: First frame of the range
+        end_frame: Last frame of the range
+        interval: Extraction interval in frames
+        shard_frames: Approximate frames per shard
+
+    Returns:
+        List of (start_frame, end_frame) tuples
+    """
+    step = max(interval, (shard_frames // interval) * interval)
+    ranges = []
+    start = start_frame
+    while start < end_frame:
+        ranges.append((start, min(start + step, end_frame)))
+        start += step
+    return ranges
+
+
+def plan(shared_dir, videos, output_dir, interval=None, fps_extracted=None,
+         start_time=0, end_time=None, shard_frames=DEFAULT_SHARD_FRAMES,
+         encoder=None, preset=None, use_srt=True):
+    """
+    Write the manifest and the pending shards of a sharded extraction.
+
+    Args:
+        shared_dir: Directory shared by all workers
+        videos: List of video paths (each gets ``<stem>_frames`` in
+            output_dir)
+        output_dir: Output folder, reachable from every worker
+        interval: Save one frame every N frames, or
+        fps_extracted: Frames to save per second (default 1)
+        start_time: Start of the range in every video (seconds)
+        end_time: End of the range (default: end of each video)
+        shard_frames: Approximate frames per shard
+        encoder: Frame encoder name (default: opencv-jpeg)
+        preset: Encoder preset (default: balanced)
+        use_srt: Geotag frames with the SRT next to each video
+
+    Returns:
+        Number of shards written
+    """
+    import frame_encoders
+    import video_probe
+    from srt_concat import find_srt_for_video
+
+    for state in STATES:
+        os.makedirs(os.path.join(shared_dir, state), exist_ok=True)
+
+    manifest = {
+        'created': time.time(),
+        'output': os.path.abspath(output_dir),
+        'encoder': encoder or frame_encoders.DEFAULT_ENCODER,
+        'preset': preset or frame_encoders.DEFAULT_PRESET,
+        'videos': [],
+    }
+    shards = []
+    for video_idx, video in enumerate(videos):
+        info = video_probe.probe_video(video)
+        fps = info['fps']
+        if fps <= 0:
+            raise ValueError(f"Cannot read frame rate of {video}")
+        step = interval or max(1, int(round(fps / (fps_extracted or 1.0))))
+        start_frame = int(start_time * fps)
+        end_frame = info['frame_count'] if end_time is None else \
+            min(int(end_time * fps), info['frame_count'])
+        stem = os.path.splitext(os.path.basename(video))[0]
+        srt = find_srt_for_video(video) if use_srt else None
+        output = os.path.join(manifest['output'], f'{stem}_frames')
+        manifest['videos'].append({
+            'video': os.path.abspath(video), 'srt': srt and os.path.abspath(srt),
+            'output': output, 'fps': fps, 'interval': step,
+            'start_frame': start_frame, 'end_frame': end_frame})
+
+        for shard_idx, (first, last) in enumerate(
+                shard_ranges(start_frame, end_frame, step, shard_frames)):
+            shards.append({'id': f'{video_idx:03d}-{shard_idx:05d}',
+                           'video_index': video_idx, 'start_frame': first,
+                           'end_frame': last, 'attempts': 0})
+
+    # Manifest first: workers may start as soon as a shard is pending
+    manifest['shards'] = [shard['id'] for shard in shards]
+    _write_json(os.path.join(shared_dir, MANIFEST_NAME), manifest)
+    for shard in shards:
+        _write_json(os.path.join(shared_dir, 'pending',
+                                 shard['id'] + '.json'), shard)
+    return len(shards)
+
+
+def shard_counts(shared_dir):
+    """Return the number of shards in every state."""
+    counts = {}
+    for state in STATES:
+        path = os.path.join(shared_dir, state)
+        counts[state] = len([name for name in os.listdir(path)
+                             if name.endswith('.json')])
+    return counts
+
+
+def reclaim_stale(shared_dir, timeout=DEFAULT_TIMEOUT):
+    """
+    Move claimed shards without a recent heartbeat back to pending.
+
+    Args:
+        shared_dir: Shared directory
+        timeout: Seconds without heartbeat after which a claim is dropped
+
+    Returns:
+        List of reclaimed shard ids
+    """
+    claimed_dir = os.path.join(shared_dir, 'claimed')
+    reclaimed = []
+    now = time.time()
+    for name in os.listdir(claimed_dir):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(claimed_dir, name)
+        try:
+            if now - os.path.getmtime(path) < timeout:
+                continue
+            os.rename(path, os.path.join(shared_dir, 'pending', name))
+        except OSError:
+            # Finished, refreshed or reclaimed by someone else meanwhile
+            continue
+        reclaimed.append(name[:-5])
+    return reclaimed
+
+
+class ShardWorker:
+    """
+    Claims and processes shards from a shared directory.
+
+    Args:
+        shared_dir: Shared directory written by plan
+        worker_id: Name recorded in claimed and done shards
+        timeout: Heartbeat timeout used to reclaim stale shards
+        encoder_workers: Encoder threads per shard
+    """
+
+    def __init__(self, shared_dir, worker_id=None, timeout=DEFAULT_TIMEOUT,
+                 encoder_workers=None):
+        self.shared_dir = shared_dir
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+        self.timeout = timeout
+        self.encoder_workers = encoder_workers
+        self.manifest = _read_json(os.path.join(shared_dir, MANIFEST_NAME))
+        self._tracks = {}
+
+    def _path(self, state, shard_id):
+        return os.path.join(self.shared_dir, state, shard_id + '.json')
+
+    def claim(self):
+        """
+        Claim the next pending shard.
+
+        Returns:
+            Shard dict, or None if no shard could be claimed
+        """
+        pending_dir = os.path.join(self.shared_dir, 'pending')
+        for name in sorted(os.listdir(pending_dir)):
+            if not name.endswith('.json'):
+                continue
+            shard_id = name[:-5]
+            try:
+                os.rename(self._path('pending', shard_id),
+                          self._path('claimed', shard_id))
+                # A rename keeps the old mtime; refresh it before anyone
+                # takes the claim for a stale one
+                os.utime(self._path('claimed', shard_id))
+            except OSError:
+                # Another worker was faster
+                continue
+            shard = _read_json(self._path('claimed', shard_id))
+            if os.path.exists(self._path('done', shard_id)):
+                # Reclaimed after its worker finished late
+                os.remove(self._path('claimed', shard_id))
+                continue
+            shard['worker'] = self.worker_id
+            _write_json(self._path('claimed', shard_id), shard)
+            return shard
+        return None
+
+    def _heartbeat(self, shard_id, stop_event, cancel_event):
+        path = self._path('claimed', shard_id)
+        while not stop_event.wait(self.timeout / 4):
+            try:
+                os.utime(path)
+            except OSError:
+                # The shard was reclaimed: stop, another worker redoes it
+                cancel_event.set()
+                return
+
+    def _track(self, srt_path):
+        if srt_path not in self._tracks:
+            import srt_tag
+            self._tracks[srt_path] = srt_tag.time_lookup(
+                srt_tag.parse_srt_file(srt_path))
+        return self._tracks[srt_path]
+
+    def process(self, shard, cancel_event=None):
+        """
+        Extract and geotag the frames of one shard.
+
+        Returns:
+            Extraction result dict (see FrameExtractionJob.run)
+        """
+        import frame_encoders
+        import frame_extraction
+
+        video = self.manifest['videos'][shard['video_index']]
+        os.makedirs(video['output'], exist_ok=True)
+        job = frame_extraction.FrameExtractionJob(
+            video['video'], video['output'], shard['start_frame'],
+            shard['end_frame'], video['interval'], video['fps'],
+            encoder=frame_encoders.get_encoder(self.manifest['encoder'],
+                                               self.manifest['preset']),
+            workers=self.encoder_workers,
+            track=self._track(video['srt']) if video['srt'] else None)
+        return job.run(cancel_event=cancel_event)
+
+    def run_shard(self, shard):
+        """
+        Process a claimed shard and record the outcome.
+
+        Returns:
+            True if the shard is done
+        """
+        shard_id = shard['id']
+        stop_event = threading.Event()
+        cancel_event = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(shard_id, stop_event, cancel_event),
+            daemon=True)
+        heartbeat.start()
+        try:
+            result = self.process(shard, cancel_event)
+        except Exception as e:
+            stop_event.set()
+            heartbeat.join()
+            shard['attempts'] += 1
+            shard['error'] = str(e)
+            state = 'failed' if shard['attempts'] >= MAX_ATTEMPTS \
+                else 'pending'
+            print(f"Shard {shard_id} failed ({e}), moved to {state}")
+            try:
+                _write_json(self._path('claimed', shard_id), shard)
+                os.rename(self._path('claimed', shard_id),
+                          self._path(state, shard_id))
+            except OSError:
+                pass
+            return False
+        stop_event.set()
+        heartbeat.join()
+        if result['cancelled']:
+            print(f"Shard {shard_id} was reclaimed, dropping it")
+            return False
+
+        shard['extracted'] = result['extracted']
+        shard['finished'] = time.time()
+        _write_json(self._path('done', shard_id), shard)
+        try:
+            os.remove(self._path('claimed', shard_id))
+        except OSError:
+            pass
+        print(f"Shard {shard_id}: {result['extracted']} frames")
+        return True
+
+    def run(self, poll_interval=2.0):
+        """
+        Process shards until none are pending or claimed by others.
+
+        Returns:
+            Number of shards completed by this worker
+        """
+        completed = 0
+        while True:
+            reclaim_stale(self.shared_dir, self.timeout)
+            shard = self.claim()
+            if shard is not None:
+                completed += self.run_shard(shard)
+                continue
+            counts = shard_counts(self.shared_dir)
+            if not counts['pending'] and not counts['claimed']:
+                return completed
+            # Wait for running shards, which may still be reclaimed
+            time.sleep(poll_interval)
+
+
+def wait(shared_dir, timeout=DEFAULT_TIMEOUT, poll_interval=2.0):
+    """
+    Wait until every shard is done or failed, reclaiming stale claims.
+
+    Returns:
+        Final shard counts (see shard_counts)
+    """
+    while True:
+        reclaim_stale(shared_dir, timeout)
+        counts = shard_counts(shared_dir)
+        if not counts['pending'] and not counts['claimed']:
+            return counts
+        time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Sharded frame extraction across processes and machines',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python shard_extract.py plan /mnt/shared/job1 DJI_0123.MP4 -o /mnt/frames -f 1
+  python shard_extract.py plan /mnt/shared/job2 clips/*.MP4 -o /mnt/frames
+  python shard_extract.py work /mnt/shared/job1          (on every node)
+  python shard_extract.py status /mnt/shared/job1
+  python shard_extract.py wait /mnt/shared/job1
+        """
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    plan_parser = subparsers.add_parser('plan', help='Create the shards')
+    plan_parser.add_argument('shared', help='Shared job directory')
+    plan_parser.add_argument('videos', nargs='+', help='Video files')
+    plan_parser.add_argument('-o', '--output', required=True,
+                             help='Output folder reachable from all workers')
+    selection = plan_parser.add_mutually_exclusive_group()
+    selection.add_argument('-i', '--interval', type=int,
+                           help='Save one frame every N frames')
+    selection.add_argument('-f', '--fps-extracted', type=float,
+                           help='Frames saved per second (default: 1)')
+    plan_parser.add_argument('--start', type=float, default=0,
+                             help='Start time in seconds (default: 0)')
+    plan_parser.add_argument('--end', type=float,
+                             help='End time in seconds (default: end)')
+    plan_parser.add_argument('--shard-frames', type=int,
+                             default=DEFAULT_SHARD_FRAMES,
+                             help='Video frames per shard (default: '
+                                  f'{DEFAULT_SHARD_FRAMES})')
+    plan_parser.add_argument('--encoder', help='Frame encoder')
+    plan_parser.add_argument('--preset', help='Encoder preset')
+    plan_parser.add_argument('--no-srt', action='store_true',
+                             help='Do not geotag frames')
+
+    work_parser = subparsers.add_parser('work', help='Process shards')
+    work_parser.add_argument('shared', help='Shared job directory')
+    work_parser.add_argument('--worker-id', help='Worker name')
+    work_parser.add_argument('--threads', type=int,
+                             help='Encoder threads per shard')
+
+    status_parser = subparsers.add_parser('status', help='Show shard counts')
+    status_parser.add_argument('shared', help='Shared job directory')
+    wait_parser = subparsers.add_parser(
+        'wait', help='Wait until all shards finish')
+    wait_parser.add_argument('shared', help='Shared job directory')
+
+    for sub in (work_parser, wait_parser):
+        sub.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                         help='Seconds without heartbeat before a shard is '
+                              f'reclaimed (default: {DEFAULT_TIMEOUT})')
+
+    args = parser.parse_args()
+
+    if args.command == 'plan':
+        missing = [video for video in args.videos
+                   if not os.path.isfile(video)]
+        if missing:
+            print(f"Error: Video file not found: {missing[0]}")
+            sys.exit(1)
+        count = plan(args.shared, args.videos, args.output, args.interval,
+                     args.fps_extracted, args.start, args.end,
+                     args.shard_frames, args.encoder, args.preset,
+                     not args.no_srt)
+        print(f"Created {count} shards in {args.shared}")
+        return
+
+    if not os.path.isfile(os.path.join(args.shared, MANIFEST_NAME)):
+        print(f"Error: No sharded job in {args.shared}")
+        sys.exit(1)
+
+    if args.command == 'work':
+        worker = ShardWorker(args.shared, args.worker_id, args.timeout,
+                             args.threads)
+        print(f"Worker {worker.worker_id}: "
+              f"{worker.run()} shard(s) completed")
+    elif args.command == 'wait':
+        counts = wait(args.shared, args.timeout)
+        print(f"Done: {counts['done']}, failed: {counts['failed']}")
+        sys.exit(1 if counts['failed'] else 0)
+    else:
+        counts = shard_counts(args.shared)
+        print(', '.join(f"{state}: {counts[state]}" for state in STATES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Shm Ring - Zero-copy frame handoff between processes
+
+FramePool bounds the frames in flight between the decoder and the encoder
+threads of one process. To decode in one process and encode in others, a
+frame put on a multiprocessing queue is pickled and copied through a pipe:
+~25 MB per 4K frame, which costs more than most of what the other processes
+would save.
+
+SharedFrameRing keeps a fixed number of frame slots in one block of shared
+memory instead. Only slot numbers travel through the queues; the producer
+decodes into a slot and the consumers read it as a NumPy view of the same
+memory. Every slot has an owner at all times:
+
+    free -> writing    acquire()   producer takes a free slot
+    writing -> ready   publish()   frame written, queued for a consumer
+    ready -> reading   get()       a consumer takes the next frame
+    reading -> free    release()   consumer done, slot back in the ring
+
+Calls out of this order raise ValueError, so a slot is never written while
+someone still reads it. A producer may also release a slot it acquired
+without publishing it.
+
+The ring reaches consumer processes when they are started: as an argument
+of ``Process(args=...)`` or of a pool's ``initializer``, where they attach
+to the same memory. Its queues are multiprocessing queues, which can only
+be inherited that way, so the ring cannot be sent later as the argument of
+a pool task (``submit``/``map``). The creating process calls ``unlink()``
+once every process is done with it.
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+FREE, WRITING, READY, READING = range(4)
+STATE_NAMES = ('free', 'writing', 'ready', 'reading')
+# Slots start on cache line boundaries
+ALIGNMENT = 64
+
+
+def _aligned(size):
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+class SharedFrameRing:
+    """
+    Fixed-size frame slots in shared memory, handed out by number.
+
+    Args:
+        slots: Number of slots (frames in flight)
+        shape: Shape of every frame, e.g. ``(height, width, 3)``
+        dtype: NumPy dtype of the frames
+        context: multiprocessing context creating the queues (default: the
+            default context); use the one that starts the consumers
+    """
+
+    def __init__(self, slots, shape, dtype=np.uint8, context=None):
+        if slots < 1:
+            raise ValueError("slots must be at least 1")
+        context = context or multiprocessing.get_context()
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._free = context.Queue()
+        self._ready = context.Queue()
+        size = self._header_size() + slots * self._slot_size()
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._owner = True
+        self._attach()
+        self._states[:] = FREE
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def _header_size(self):
+        return _aligned(self.slots * np.dtype(np.int32).itemsize)
+
+    def _slot_size(self):
+        return _aligned(int(np.prod(self.shape)) * self.dtype.itemsize)
+
+    def _attach(self):
+        self._states = np.ndarray((self.slots,), dtype=np.int32,
+                                  buffer=self._shm.buf)
+        # Slot padding is skipped with strides, so slot i is frames[i]
+        slot_strides = (self._slot_size(),) + \
+            np.empty(self.shape, dtype=self.dtype).strides
+        self._frames = np.ndarray((self.slots,) + self.shape,
+                                  dtype=self.dtype, buffer=self._shm.buf,
+                                  offset=self._header_size(),
+                                  strides=slot_strides)
+
+    def __getstate__(self):
+        # Only the name of the memory block is sent to other processes. The
+        # queues pickle only while a process is being started, so this works
+        # for Process args and pool initializers but not for pool tasks
+        return {'name': self._shm.name, 'slots': self.slots,
+                'shape': self.shape, 'dtype': self.dtype.str,
+                'free': self._free, 'ready': self._ready}
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.shape = tuple(state['shape'])
+        self.dtype = np.dtype(state['dtype'])
+        self._free = state['free']
+        self._ready = state['ready']
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        self._owner = False
+        self._attach()
+
+    @property
+    def name(self):
+        """Name of the shared memory block."""
+        return self._shm.name
+
+    def state(self, slot):
+        """Return the state name of a slot."""
+        return STATE_NAMES[self._states[slot]]
+
+    def _move(self, slot, expected, new):
+        if self._states[slot] not in expected:
+            raise ValueError(
+                f"slot {slot} is {STATE_NAMES[self._states[slot]]}, "
+                f"expected {' or '.join(STATE_NAMES[s] for s in expected)}")
+        self._states[slot] = new
+
+    def frame(self, slot):
+        """
+        Return the frame of a slot as a NumPy view (no copy).
+
+        Views must not be used after the slot is released, and must be
+        dropped before ``close``.
+        """
+        return self._frames[slot]
+
+    def acquire(self, timeout=None):
+        """
+        Take a free slot to write a frame into (producer).
+
+        Args:
+            timeout: Seconds to wait for a free slot, or None to wait forever
+
+        Returns:
+            Slot number
+
+        Raises:
+            queue.Empty: If no slot became free within ``timeout``
+        """
+        slot = self._free.get(timeout=timeout)
+        self._move(slot, (FREE,), WRITING)
+        return slot
+
+    def publish(self, slot, info=None):
+        """
+        Hand a written slot to the consumers (producer).
+
+        Args:
+            slot: Slot from acquire
+            info: Small picklable value sent with the frame, such as the
+                frame number
+        """
+        self._move(slot, (WRITING,), READY)
+        self._ready.put((slot, info))
+
+    def get(self, timeout=None):
+        """
+        Take the next published frame (consumer).
+
+        Args:
+            timeout: Seconds to wait, or None to wait forever
+
+        Returns:
+            ``(slot, info)``, or None once the producer called finish
+
+        Raises:
+            queue.Empty: If nothing was published within ``timeout``
+        """
+        item = self._ready.get(timeout=timeout)
+        if item is None:
+            return None
+        slot, info = item
+        self._move(slot, (READY,), READING)
+        return slot, info
+
+    def release(self, slot):
+        """Return a slot to the ring (consumer, or producer not publishing)."""
+        self._move(slot, (READING, WRITING), FREE)
+        self._free.put(slot)
+
+    def finish(self, consumers=1):
+        """Tell ``consumers`` consumers that no more frames will come."""
+        for _ in range(consumers):
+            self._ready.put(None)
+
+    def close(self):
+        """Detach this process from the shared memory."""
+        if self._states is None:
+            return
+        # The views must go before the buffer they point into
+        self._states = self._frames = None
+        self._shm.close()
+
+    def unlink(self):
+        """Free the shared memory (creating process, once all are done)."""
+        self.close()
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.unlink()
+        return False
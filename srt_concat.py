@@ -8,11 +8,16 @@ drone recordings.
 """
 
 import argparse
+import json
 import os
 import re
 import sys
 from datetime import timedelta
 
+# Sidecar with the offsets and inputs of an output, for --append
+STATE_SUFFIX = '.concat.json'
+STATE_VERSION = 1
+
 
 def parse_timestamp(timestamp_str):
     """
@@ -71,7 +76,7 @@ def format_timestamp(td):
 
 def get_video_duration(video_path):
     """
-    Get video duration using ffprobe.
+    Get video duration from the shared video probe (cached per file).
 
     Args:
         video_path: Path to video file
@@ -79,20 +84,33 @@ def get_video_duration(video_path):
     Returns:
         Duration in seconds (float) or None if error
     """
+    import video_probe
     try:
-        import subprocess
-        result = subprocess.run(
-            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-             '-of', 'default=noprint_wrappers=1:nokey=1', video_path],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return float(result.stdout.strip())
-    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return float(video_probe.probe_video(video_path)['duration']) or None
+    except (OSError, ValueError, KeyError):
         return None
 
 
+def find_srt_for_video(video_path):
+    """
+    Find the SRT file recorded next to a video.
+
+    DJI drones write ``DJI_0123.SRT`` next to ``DJI_0123.MP4``; a lowercase
+    ``.srt`` extension is accepted too.
+
+    Args:
+        video_path: Path to video file
+
+    Returns:
+        Path to the SRT file, or None if there is none
+    """
+    base = os.path.splitext(video_path)[0]
+    for extension in ('.SRT', '.srt'):
+        if os.path.exists(base + extension):
+            return base + extension
+    return None
+
+
 def parse_srt_block(block):
     """
     Parse a single SRT subtitle block.
@@ -154,19 +172,20 @@ def read_srt_file(srt_path):
     return parsed_blocks
 
 
-def concatenate_srt_files(input_list_path, output_path):
+def read_input_list(input_list_path):
     """
-    Concatenate multiple SRT files.
+    Read the list of clips to concatenate.
+
+    Lines are either ``file 'path/to/video.MP4'`` (the SRT next to the video
+    is used) or the path of an SRT file.
 
     Args:
-        input_list_path: Path to text file listing SRT files and their
-            corresponding videos
-        output_path: Path for output concatenated SRT file
-    """
-    # Read input list
-    srt_files = []
-    video_files = []
+        input_list_path: Path to the input list file
 
+    Returns:
+        List of (srt_path, video_path or None) tuples
+    """
+    inputs = []
     with open(input_list_path, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.strip()
@@ -180,83 +199,179 @@ def concatenate_srt_files(input_list_path, output_path):
                 match = re.search(r"file\s+['\"](.+?)['\"]", line)
                 if match:
                     video_path = match.group(1)
-                    # Derive SRT path from video path
-                    srt_path = os.path.splitext(video_path)[0] + '.SRT'
+                    srt_path = find_srt_for_video(video_path)
 
-                    if not os.path.exists(srt_path):
-                        # Try lowercase
-                        srt_path = os.path.splitext(video_path)[0] + '.srt'
-
-                    if os.path.exists(srt_path):
-                        srt_files.append(srt_path)
-                        video_files.append(video_path)
+                    if srt_path:
+                        inputs.append((srt_path, video_path))
                     else:
                         print(f"Warning: SRT file not found for {video_path}")
             else:
                 # Assume it's a direct SRT path
                 if os.path.exists(line):
-                    srt_files.append(line)
-                    video_files.append(None)
+                    inputs.append((line, None))
+    return inputs
+
+
+def state_path(output_path):
+    """Return the path of the append state sidecar of an output SRT."""
+    return output_path + STATE_SUFFIX
+
+
+def file_fingerprint(path):
+    """
+    Identify the current content of a file without reading it.
+
+    Returns:
+        Dict with the absolute ``path``, ``size`` and ``mtime_ns``, or None
+        for a missing path
+    """
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns}
+
 
-    if not srt_files:
+def input_fingerprint(srt_path, video_path):
+    """Return the fingerprint of one input clip (SRT and video)."""
+    video = video_path if video_path and os.path.exists(video_path) \
+        else None
+    return {'srt': file_fingerprint(srt_path),
+            'video': file_fingerprint(video)}
+
+
+def load_state(output_path):
+    """
+    Load the append state saved next to an output SRT.
+
+    The state is only returned while the output still has the size it had
+    when the state was saved, i.e. nobody edited it in between.
+
+    Returns:
+        State dict, or None if missing or stale
+    """
+    try:
+        with open(state_path(output_path), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != STATE_VERSION:
+            return None
+        if os.path.getsize(output_path) != state['output_size']:
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    return state
+
+
+def save_state(output_path, state):
+    """Save the append state next to an output SRT (atomically)."""
+    path = state_path(output_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def append_clip(f, srt_file, video_file, state):
+    """
+    Append one clip to an open output SRT and advance the offsets.
+
+    Args:
+        f: Output file opened for writing
+        srt_file: SRT file of the clip
+        video_file: Video of the clip, or None
+        state: Dict with ``time_offset_us`` and ``frame_offset``, updated
+            in place
+
+    Returns:
+        Number of blocks written
+    """
+    print(f"Processing {srt_file}...")
+
+    blocks = read_srt_file(srt_file)
+    if not blocks:
+        print(f"Warning: No valid blocks found in {srt_file}")
+        return 0
+
+    # Adjust timestamps; blocks are renumbered sequentially
+    time_offset = timedelta(microseconds=state['time_offset_us'])
+    for idx, block in enumerate(blocks, state['frame_offset'] + 1):
+        f.write(f"{idx}\n")
+        start_ts = format_timestamp(block['start_time'] + time_offset)
+        end_ts = format_timestamp(block['end_time'] + time_offset)
+        f.write(f"{start_ts} --> {end_ts}\n")
+        f.write(f"{block['content']}\n")
+        f.write("\n")
+
+    # Update offsets for next file
+    state['frame_offset'] += len(blocks)
+
+    # Try to get accurate video duration
+    duration = None
+    if video_file and os.path.exists(video_file):
+        duration = get_video_duration(video_file)
+    if duration:
+        time_offset += timedelta(seconds=duration)
+    else:
+        # Fallback to last timestamp
+        time_offset += blocks[-1]['end_time']
+    state['time_offset_us'] = time_offset // timedelta(microseconds=1)
+    return len(blocks)
+
+
+def concatenate_srt_files(input_list_path, output_path, append=False):
+    """
+    Concatenate multiple SRT files.
+
+    The running offsets and a fingerprint of every input are saved in a
+    sidecar next to the output (see STATE_SUFFIX). In append mode, when the
+    earlier inputs of the list are unchanged and the output was not edited,
+    only the new inputs are read and appended, so adding a clip to a
+    mission costs that clip alone.
+
+    Args:
+        input_list_path: Path to text file listing SRT files and their
+            corresponding videos
+        output_path: Path for output concatenated SRT file
+        append: Append the new inputs to an existing output
+    """
+    inputs = read_input_list(input_list_path)
+
+    if not inputs:
         print(f"Error: No SRT files found in {input_list_path}")
         return False
 
-    print(f"Concatenating {len(srt_files)} SRT files...")
-
-    # Concatenate SRT files
-    all_blocks = []
-    time_offset = timedelta(0)
-    frame_offset = 0
-
-    for idx, srt_file in enumerate(srt_files):
-        print(f"Processing {srt_file}...")
-
-        blocks = read_srt_file(srt_file)
-        if not blocks:
-            print(f"Warning: No valid blocks found in {srt_file}")
-            continue
-
-        # Adjust timestamps and frame numbers
-        for block in blocks:
-            adjusted_block = {
-                'frame_num': block['frame_num'] + frame_offset,
-                'start_time': block['start_time'] + time_offset,
-                'end_time': block['end_time'] + time_offset,
-                'content': block['content']
-            }
-            all_blocks.append(adjusted_block)
-
-        # Update offsets for next file
-        if blocks:
-            last_block = blocks[-1]
-            frame_offset += len(blocks)
-
-            # Try to get accurate video duration
-            if video_files[idx] and os.path.exists(video_files[idx]):
-                duration = get_video_duration(video_files[idx])
-                if duration:
-                    time_offset += timedelta(seconds=duration)
-                else:
-                    # Fallback to last timestamp
-                    time_offset += last_block['end_time']
-            else:
-                # Fallback to last timestamp
-                time_offset += last_block['end_time']
-
-    # Write concatenated SRT file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for idx, block in enumerate(all_blocks, 1):
-            # Renumber sequentially
-            f.write(f"{idx}\n")
-            start_ts = format_timestamp(block['start_time'])
-            end_ts = format_timestamp(block['end_time'])
-            f.write(f"{start_ts} --> {end_ts}\n")
-            f.write(f"{block['content']}\n")
-            f.write("\n")
+    fingerprints = [input_fingerprint(srt, video) for srt, video in inputs]
+    state = load_state(output_path) if append else None
+    if state is not None and \
+            fingerprints[:len(state['inputs'])] != state['inputs']:
+        print("Earlier inputs changed, rebuilding the whole file")
+        state = None
+    elif append and state is None:
+        print("No usable append state, rebuilding the whole file")
+
+    if state is None:
+        state = {'version': STATE_VERSION, 'time_offset_us': 0,
+                 'frame_offset': 0, 'inputs': []}
+        mode = 'w'
+    else:
+        mode = 'a'
+
+    pending = inputs[len(state['inputs']):]
+    if not pending:
+        print(f"{output_path} is up to date")
+        return True
+    print(f"Concatenating {len(pending)} SRT files...")
+
+    written = 0
+    with open(output_path, mode, encoding='utf-8') as f:
+        for srt_file, video_file in pending:
+            written += append_clip(f, srt_file, video_file, state)
+            state['inputs'].append(fingerprints[len(state['inputs'])])
+    state['output_size'] = os.path.getsize(output_path)
+    save_state(output_path, state)
 
     print(f"Successfully created concatenated SRT file: {output_path}")
-    print(f"Total frames: {len(all_blocks)}")
+    print(f"Frames added: {written}, total frames: {state['frame_offset']}")
 
     return True
 
@@ -268,6 +383,7 @@ def main():
         epilog="""
 Examples:
   python srt_concat.py -i concat_files.txt -o output.srt
+  python srt_concat.py -i concat_files.txt -o output.srt --append
 
 Input file format (concat_files.txt):
   file '/path/to/video1.MP4'
@@ -283,6 +399,10 @@ Or simply list SRT files directly:
                         help='Path to input list file')
     parser.add_argument('-o', '--output', required=True,
                         help='Path to output concatenated SRT file')
+    parser.add_argument('-a', '--append', action='store_true',
+                        help='Only append the inputs added to the list '
+                             'since the last run (earlier inputs must be '
+                             'unchanged)')
 
     args = parser.parse_args()
 
@@ -297,7 +417,7 @@ Or simply list SRT files directly:
         os.makedirs(output_dir)
 
     # Concatenate files
-    success = concatenate_srt_files(args.input, args.output)
+    success = concatenate_srt_files(args.input, args.output, args.append)
 
     sys.exit(0 if success else 1)
 
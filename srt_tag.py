@@ -7,11 +7,21 @@ metadata to extracted video frames using ExifTool.
 """
 
 import argparse
+import bisect
 import os
 import re
 import subprocess
 import sys
 
+FRAME_NAME_RE = re.compile(r'frame_(\d+)_')
+# A blank line between two subtitle blocks, where a file can be split
+BLOCK_BOUNDARY_RE = re.compile(rb'\n[ \t\r]*\n')
+# Files smaller than this are parsed in one process: starting the pool
+# costs more than parsing them
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+# Image formats whose EXIF can be rewritten inside an archive
+ARCHIVE_EXTENSIONS = ('jpg', 'jpeg', 'webp')
+
 
 def parse_srt_file(srt_path):
     """
@@ -23,11 +33,16 @@ def parse_srt_file(srt_path):
     Returns:
         List of dictionaries containing frame data
     """
-    frames = []
-
     with open(srt_path, 'r', encoding='utf-8') as f:
         content = f.read()
 
+    return _parse_blocks(content)
+
+
+def _parse_blocks(content):
+    # Parse the subtitle blocks of SRT text into frame dictionaries
+    frames = []
+
     # Split by double newlines to separate subtitle blocks
     blocks = re.split(r'\n\s*\n', content.strip())
 
@@ -102,7 +117,409 @@ def parse_srt_file(srt_path):
     return frames
 
 
-def tag_images(srt_path, images_dir, fps_original, extension, fps_extracted):
+def srt_chunks(srt_path, chunks):
+    """
+    Split an SRT file into byte ranges at blank lines between blocks.
+
+    Args:
+        srt_path: Path to SRT file
+        chunks: Number of ranges wanted; fewer are returned when the file
+            has fewer block boundaries
+
+    Returns:
+        List of ``(start, end)`` byte offsets covering the whole file
+    """
+    import mmap
+
+    size = os.path.getsize(srt_path)
+    if size == 0:
+        return []
+    bounds = [0]
+    with open(srt_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for i in range(1, chunks):
+            offset = max(size * i // chunks, bounds[-1])
+            match = BLOCK_BOUNDARY_RE.search(data, offset)
+            if match is None:
+                break
+            if match.end() > bounds[-1]:
+                bounds.append(match.end())
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parse_srt_range(srt_path, start, end):
+    """
+    Parse the blocks of an SRT file between two byte offsets.
+
+    The range is read through mmap, so each worker only touches its own
+    pages of the file.
+
+    Args:
+        srt_path: Path to SRT file
+        start, end: Byte offsets at block boundaries (see srt_chunks)
+
+    Returns:
+        List of frame dictionaries, as parse_srt_file
+    """
+    import mmap
+
+    with open(srt_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        content = data[start:end].decode('utf-8')
+    # Same newlines as a file opened in text mode
+    content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return _parse_blocks(content)
+
+
+def _parse_range(task):
+    return parse_srt_range(*task)
+
+
+def _process_context():
+    # Parser pools may be started from worker threads (job server, ingest
+    # daemon), where a forked child can inherit a lock held by another
+    # thread and hang; spawned children start clean
+    import multiprocessing
+
+    return multiprocessing.get_context('spawn')
+
+
+def parse_srt_parallel(srt_path, workers=None,
+                       min_bytes=PARALLEL_MIN_BYTES):
+    """
+    Parse a large SRT file in chunks on a process pool.
+
+    The file is split at blank lines between blocks into one byte range per
+    worker; the results are joined in file order, so they are the same as
+    parse_srt_file's. Small files are parsed in this process. The workers
+    are spawned rather than forked, so this can be called from any thread.
+
+    Args:
+        srt_path: Path to SRT file
+        workers: Parser processes (default: CPU count)
+        min_bytes: Files smaller than this are parsed in this process
+
+    Returns:
+        List of dictionaries containing frame data
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    if workers < 2 or os.path.getsize(srt_path) < min_bytes:
+        return parse_srt_file(srt_path)
+    ranges = srt_chunks(srt_path, workers)
+    if len(ranges) < 2:
+        return parse_srt_file(srt_path)
+    frames = []
+    with ProcessPoolExecutor(len(ranges),
+                             mp_context=_process_context()) as pool:
+        tasks = [(srt_path, start, end) for start, end in ranges]
+        for chunk in pool.map(_parse_range, tasks):
+            frames.extend(chunk)
+    return frames
+
+
+def find_closest_frame(frames_data, image_index, frame_interval):
+    """
+    Find the SRT frame data matching an extracted image.
+
+    Args:
+        frames_data: List of frame dictionaries from parse_srt_file
+        image_index: Position of the image in the sorted image list
+        frame_interval: Original frames between two extracted images
+
+    Returns:
+        Frame dictionary, or None if frames_data is empty
+    """
+    # Calculate which SRT frame this image corresponds to
+    # Image index 0 -> SRT frame 1 (first frame)
+    # With fps_extracted=1 and fps_original=30, each image is 30 frames
+    # apart
+    srt_frame_num = int(image_index * frame_interval) + 1
+
+    # Find the closest frame data
+    closest_frame = None
+    min_diff = float('inf')
+
+    for frame in frames_data:
+        diff = abs(frame['frame_num'] - srt_frame_num)
+        if diff < min_diff:
+            min_diff = diff
+            closest_frame = frame
+
+    return closest_frame
+
+
+def srt_time_to_seconds(timestamp):
+    """
+    Convert an SRT start time (``HH:MM:SS.mmm``) to seconds.
+
+    Args:
+        timestamp: Time string as stored by parse_srt_file
+
+    Returns:
+        Seconds as float
+    """
+    hours, minutes, seconds = timestamp.replace(',', '.').split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def image_frame_number(image_name):
+    """
+    Get the video frame number from an extracted frame name.
+
+    Args:
+        image_name: File name such as ``frame_000030_t1.00s.jpg``
+
+    Returns:
+        Frame number, or None if the name has no frame number
+    """
+    match = FRAME_NAME_RE.match(os.path.basename(image_name))
+    return int(match.group(1)) if match else None
+
+
+def match_images(frames_data, image_names, frame_interval, pts=None):
+    """
+    Find the SRT frame data for every extracted image.
+
+    Without a PTS index, images are matched by their position in the list
+    (see find_closest_frame). With one, the frame number in each image name
+    gives the real presentation time of the frame, which is matched to the
+    SRT block being displayed at that time; this stays aligned on variable
+    frame rate video.
+
+    Args:
+        frames_data: List of frame dictionaries from parse_srt_file
+        image_names: Sorted image file names
+        frame_interval: Original frames between two extracted images
+        pts: Optional PtsIndex of the source video
+
+    Returns:
+        List with a frame dictionary (or None) per image
+    """
+    lookup = time_lookup(frames_data) if pts is not None else None
+    matches = []
+    for idx, name in enumerate(image_names):
+        frame_number = image_frame_number(name) if pts is not None else None
+        if frame_number is None or not 0 < frame_number <= len(pts):
+            matches.append(
+                find_closest_frame(frames_data, idx, frame_interval))
+            continue
+        matches.append(lookup(pts.timestamp(frame_number)))
+    return matches
+
+
+def time_lookup(frames_data):
+    """
+    Build a function returning the SRT frame data shown at a given time.
+
+    The result can be passed as ``track`` to FrameExtractionJob, so frames
+    get their position while they are extracted.
+
+    Args:
+        frames_data: List of frame dictionaries from parse_srt_file
+
+    Returns:
+        Callable ``lookup(seconds)`` returning the frame dictionary of the
+        last SRT block starting at or before ``seconds`` (or None if
+        frames_data is empty)
+    """
+    frames_data = sorted(
+        frames_data, key=lambda f: srt_time_to_seconds(f['timestamp']))
+    start_times = [srt_time_to_seconds(f['timestamp']) for f in frames_data]
+
+    def lookup(seconds):
+        if not frames_data:
+            return None
+        pos = max(bisect.bisect_right(start_times, seconds) - 1, 0)
+        return frames_data[pos]
+    return lookup
+
+
+def build_gps_exif(image_data, latitude, longitude, altitude):
+    """
+    Build EXIF bytes for an image with the given GPS position.
+
+    Existing EXIF tags in the image are kept; only the GPS block is replaced.
+
+    Args:
+        image_data: Encoded image bytes (JPEG or WebP)
+        latitude: Latitude in decimal degrees
+        longitude: Longitude in decimal degrees
+        altitude: Altitude in meters
+
+    Returns:
+        EXIF bytes suitable for piexif.insert
+    """
+    import piexif
+    from exif_gps import ALTITUDE_DENOMINATOR, to_dms
+
+    try:
+        exif_dict = piexif.load(image_data)
+    except Exception:
+        exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {},
+                     "thumbnail": None}
+
+    exif_dict["GPS"] = {
+        piexif.GPSIFD.GPSVersionID: (2, 0, 0, 0),
+        piexif.GPSIFD.GPSLatitudeRef: 'N' if latitude >= 0 else 'S',
+        piexif.GPSIFD.GPSLatitude: to_dms(latitude),
+        piexif.GPSIFD.GPSLongitudeRef: 'E' if longitude >= 0 else 'W',
+        piexif.GPSIFD.GPSLongitude: to_dms(longitude),
+        piexif.GPSIFD.GPSAltitudeRef: 0 if altitude >= 0 else 1,
+        piexif.GPSIFD.GPSAltitude: (
+            int(round(abs(altitude) * ALTITUDE_DENOMINATOR)),
+            ALTITUDE_DENOMINATOR),
+    }
+    return piexif.dump(exif_dict)
+
+
+def rewrite_archive(archive_path, positions, progress=False):
+    """
+    Insert GPS EXIF into the members of a frame archive.
+
+    Members are streamed into a new archive next to the original, which then
+    replaces it; the archive index is rewritten with the applied positions.
+
+    Args:
+        archive_path: Path to .zip or .tar archive
+        positions: Dict mapping member names to SRT frame dictionaries
+        progress: Print a line every 10 tagged images
+
+    Returns:
+        Number of tagged images
+    """
+    import io
+    import piexif
+    import frame_sinks
+
+    old_records = {}
+    tagged_count = 0
+    tmp_path = archive_path + '.tmp' + os.path.splitext(archive_path)[1]
+    try:
+        with frame_sinks.open_sink(tmp_path) as sink:
+            for name, data in frame_sinks.iter_archive(archive_path):
+                if name == frame_sinks.INDEX_NAME:
+                    for record in frame_sinks.parse_index(
+                            data.decode('utf-8')):
+                        old_records[record['name']] = record
+                    continue
+
+                closest_frame = positions.get(name)
+                record = None
+                if closest_frame is not None:
+                    exif_bytes = build_gps_exif(
+                        data,
+                        closest_frame['latitude'],
+                        closest_frame['longitude'],
+                        closest_frame['altitude'])
+                    output = io.BytesIO()
+                    piexif.insert(exif_bytes, data, output)
+                    data = output.getvalue()
+                    record = {
+                        'latitude': closest_frame['latitude'],
+                        'longitude': closest_frame['longitude'],
+                        'altitude': closest_frame['altitude']}
+                    tagged_count += 1
+                    if progress and tagged_count % 10 == 0:
+                        print(f"Tagged {tagged_count}/{len(positions)} "
+                              f"images...")
+                sink.write(name, data, record)
+
+            # The index is the last member: merge its fields afterwards
+            for record in sink.records:
+                for key, value in old_records.get(record['name'], {}).items():
+                    record.setdefault(key, value)
+        os.replace(tmp_path, archive_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return tagged_count
+
+
+def tag_archive(srt_path, archive_path, fps_original, extension,
+                fps_extracted, pts=None):
+    """
+    Tag images stored in a zip or tar archive without unpacking it.
+
+    Members are streamed into a new archive next to the original, with GPS
+    EXIF inserted in memory, and the new archive then replaces the original.
+    The archive index is rewritten with the positions that were applied.
+
+    Args:
+        srt_path: Path to SRT file
+        archive_path: Path to .zip or .tar archive with extracted frames
+        fps_original: Original video frame rate
+        extension: Image file extension (jpg or webp)
+        fps_extracted: Frame rate used for extraction (frames per second)
+        pts: Optional PtsIndex of the source video (see match_images)
+    """
+    import frame_sinks
+
+    if extension.lower() not in ARCHIVE_EXTENSIONS:
+        print(f"Error: Tagging inside archives supports jpg and webp, "
+              f"not .{extension}")
+        return False
+
+    print(f"Parsing SRT file: {srt_path}")
+    frames_data = parse_srt_parallel(srt_path)
+
+    if not frames_data:
+        print("Error: No GPS data found in SRT file")
+        return False
+
+    print(f"Found {len(frames_data)} frames with GPS data in SRT file")
+
+    # Image order follows the sorted member names, as for directories
+    names = sorted(
+        name for name in frame_sinks.archive_names(archive_path)
+        if name.endswith(f'.{extension}'))
+    if not names:
+        print(f"Error: No .{extension} files found in {archive_path}")
+        return False
+
+    print(f"Found {len(names)} image files to tag")
+
+    frame_interval = fps_original / fps_extracted
+    positions = dict(zip(
+        names, match_images(frames_data, names, frame_interval, pts)))
+
+    tagged_count = rewrite_archive(archive_path, positions, progress=True)
+
+    print(
+        f"\nSuccessfully tagged {tagged_count} out of {len(names)} images")
+    return True
+
+
+def exiftool_gps_args(frame, image_path):
+    """
+    Build the exiftool arguments that write a GPS position into an image.
+
+    Args:
+        frame: Frame dictionary with latitude, longitude and altitude
+        image_path: Image to modify in place
+
+    Returns:
+        List of arguments (without the ``exiftool`` command itself)
+    """
+    return [
+        '-overwrite_original',
+        f'-GPSLatitude={frame["latitude"]}',
+        f'-GPSLongitude={frame["longitude"]}',
+        f'-GPSAltitude={frame["altitude"]}',
+        '-GPSLatitudeRef=' + ('N' if frame["latitude"] >= 0 else 'S'),
+        '-GPSLongitudeRef=' + ('E' if frame["longitude"] >= 0 else 'W'),
+        '-GPSAltitudeRef=0',
+        image_path
+    ]
+
+
+def tag_images(srt_path, images_dir, fps_original, extension, fps_extracted,
+               pts=None):
     """
     Tag images with GPS data from SRT file.
 
@@ -112,9 +529,10 @@ def tag_images(srt_path, images_dir, fps_original, extension, fps_extracted):
         fps_original: Original video frame rate
         extension: Image file extension (jpg, png, etc.)
         fps_extracted: Frame rate used for extraction (frames per second)
+        pts: Optional PtsIndex of the source video (see match_images)
     """
     print(f"Parsing SRT file: {srt_path}")
-    frames_data = parse_srt_file(srt_path)
+    frames_data = parse_srt_parallel(srt_path)
 
     if not frames_data:
         print("Error: No GPS data found in SRT file")
@@ -132,9 +550,10 @@ def tag_images(srt_path, images_dir, fps_original, extension, fps_extracted):
         )
         return False
 
-    # Get list of image files
-    image_files = sorted([f for f in os.listdir(
-        images_dir) if f.endswith(f'.{extension}')])
+    # Get list of image files (from the index of a sharded folder)
+    import frame_sinks
+    image_files = [f for f in frame_sinks.list_frames(images_dir)
+                   if f.endswith(f'.{extension}')]
 
     if not image_files:
         print(f"Error: No .{extension} files found in {images_dir}")
@@ -146,23 +565,10 @@ def tag_images(srt_path, images_dir, fps_original, extension, fps_extracted):
     # fps_extracted is frames per second, so interval between frames
     frame_interval = fps_original / fps_extracted
 
+    matches = match_images(frames_data, image_files, frame_interval, pts)
+
     tagged_count = 0
-    for idx, image_file in enumerate(image_files):
-        # Calculate which SRT frame this image corresponds to
-        # Image index 0 -> SRT frame 1 (first frame)
-        # With fps_extracted=1 and fps_original=30, each image is 30 frames
-        # apart
-        srt_frame_num = int(idx * frame_interval) + 1
-
-        # Find the closest frame data
-        closest_frame = None
-        min_diff = float('inf')
-
-        for frame in frames_data:
-            diff = abs(frame['frame_num'] - srt_frame_num)
-            if diff < min_diff:
-                min_diff = diff
-                closest_frame = frame
+    for image_file, closest_frame in zip(image_files, matches):
 
         if closest_frame is None:
             print(f"Warning: No GPS data found for {image_file}")
@@ -173,21 +579,7 @@ def tag_images(srt_path, images_dir, fps_original, extension, fps_extracted):
 
         try:
             # Set GPS coordinates
-            cmd = [
-                'exiftool',
-                '-overwrite_original',
-                f'-GPSLatitude={closest_frame["latitude"]}',
-                f'-GPSLongitude={closest_frame["longitude"]}',
-                f'-GPSAltitude={closest_frame["altitude"]}',
-                '-GPSLatitudeRef=' + (
-                    'N' if closest_frame["latitude"] >= 0 else 'S'
-                ),
-                '-GPSLongitudeRef=' + (
-                    'E' if closest_frame["longitude"] >= 0 else 'W'
-                ),
-                '-GPSAltitudeRef=0',
-                image_path
-            ]
+            cmd = ['exiftool'] + exiftool_gps_args(closest_frame, image_path)
 
             result = subprocess.run(cmd, capture_output=True, text=True)
 
@@ -208,6 +600,351 @@ def tag_images(srt_path, images_dir, fps_original, extension, fps_extracted):
     return True
 
 
+def write_geo(srt_path, images_path, fps_original, extension, fps_extracted,
+              fmt, target=None, pts=None):
+    """
+    Write image positions to a metadata file instead of the images.
+
+    The images are only listed, never opened or rewritten (see
+    geo_outputs for the formats).
+
+    Args:
+        srt_path: Path to SRT file
+        images_path: Directory or .zip/.tar archive with extracted frames
+        fps_original: Original video frame rate
+        extension: Image file extension
+        fps_extracted: Frame rate used for extraction (frames per second)
+        fmt: 'geotxt', 'csv', 'geojson' or 'xmp'
+        target: Output file or sidecar folder (default:
+            geo_outputs.default_target)
+        pts: Optional PtsIndex of the source video (see match_images)
+    """
+    import geo_outputs
+
+    print(f"Parsing SRT file: {srt_path}")
+    frames_data = parse_srt_parallel(srt_path)
+
+    if not frames_data:
+        print("Error: No GPS data found in SRT file")
+        return False
+
+    import frame_sinks
+    names = [name for name in frame_sinks.list_frames(images_path)
+             if name.endswith(f'.{extension}')]
+    if not names:
+        print(f"Error: No .{extension} files found in {images_path}")
+        return False
+
+    matches = match_images(frames_data, names, fps_original / fps_extracted,
+                           pts)
+    positions = (
+        (name, match['latitude'], match['longitude'], match['altitude'])
+        for name, match in zip(names, matches) if match is not None)
+
+    target = target or geo_outputs.default_target(fmt, images_path)
+    count = geo_outputs.write_positions(fmt, target, positions)
+    print(f"\nWrote {count} positions for {len(names)} images to {target}")
+    return True
+
+
+def tag_frames(srt_path, output, fps_original, extension, fps_extracted,
+               pts=None):
+    """
+    Tag extracted frames in a folder or in a zip/tar archive.
+
+    Dispatches to tag_archive or tag_images depending on the output.
+
+    Returns:
+        True if tagging succeeded
+    """
+    tag = tag_archive if output.lower().endswith(('.zip', '.tar')) \
+        else tag_images
+    return tag(srt_path, output, fps_original, extension, fps_extracted, pts)
+
+
+class ExifTool:
+    """
+    Long-running exiftool process in ``-stay_open`` mode.
+
+    Starting exiftool costs far more than tagging one image, so a batch
+    keeps one process per worker thread and sends it one command per image.
+    Instances are not thread-safe.
+
+    Args:
+        executable: exiftool command
+    """
+
+    READY = '{ready}'
+
+    def __init__(self, executable='exiftool'):
+        self.process = subprocess.Popen(
+            [executable, '-stay_open', 'True', '-@', '-'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, text=True, encoding='utf-8')
+
+    def execute(self, args):
+        """
+        Run one exiftool command.
+
+        Args:
+            args: Argument list, as for the command line
+
+        Returns:
+            Output text of the command (stdout and stderr)
+        """
+        self.process.stdin.write('\n'.join(args) + '\n-execute\n')
+        self.process.stdin.flush()
+        lines = []
+        for line in self.process.stdout:
+            if line.strip() == self.READY:
+                break
+            lines.append(line)
+        return ''.join(lines)
+
+    def close(self):
+        """Stop the exiftool process."""
+        if self.process.poll() is None:
+            self.process.stdin.write('-stay_open\nFalse\n')
+            self.process.stdin.flush()
+            self.process.wait()
+
+
+def read_batch_manifest(path, fps_original=None, extension=None,
+                        fps_extracted=None):
+    """
+    Read a batch manifest of tagging jobs.
+
+    Each non-empty line that does not start with ``#`` is a CSV row::
+
+        srt, directory[, fps_original[, fps_extracted[, extension]]]
+
+    Missing columns take the given defaults. Relative paths are relative to
+    the manifest.
+
+    Args:
+        path: Manifest file
+        fps_original: Default original frame rate
+        extension: Default image extension
+        fps_extracted: Default extraction rate
+
+    Returns:
+        List of job dicts with ``srt``, ``directory``, ``fps_original``,
+        ``fps_extracted`` and ``extension``
+
+    Raises:
+        ValueError: If a row is incomplete or invalid
+    """
+    import csv
+
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        rows = csv.reader(line for line in f
+                          if line.strip() and not line.lstrip().startswith('#'))
+        for number, row in enumerate(rows, 1):
+            row = [value.strip() for value in row]
+            if len(row) < 2:
+                raise ValueError(f"Row {number}: expected at least SRT and "
+                                 f"directory")
+            row += [''] * (5 - len(row))
+            try:
+                job = {
+                    'srt': os.path.join(base, row[0]),
+                    'directory': os.path.join(base, row[1]),
+                    'fps_original': float(row[2] or fps_original),
+                    'fps_extracted': float(row[3] or fps_extracted),
+                    'extension': row[4] or extension,
+                }
+            except (TypeError, ValueError):
+                raise ValueError(f"Row {number}: missing or invalid frame "
+                                 f"rate")
+            if not job['extension']:
+                raise ValueError(f"Row {number}: missing image extension")
+            if job['fps_original'] <= 0 or job['fps_extracted'] <= 0:
+                raise ValueError(f"Row {number}: frame rates must be greater "
+                                 f"than 0")
+            jobs.append(job)
+    return jobs
+
+
+def _batch_tasks(jobs, parsed, summaries):
+    # One task per image of a folder, or per archive
+    import frame_sinks
+
+    tasks = []
+    for idx, job in enumerate(jobs):
+        summary = summaries[idx]
+        frames_data = parsed.get(job['srt'])
+        if not frames_data:
+            summary['error'] = 'no GPS data in SRT' if frames_data == [] \
+                else 'SRT file not found'
+            continue
+        is_archive = job['directory'].lower().endswith(('.zip', '.tar'))
+        if is_archive and job['extension'].lower() not in ARCHIVE_EXTENSIONS:
+            summary['error'] = (f"tagging inside archives supports jpg and "
+                                f"webp, not .{job['extension']}")
+            continue
+        try:
+            names = frame_sinks.list_frames(job['directory'])
+        except OSError as e:
+            summary['error'] = str(e)
+            continue
+        names = [name for name in names
+                 if name.endswith(f".{job['extension']}")]
+        summary['images'] = len(names)
+        matches = match_images(frames_data, names,
+                               job['fps_original'] / job['fps_extracted'])
+        if is_archive:
+            tasks.append((idx, None, dict(zip(names, matches))))
+            continue
+        for name, frame in zip(names, matches):
+            if frame is None:
+                summary['failed'] += 1
+            else:
+                tasks.append((idx, os.path.join(job['directory'], name),
+                              frame))
+    if any(task[1] is not None for task in tasks) and not _exiftool_found():
+        for task in tasks:
+            if task[1] is not None:
+                summaries[task[0]]['error'] = 'exiftool not found'
+        tasks = [task for task in tasks if task[1] is None]
+    return tasks
+
+
+def _exiftool_found():
+    """Return True if the exiftool command can be run."""
+    try:
+        subprocess.run(['exiftool', '-ver'], capture_output=True, check=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+    return True
+
+
+def tag_batch(jobs, workers=None):
+    """
+    Tag many frame folders or archives through one shared worker pool.
+
+    All SRT files are parsed in parallel in a process pool first. Then every
+    image of every folder becomes a task for the same pool of threads, each
+    driving its own persistent exiftool process, so small flights do not
+    leave cores idle and exiftool starts once per thread instead of once per
+    image. Archives are tagged in memory as one task each.
+
+    Args:
+        jobs: List of job dicts (see read_batch_manifest)
+        workers: Worker threads and parser processes (default: CPU count)
+
+    Returns:
+        List with a summary dict per job: ``directory``, ``images``,
+        ``tagged``, ``failed``, ``seconds`` and ``error``
+    """
+    import threading
+    import time
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    summaries = [{'directory': job['directory'], 'images': 0, 'tagged': 0,
+                  'failed': 0, 'seconds': 0.0, 'error': None,
+                  'start': None, 'end': None} for job in jobs]
+
+    srt_paths = sorted({job['srt'] for job in jobs
+                        if os.path.isfile(job['srt'])})
+    parsed = {}
+    if srt_paths:
+        with ProcessPoolExecutor(min(workers, len(srt_paths)),
+                                 mp_context=_process_context()) as pool:
+            parsed = dict(zip(srt_paths, pool.map(parse_srt_file, srt_paths)))
+
+    tasks = _batch_tasks(jobs, parsed, summaries)
+
+    lock = threading.Lock()
+    local = threading.local()
+    tools = []
+
+    def exiftool():
+        if not hasattr(local, 'tool'):
+            local.tool = ExifTool()
+            with lock:
+                tools.append(local.tool)
+        return local.tool
+
+    def run(task):
+        idx, image_path, data = task
+        started = time.monotonic()
+        job = jobs[idx]
+        try:
+            if image_path is None:
+                tagged = rewrite_archive(job['directory'], data)
+                failed = summaries[idx]['images'] - tagged
+            else:
+                output = exiftool().execute(
+                    exiftool_gps_args(data, image_path))
+                tagged = int('1 image files updated' in output)
+                failed = 1 - tagged
+        except Exception as e:
+            tagged, failed = 0, 1
+            with lock:
+                summaries[idx]['error'] = str(e)
+        finished = time.monotonic()
+        with lock:
+            summary = summaries[idx]
+            summary['tagged'] += tagged
+            summary['failed'] += failed
+            summary['start'] = min(summary['start'] or started, started)
+            summary['end'] = max(summary['end'] or finished, finished)
+
+    try:
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(run, tasks))
+    finally:
+        for tool in tools:
+            tool.close()
+
+    for summary in summaries:
+        if summary['start'] is not None:
+            summary['seconds'] = summary['end'] - summary['start']
+        del summary['start'], summary['end']
+    return summaries
+
+
+def print_batch_summary(summaries):
+    """Print one line per folder plus a total line."""
+    width = max([len('Folder')] + [len(s['directory']) for s in summaries])
+    print(f"\n{'Folder':<{width}}  {'Images':>7}  {'Tagged':>7}  "
+          f"{'Failed':>7}  {'Time':>7}")
+    for s in summaries:
+        line = (f"{s['directory']:<{width}}  {s['images']:>7}  "
+                f"{s['tagged']:>7}  {s['failed']:>7}  {s['seconds']:>6.1f}s")
+        if s['error']:
+            line += f"  ({s['error']})"
+        print(line)
+    print(f"{'Total':<{width}}  {sum(s['images'] for s in summaries):>7}  "
+          f"{sum(s['tagged'] for s in summaries):>7}  "
+          f"{sum(s['failed'] for s in summaries):>7}")
+
+
+def run_batch(args):
+    """Run --batch mode from parsed arguments and exit."""
+    if not os.path.isfile(args.batch):
+        print(f"Error: Manifest not found: {args.batch}")
+        sys.exit(1)
+    try:
+        jobs = read_batch_manifest(args.batch, args.fps_original,
+                                   args.extension, args.fps_extracted)
+    except ValueError as e:
+        print(f"Error: {args.batch}: {e}")
+        sys.exit(1)
+    if not jobs:
+        print(f"Error: No jobs in {args.batch}")
+        sys.exit(1)
+
+    print(f"Tagging {len(jobs)} folders...")
+    summaries = tag_batch(jobs, args.workers)
+    print_batch_summary(summaries)
+    failed = any(s['error'] or s['failed'] for s in summaries)
+    sys.exit(1 if failed else 0)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Geotag video frames using SRT subtitle files',
@@ -216,36 +953,96 @@ def main():
 Examples:
   python srt_tag.py -s video.SRT -d frames/ -p 30 -x jpg -f 1
   python srt_tag.py -s DJI_0123.SRT -d output_frames/ -p 30 -x png -f 0.5
+  python srt_tag.py -s DJI_0123.SRT -d DJI_0123_frames.zip -p 30 -x jpg -f 1
+  python srt_tag.py -s DJI_0123.SRT -d frames/ -p 30 -x jpg -f 1 \\
+      --video DJI_0123.MP4
+  python srt_tag.py -s DJI_0123.SRT -d frames/ -p 30 -x jpg -f 1 \\
+      --write geotxt
+  python srt_tag.py --batch flights.csv -p 30 -x jpg -f 1 -w 8
         """
     )
 
-    parser.add_argument('-s', '--srt', required=True,
+    parser.add_argument('-s', '--srt',
                         help='Path to SRT subtitle file')
-    parser.add_argument('-d', '--directory', required=True,
-                        help='Directory containing extracted frames')
-    parser.add_argument('-p', '--fps-original', type=float, required=True,
+    parser.add_argument('-d', '--directory',
+                        help='Directory or .zip/.tar archive containing '
+                             'extracted frames')
+    parser.add_argument('-p', '--fps-original', type=float,
                         help='Original video frame rate (e.g., 30 for 30fps)')
-    parser.add_argument('-x', '--extension', required=True,
+    parser.add_argument('-x', '--extension',
                         help='Image file extension (jpg, png, etc.)')
     parser.add_argument(
         '-f',
         '--fps-extracted',
         type=float,
-        required=True,
         help=(
             'Frame extraction rate (e.g., 1 for 1 frame per second, '
             '0.5 for 1 frame every 2 seconds)'
         )
     )
 
+    parser.add_argument(
+        '--video',
+        help=(
+            'Source video; frames are matched to the SRT by their real '
+            'timestamps from its PTS index (for variable frame rate video)'
+        )
+    )
+
+    parser.add_argument(
+        '--write',
+        choices=('exif', 'geotxt', 'csv', 'geojson', 'xmp'),
+        default='exif',
+        help=(
+            'Where positions go: into the image EXIF (default), or into a '
+            'geo.txt, CSV or GeoJSON file or XMP sidecars without touching '
+            'the images'
+        )
+    )
+    parser.add_argument(
+        '--geo-output',
+        help='Output file or sidecar folder for --write (default: inside '
+             'the frames folder, or next to the archive)'
+    )
+
+    parser.add_argument(
+        '--batch',
+        help=(
+            'Manifest of jobs, one CSV row per folder: srt, directory'
+            '[, fps_original[, fps_extracted[, extension]]]; -p, -f and -x '
+            'give the defaults'
+        )
+    )
+    parser.add_argument(
+        '-w', '--workers', type=int,
+        help='Worker threads for --batch (default: CPU count)'
+    )
+
     args = parser.parse_args()
 
+    if args.batch:
+        run_batch(args)
+
+    missing = [option for option, value in (
+        ('-s/--srt', args.srt), ('-d/--directory', args.directory),
+        ('-p/--fps-original', args.fps_original),
+        ('-x/--extension', args.extension),
+        ('-f/--fps-extracted', args.fps_extracted)) if value is None]
+    if missing:
+        parser.error(f"the following arguments are required: "
+                     f"{', '.join(missing)}")
+
     # Validate inputs
     if not os.path.exists(args.srt):
         print(f"Error: SRT file not found: {args.srt}")
         sys.exit(1)
 
-    if not os.path.isdir(args.directory):
+    is_archive = args.directory.lower().endswith(('.zip', '.tar'))
+    if is_archive and not os.path.isfile(args.directory):
+        print(f"Error: Archive not found: {args.directory}")
+        sys.exit(1)
+
+    if not is_archive and not os.path.isdir(args.directory):
         print(f"Error: Directory not found: {args.directory}")
         sys.exit(1)
 
@@ -261,13 +1058,29 @@ Examples:
                 args.fps_extracted}")
         sys.exit(1)
 
+    pts = None
+    if args.video:
+        if not os.path.exists(args.video):
+            print(f"Error: Video file not found: {args.video}")
+            sys.exit(1)
+        import pts_index
+        print(f"Loading frame timestamps: {args.video}")
+        pts = pts_index.load_or_build(args.video)
+
     # Tag images
-    success = tag_images(
+    if args.write != 'exif':
+        success = write_geo(args.srt, args.directory, args.fps_original,
+                            args.extension, args.fps_extracted, args.write,
+                            args.geo_output, pts)
+        sys.exit(0 if success else 1)
+
+    success = tag_frames(
         args.srt,
         args.directory,
         args.fps_original,
         args.extension,
-        args.fps_extracted
+        args.fps_extracted,
+        pts
     )
 
     sys.exit(0 if success else 1)
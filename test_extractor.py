@@ -4,15 +4,48 @@
 Test script para validar funcionalidades del extractor
 """
 
+import asyncio
+import gc
+import io
 import os
+import shutil
+import stat
+import subprocess
 import sys
 import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
 import cv2
 import numpy as np
 from PIL import Image
 import piexif
 import json
 
+import aoi
+import benchmark
+import exif_gps
+import flight_track
+import frame_cache
+import frame_decoders
+import frame_encoders
+import frame_preview
+import frame_extraction
+import frame_sinks
+import geo_outputs
+import gps_tracks
+import ingest_daemon
+import job_server
+import output_profiles
+import pts_index
+import shard_extract
+import shm_ring
+import srt_concat
+import srt_tag
+import undistort
+import video_probe
+
 
 def create_test_video(filepath, duration=5, fps=30):
     """Crea un video de prueba"""
@@ -34,6 +67,21 @@ def create_test_video(filepath, duration=5, fps=30):
     return filepath
 
 
+def create_test_srt(filepath, total_frames=150, fps=30):
+    """Crea un archivo SRT de prueba con una posición por fotograma"""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        for i in range(total_frames):
+            start_ms = int(i * 1000 / fps)
+            end_ms = int((i + 1) * 1000 / fps)
+            f.write(f"{i + 1}\n")
+            f.write(f"00:00:{start_ms // 1000:02d},{start_ms % 1000:03d} --> "
+                    f"00:00:{end_ms // 1000:02d},{end_ms % 1000:03d}\n")
+            f.write(f"[latitude: {40.0 + i * 0.0001:.6f}] "
+                    f"[longitude: {-3.0 - i * 0.0001:.6f}] "
+                    f"[altitude: {100 + i * 0.1:.1f}]\n\n")
+    return filepath
+
+
 def test_video_reading(video_path):
     """Prueba la lectura de video"""
     print("\n=== Test: Lectura de Video ===")
@@ -158,6 +206,1428 @@ def test_json_gps_loading():
     return is_valid
 
 
+def test_frame_encoders(output_dir):
+    """Prueba los codificadores de imagen y sus perfiles"""
+    print("\n=== Test: Codificadores de Imagen ===")
+
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    frame[:, :, 2] = np.arange(160, dtype=np.uint8)
+    exif_bytes = piexif.dump({"GPS": {
+        piexif.GPSIFD.GPSLatitudeRef: 'N',
+        piexif.GPSIFD.GPSLatitude: ((40, 1), (25, 1), (0, 1))}})
+
+    all_ok = True
+    for name in frame_encoders.ENCODERS:
+        for preset in frame_encoders.PRESET_NAMES:
+            encoder = frame_encoders.get_encoder(name, preset)
+            data = encoder.encode(frame, exif=exif_bytes)
+            path = os.path.join(
+                output_dir, f"enc_{name}_{preset}.{encoder.extension}")
+            with open(path, 'wb') as f:
+                f.write(data)
+
+            with Image.open(path) as img:
+                gps = img.getexif().get_ifd(0x8825)
+                ok = img.size == (160, 120) and gps.get(1) == 'N'
+            all_ok = all_ok and ok
+            print(f"{'✓' if ok else '✗'} {encoder.describe()}: "
+                  f"{len(data)} bytes")
+
+    try:
+        frame_encoders.get_encoder('png', 'ultra')
+        all_ok = False
+    except ValueError:
+        print("✓ Perfil desconocido rechazado")
+    return all_ok
+
+
+def test_archive_output(output_dir):
+    """Prueba la salida en archivo zip/tar y el etiquetado sin descomprimir"""
+    print("\n=== Test: Salida en Archivo ZIP/TAR ===")
+
+    srt_path = create_test_srt(os.path.join(output_dir, "archive.srt"))
+    encoder = frame_encoders.get_encoder('opencv-jpeg', 'fast')
+    frame = np.full((48, 64, 3), 128, dtype=np.uint8)
+
+    all_ok = True
+    for kind in ('zip', 'tar'):
+        archive_path = os.path.join(output_dir, f"frames.{kind}")
+        with frame_sinks.open_sink(archive_path) as sink:
+            for i in range(3):
+                sink.write(f"frame_{i:06d}.jpg", encoder.encode(frame),
+                           {'frame': i * 30, 'timestamp': f"{i:.3f}"})
+
+        names = frame_sinks.archive_names(archive_path)
+        ok = names[-1] == frame_sinks.INDEX_NAME and len(names) == 4
+
+        ok = ok and srt_tag.tag_archive(srt_path, archive_path, 30, 'jpg', 1)
+        members = dict(frame_sinks.iter_archive(archive_path))
+        gps = piexif.load(members["frame_000001.jpg"])["GPS"]
+        index = frame_sinks.parse_index(
+            members[frame_sinks.INDEX_NAME].decode('utf-8'))
+        ok = all([ok, gps[piexif.GPSIFD.GPSLatitudeRef] == b'N',
+                  len(index) == 3, index[1]['frame'] == '30',
+                  abs(float(index[1]['latitude']) - 40.003) < 1e-6])
+        all_ok = all_ok and ok
+        print(f"{'✓' if ok else '✗'} Archivo {kind} etiquetado: "
+              f"{len(index)} fotogramas en el índice")
+    return all_ok
+
+
+def test_exif_gps_writer():
+    """Prueba el escritor EXIF GPS nativo y su precisión"""
+    print("\n=== Test: Escritor EXIF GPS ===")
+
+    lats = np.array([40.416775, -33.8688197, 0.0000001])
+    lons = np.array([-3.703790, 151.2092955, 179.9999999])
+    alts = np.array([650.0, -12.345, 0.0])
+    times = np.array([1700000000.25, 0.0, 86399.5])
+
+    template = exif_gps.GpsExifTemplate(timestamp=True)
+    batch = template.build_batch(lats, lons, alts, times)
+
+    all_ok = True
+    for i, block in enumerate(batch):
+        single = template.build(lats[i], lons[i], alts[i], times[i])
+        gps = piexif.load(block)["GPS"]
+        lat = exif_gps.dms_to_degrees(gps[piexif.GPSIFD.GPSLatitude])
+        lon = exif_gps.dms_to_degrees(gps[piexif.GPSIFD.GPSLongitude])
+        if gps[piexif.GPSIFD.GPSLatitudeRef] == b'S':
+            lat = -lat
+        if gps[piexif.GPSIFD.GPSLongitudeRef] == b'W':
+            lon = -lon
+        alt_num, alt_den = gps[piexif.GPSIFD.GPSAltitude]
+        # 1e-7 grados son ~1 cm; el formato anterior (1/100") tenía ~30 cm
+        ok = all([single == block,
+                  abs(lat - lats[i]) < 1e-7, abs(lon - lons[i]) < 1e-7,
+                  abs(alt_num / alt_den - abs(alts[i])) < 1e-3,
+                  gps[piexif.GPSIFD.GPSAltitudeRef] == int(alts[i] < 0)])
+        all_ok = all_ok and ok
+        print(f"{'✓' if ok else '✗'} ({lats[i]}, {lons[i]}) -> "
+              f"({lat:.8f}, {lon:.8f})")
+
+    date = piexif.load(batch[2])["GPS"][piexif.GPSIFD.GPSDateStamp]
+    ok = date == b'1970:01:01'
+    print(f"{'✓' if ok else '✗'} Fecha GPS: {date.decode()}")
+    return all_ok and ok
+
+
+def test_extraction_job(video_path, output_dir):
+    """Prueba la extracción sin interfaz, con progreso y cancelación"""
+    print("\n=== Test: Extracción en Segundo Plano ===")
+
+    job_dir = os.path.join(output_dir, "job")
+    os.makedirs(job_dir, exist_ok=True)
+    gps = {"latitude": 40.416775, "longitude": -3.703790, "altitude": 650}
+    job = frame_extraction.FrameExtractionJob(
+        video_path, job_dir, 0, 150, 30, 30.0, gps=gps)
+
+    updates = []
+    result = job.run(progress=lambda done, total: updates.append(done))
+    files = sorted(os.listdir(job_dir))
+    gps_ifd = piexif.load(os.path.join(job_dir, files[0]))["GPS"]
+    # El total anunciado es el número de fotogramas que se guardan, también
+    # con varios tramos (el segundo no termina en un múltiplo del intervalo)
+    ranges_job = frame_extraction.FrameExtractionJob(
+        video_path, job_dir, 0, 150, 30, 30.0, ranges=[(0, 60), (90, 139)])
+    total_ok = result['total'] == job.total_to_extract() == 5 and \
+        ranges_job.total_to_extract() == len(ranges_job.planned_frames()) == 3
+    ok = all([result['extracted'] == 5, not result['cancelled'], total_ok,
+              len(files) == 5, files[0] == "frame_000030_t1.00s.jpg",
+              updates == [1, 2, 3, 4, 5],
+              gps_ifd[piexif.GPSIFD.GPSLatitudeRef] == b'N'])
+    print(f"{'✓' if ok else '✗'} Extraídos {result['extracted']} "
+          f"fotogramas con GPS")
+
+    cancel_event = threading.Event()
+
+    def cancel_after_two(done, total):
+        if done == 2:
+            cancel_event.set()
+
+    # Cada fotograma: los que ya estaban en curso al cancelar se terminan
+    archive = os.path.join(output_dir, "cancelled.zip")
+    job = frame_extraction.FrameExtractionJob(
+        video_path, archive, 0, 150, 1, 30.0)
+    result = job.run(progress=cancel_after_two, cancel_event=cancel_event)
+    names = frame_sinks.archive_names(archive)
+    cancel_ok = all([result['cancelled'],
+                     2 <= result['extracted'] < result['total'],
+                     names[-1] == frame_sinks.INDEX_NAME,
+                     len(names) == result['extracted'] + 1])
+    print(f"{'✓' if cancel_ok else '✗'} Cancelación limpia tras "
+          f"{result['extracted']} fotogramas")
+    return ok and cancel_ok
+
+
+def test_pts_index(video_path, output_dir):
+    """Prueba el índice de tiempos por fotograma (VFR) y su caché"""
+    print("\n=== Test: Índice PTS ===")
+
+    index = pts_index.load_or_build(video_path)
+    cached = pts_index.load_index(video_path)
+    ok = all([len(index) == 150, cached is not None,
+              np.allclose(cached.times, index.times),
+              abs(index.timestamp(31) - 1.0) < 1e-6,
+              not index.is_variable_rate()])
+    print(f"{'✓' if ok else '✗'} Índice con {len(index)} fotogramas "
+          f"guardado en {os.path.basename(pts_index.sidecar_path(video_path))}")
+
+    # Video VFR: 30 fps con un hueco de 0,1 s tras el tercer fotograma
+    vfr = pts_index.PtsIndex([0.0, 1 / 30, 2 / 30, 0.2, 0.2 + 1 / 30])
+    vfr_ok = all([vfr.is_variable_rate(), vfr.first_frame_at(0.1) == 3,
+                  vfr.last_frame_until(0.2) == 4,
+                  vfr.nearest_frame(0.12) == 2])
+
+    srt_path = create_test_srt(os.path.join(output_dir, "pts.srt"))
+    frames_data = srt_tag.parse_srt_file(srt_path)
+    names = ["frame_000001_t0.00s.jpg", "frame_000004_t0.20s.jpg"]
+    matches = srt_tag.match_images(frames_data, names, 1, pts=vfr)
+    # Sin índice, la segunda imagen se asociaría al fotograma SRT 2
+    vfr_ok = vfr_ok and [m['frame_num'] for m in matches] == [1, 7]
+    print(f"{'✓' if vfr_ok else '✗'} Alineación SRT por tiempo real (VFR)")
+
+    job_dir = os.path.join(output_dir, "pts_job")
+    os.makedirs(job_dir, exist_ok=True)
+    job = frame_extraction.FrameExtractionJob.for_time_range(
+        video_path, job_dir, 1.0, 3.0, 30, 30.0, pts_index=index)
+    job.run()
+    files = sorted(os.listdir(job_dir))
+    job_ok = files == ["frame_000060_t1.97s.jpg", "frame_000090_t2.97s.jpg"]
+    print(f"{'✓' if job_ok else '✗'} Extracción con índice: {files}")
+    return ok and vfr_ok and job_ok
+
+
+def open_files():
+    """Número de descriptores abiertos del proceso (None sin /proc)"""
+    if not os.path.isdir('/proc/self/fd'):
+        return None
+    return len(os.listdir('/proc/self/fd'))
+
+
+def test_video_probe(video_path, output_dir):
+    """Prueba la sonda de video compartida y su caché SQLite"""
+    print("\n=== Test: Sonda de video ===")
+
+    cache = video_probe.ProbeCache(os.path.join(output_dir, "probe.sqlite"))
+    info = video_probe.probe_video(video_path, cache=cache)
+    ok = all([info['frame_count'] == 150, abs(info['fps'] - 30) < 0.01,
+              abs(info['duration'] - 5.0) < 0.1,
+              (info['width'], info['height']) == (640, 480)])
+    print(f"{'✓' if ok else '✗'} {info['width']}x{info['height']} "
+          f"{info['codec']}, {info['frame_count']} fotogramas")
+
+    cached = cache.get(video_path)
+    # Un archivo modificado invalida la entrada
+    stat = os.stat(video_path)
+    os.utime(video_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    stale = cache.get(video_path)
+    os.utime(video_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    cache_ok = cached == info and stale is None
+    print(f"{'✓' if cache_ok else '✗'} Caché por ruta, tamaño y mtime")
+
+    # Cada llamada cierra su conexión, sin esperar al recolector
+    gc.disable()
+    try:
+        before = open_files()
+        for _ in range(20):
+            cache.get(video_path)
+        closed_ok = open_files() == before
+    finally:
+        gc.enable()
+    print(f"{'✓' if closed_ok else '✗'} Conexiones SQLite cerradas")
+    return ok and cache_ok and closed_ok
+
+
+def test_ingest_daemon(video_path, output_dir):
+    """Prueba el daemon de ingesta con cola persistente"""
+    print("\n=== Test: Daemon de Ingesta ===")
+
+    watch_dir = os.path.join(output_dir, "ingest")
+    os.makedirs(watch_dir, exist_ok=True)
+    for name in ("DJI_0001", "DJI_0002"):
+        shutil.copy(video_path, os.path.join(watch_dir, name + ".MP4"))
+        create_test_srt(os.path.join(watch_dir, name + ".SRT"))
+    # Video sin SRT: no se encola
+    shutil.copy(video_path, os.path.join(watch_dir, "DJI_0003.MP4"))
+
+    out_dir = os.path.join(output_dir, "ingest_out")
+    daemon = ingest_daemon.IngestDaemon(
+        watch_dir, out_dir, workers=2, fps_extracted=1.0,
+        output_format='zip', settle_seconds=0)
+    daemon.run(poll_interval=0, once=True)
+
+    jobs = daemon.queue.jobs()
+    ok = len(jobs) == 2 and all(
+        [job['status'] == ingest_daemon.STATUS_DONE and job['extracted'] == 5
+         for job in jobs])
+    print(f"{'✓' if ok else '✗'} Trabajos: "
+          f"{[(job['status'], job['extracted']) for job in jobs]}")
+
+    members = dict(frame_sinks.iter_archive(
+        os.path.join(out_dir, "DJI_0001_frames.zip")))
+    index = frame_sinks.parse_index(
+        members[frame_sinks.INDEX_NAME].decode('utf-8'))
+    # Cada imagen lleva la posición del bloque SRT de su propio tiempo
+    lookup = srt_tag.time_lookup(srt_tag.parse_srt_file(
+        os.path.join(watch_dir, "DJI_0001.SRT")))
+    tag_ok = len(index) == 5
+    for record in index:
+        gps = piexif.load(members[record['name']])["GPS"]
+        latitude = exif_gps.dms_to_degrees(gps[piexif.GPSIFD.GPSLatitude])
+        expected = lookup(float(record['timestamp']))['latitude']
+        tag_ok = tag_ok and abs(latitude - expected) < 1e-7
+    print(f"{'✓' if tag_ok else '✗'} Cada fotograma con la posición del SRT "
+          f"en su tiempo (p. ej. {index[0]['name']})")
+
+    # La cola sobrevive a un reinicio: no se vuelve a encolar nada y los
+    # trabajos interrumpidos vuelven a la cola
+    restarted = ingest_daemon.IngestDaemon(
+        watch_dir, out_dir, output_format='zip', settle_seconds=0)
+    queue_ok = restarted.scan() == 0
+    restarted.queue.update(jobs[0]['id'],
+                           status=ingest_daemon.STATUS_RUNNING)
+    queue_ok = queue_ok and restarted.queue.requeue_interrupted() == 1
+    print(f"{'✓' if queue_ok else '✗'} Cola persistente tras reinicio")
+
+    # Dos tarjetas volcadas con un clip del mismo nombre
+    cards_dir = os.path.join(output_dir, "ingest_cards")
+    for card in ("card1", "card2"):
+        os.makedirs(os.path.join(cards_dir, card), exist_ok=True)
+        shutil.copy(video_path, os.path.join(cards_dir, card, "DJI_0001.MP4"))
+        create_test_srt(os.path.join(cards_dir, card, "DJI_0001.SRT"))
+    cards_out = os.path.join(output_dir, "ingest_cards_out")
+    cards = ingest_daemon.IngestDaemon(
+        cards_dir, cards_out, workers=2, fps_extracted=1.0,
+        output_format='dir', settle_seconds=0)
+    cards.run(poll_interval=0, once=True)
+    outputs = sorted(name for name in os.listdir(cards_out)
+                     if name.endswith("_frames"))
+    cards_ok = outputs == ["card1_DJI_0001_frames", "card2_DJI_0001_frames"] \
+        and all(len([f for f in os.listdir(os.path.join(cards_out, name))
+                     if f.endswith(".jpg")]) == 5 for name in outputs)
+    print(f"{'✓' if cards_ok else '✗'} Clips con el mismo nombre en "
+          f"subcarpetas: salidas {outputs}")
+    return ok and tag_ok and queue_ok and cards_ok
+
+
+def test_job_server(video_path, output_dir):
+    """Prueba la API HTTP de trabajos en localhost"""
+    print("\n=== Test: API HTTP de Trabajos ===")
+
+    manager = job_server.JobManager(max_workers=1)
+    server = job_server.JobServer(manager, port=0)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.port}"
+
+    def request(method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload else None
+        req = urllib.request.Request(base + path, data=data, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    try:
+        srt_path = create_test_srt(os.path.join(output_dir, "server.srt"))
+        status, body = request('POST', '/jobs', {
+            'video': video_path, 'srt': srt_path, 'start_time': 1,
+            'end_time': 3, 'interval': 15,
+            'output': os.path.join(output_dir, "server_frames.zip")})
+        job_id = json.loads(body)['id']
+        submit_ok = status == 202
+
+        # Eventos SSE hasta que el trabajo termina
+        with urllib.request.urlopen(f"{base}/jobs/{job_id}/events",
+                                    timeout=60) as response:
+            events = [line.decode('utf-8').split(': ', 1)[1].strip()
+                      for line in response if line.startswith(b'event:')]
+        sse_ok = events[-1] == job_server.STATUS_DONE
+        print(f"{'✓' if submit_ok and sse_ok else '✗'} Eventos SSE: "
+              f"{' -> '.join(dict.fromkeys(events))}")
+
+        status, body = request('GET', f'/jobs/{job_id}/manifest')
+        manifest = json.loads(body)
+        names = [frame['name'] for frame in manifest['frames']]
+        manifest_ok = all([status == 200, manifest['tagged'],
+                           names[0] == "frame_000045_t1.50s.jpg",
+                           len(names) == manifest['extracted'] == 4])
+        print(f"{'✓' if manifest_ok else '✗'} Manifiesto con "
+              f"{len(names)} fotogramas")
+
+        # Con start_time distinto de 0 cada imagen lleva la posición del
+        # SRT en su propio tiempo
+        members = dict(frame_sinks.iter_archive(manifest['output']))
+        lookup = srt_tag.time_lookup(srt_tag.parse_srt_file(srt_path))
+        position_ok = True
+        for frame in manifest['frames']:
+            gps = piexif.load(members[frame['name']])["GPS"]
+            latitude = exif_gps.dms_to_degrees(
+                gps[piexif.GPSIFD.GPSLatitude])
+            expected = lookup(float(frame['timestamp']))['latitude']
+            position_ok = position_ok and abs(latitude - expected) < 1e-7
+        print(f"{'✓' if position_ok else '✗'} Posición del SRT en el tiempo "
+              f"de cada fotograma (desde start_time=1)")
+        manifest_ok = manifest_ok and position_ok
+
+        # Un trabajo con perfiles no tiene 'output' sino una salida por perfil
+        status, body = request('POST', '/jobs', {
+            'video': video_path, 'start_time': 0, 'end_time': 1,
+            'interval': 15, 'profiles': [
+                {'name': 'full',
+                 'output': os.path.join(output_dir, "server_full")},
+                {'name': 'thumb', 'size': 64,
+                 'output': os.path.join(output_dir, "server_thumb")}]})
+        listed = request('GET', '/jobs')
+        jobs = json.loads(listed[1])['jobs'] if listed[0] == 200 else []
+        job_id = json.loads(body)['id'] if status == 202 else None
+        outputs = next((job['outputs'] for job in jobs
+                        if job['id'] == job_id), None)
+        profiles_ok = status == 202 and outputs == {
+            'full': os.path.join(output_dir, "server_full"),
+            'thumb': os.path.join(output_dir, "server_thumb")}
+        print(f"{'✓' if profiles_ok else '✗'} Trabajo con perfiles en la "
+              f"lista de trabajos: {sorted(outputs or {})}")
+
+        bad = request('POST', '/jobs', {'video': 'no_existe.mp4',
+                                        'output': output_dir})[0]
+        missing = request('GET', '/jobs/desconocido')[0]
+        invalid = [request('POST', '/jobs', dict(
+            {'video': video_path, 'output': output_dir}, **fields))[0]
+            for fields in ({'start_time': 3, 'end_time': 3},
+                           {'interval': 1.5})]
+        # Content-Length no numérico o negativo: 400, no una conexión cortada
+        import http.client
+        for length in ('abc', '-1'):
+            connection = http.client.HTTPConnection('127.0.0.1', server.port,
+                                                    timeout=30)
+            connection.putrequest('POST', '/jobs')
+            connection.putheader('Content-Length', length)
+            connection.endheaders()
+            invalid.append(connection.getresponse().status)
+            connection.close()
+        errors_ok = bad == 400 and missing == 404 and invalid == [400] * 4
+        print(f"{'✓' if errors_ok else '✗'} Errores: {bad}, {missing}, "
+              f"peticiones no válidas {invalid}")
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        manager.shutdown()
+    return submit_ok and sse_ok and manifest_ok and profiles_ok and errors_ok
+
+
+def test_shard_extract(video_path, output_dir):
+    """Prueba la extracción repartida en shards con varios procesos"""
+    print("\n=== Test: Extracción en Shards ===")
+
+    clip_dir = os.path.join(output_dir, "shard_clips")
+    os.makedirs(clip_dir, exist_ok=True)
+    clip = os.path.join(clip_dir, "DJI_0100.MP4")
+    shutil.copy(video_path, clip)
+    srt_path = create_test_srt(os.path.join(clip_dir, "DJI_0100.SRT"))
+
+    shared = os.path.join(output_dir, "shard_shared")
+    sharded_out = os.path.join(output_dir, "shard_out")
+    count = shard_extract.plan(shared, [clip], sharded_out, interval=10,
+                               start_time=0.5, shard_frames=35)
+    ranges_ok = count == 5 and shard_extract.shard_ranges(
+        15, 150, 10, 35) == [(15, 45), (45, 75), (75, 105), (105, 135),
+                             (135, 150)]
+
+    # Shard reclamado de un worker caído (sin heartbeat)
+    stale = os.path.join(shared, "claimed", "000-00001.json")
+    os.rename(os.path.join(shared, "pending", "000-00001.json"), stale)
+    os.utime(stale, (time.time() - 60, time.time() - 60))
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "shard_extract.py")
+    workers = [subprocess.Popen(
+        [sys.executable, script, 'work', shared, '--timeout', '10',
+         '--worker-id', f'w{i}'], stdout=subprocess.DEVNULL)
+        for i in range(3)]
+    codes = [worker.wait(timeout=120) for worker in workers]
+    counts = shard_extract.shard_counts(shared)
+    ok = all([ranges_ok, codes == [0, 0, 0], counts['done'] == 5,
+              counts['pending'] == counts['claimed'] == 0])
+    print(f"{'✓' if ok else '✗'} {count} shards en 3 procesos: {counts}")
+
+    # Una ejecución en un solo nodo produce los mismos archivos
+    single_out = os.path.join(output_dir, "shard_single")
+    os.makedirs(single_out, exist_ok=True)
+    frame_extraction.FrameExtractionJob(
+        clip, single_out, 15, 150, 10, 30.0,
+        track=srt_tag.time_lookup(srt_tag.parse_srt_file(srt_path))).run()
+    sharded_dir = os.path.join(sharded_out, "DJI_0100_frames")
+    names = sorted(os.listdir(single_out))
+
+    def read(folder, name):
+        with open(os.path.join(folder, name), 'rb') as f:
+            return f.read()
+
+    same = names == sorted(os.listdir(sharded_dir)) and all([
+        read(single_out, name) == read(sharded_dir, name) for name in names])
+    gps = piexif.load(os.path.join(sharded_dir, names[-1]))["GPS"]
+    same = same and gps[piexif.GPSIFD.GPSLatitudeRef] == b'N'
+    print(f"{'✓' if same else '✗'} Igual a un solo nodo: "
+          f"{len(names)} fotogramas")
+    return ok and same
+
+
+def test_geo_outputs(output_dir):
+    """Prueba las salidas de posiciones sin modificar las imágenes"""
+    print("\n=== Test: Salidas geo.txt/CSV/GeoJSON/XMP ===")
+
+    frames_dir = os.path.join(output_dir, "geo_frames")
+    os.makedirs(frames_dir, exist_ok=True)
+    for i in range(3):
+        with open(os.path.join(frames_dir, f"frame_{i:06d}.jpg"), 'wb') as f:
+            f.write(b'no es un jpeg')
+    srt_path = create_test_srt(os.path.join(output_dir, "geo.srt"))
+
+    all_ok = True
+    for fmt in geo_outputs.GEO_FORMATS:
+        ok = srt_tag.write_geo(srt_path, frames_dir, 30, 'jpg', 1, fmt)
+        all_ok = all_ok and ok
+    with open(os.path.join(frames_dir, "geo.txt")) as f:
+        lines = f.read().splitlines()
+    geo_ok = lines[0] == "EPSG:4326" and lines[2] == (
+        "frame_000001.jpg -3.00300000 40.00300000 103.000")
+    with open(os.path.join(frames_dir, "flight.geojson")) as f:
+        features = json.load(f)['features']
+    geojson_ok = len(features) == 4 and \
+        features[-1]['geometry']['type'] == 'LineString'
+    # Con menos de dos imágenes no hay línea de vuelo (LineString no válida)
+    short = {}
+    for count in (0, 1):
+        path = os.path.join(output_dir, f"short_{count}.geojson")
+        geo_outputs.write_geojson(
+            path, [("frame_000000.jpg", 40.0, -3.0, 100.0)][:count])
+        with open(path) as f:
+            short[count] = [feature['geometry']['type']
+                            for feature in json.load(f)['features']]
+    geojson_ok = geojson_ok and short == {0: [], 1: ['Point']}
+    with open(os.path.join(frames_dir, "frame_000002.xmp")) as f:
+        xmp_ok = 'exif:GPSLatitude="40,00.360000N"' in f.read()
+    with open(os.path.join(frames_dir, "frame_000000.jpg"), 'rb') as f:
+        untouched = f.read() == b'no es un jpeg'
+
+    all_ok = all([all_ok, geo_ok, geojson_ok, xmp_ok, untouched])
+    print(f"{'✓' if all_ok else '✗'} geo.txt, CSV, GeoJSON y XMP escritos; "
+          f"imágenes sin modificar")
+    return all_ok
+
+
+def test_aoi_extraction(video_path, output_dir):
+    """Prueba la extracción limitada a un área de interés"""
+    print("\n=== Test: Extracción por Área de Interés ===")
+
+    frames_data = srt_tag.parse_srt_file(
+        create_test_srt(os.path.join(output_dir, "aoi.srt")))
+    lats = [f['latitude'] for f in frames_data]
+    lons = [f['longitude'] for f in frames_data]
+    grid = aoi.GridIndex(lats, lons, cell_size=0.002)
+    found = grid.query_bbox(-3.00705, 40.00395, -3.00395, 40.00705)
+    # Polígono con hueco: los puntos del hueco quedan fuera
+    ring = [[-4, 39], [-2, 39], [-2, 41], [-4, 41], [-4, 39]]
+    hole = [[-3.1, 40.0045], [-2.9, 40.0045], [-2.9, 40.0055],
+            [-3.1, 40.0055], [-3.1, 40.0045]]
+    holed = grid.query_polygons([[ring, hole]])
+    index_ok = list(found) == list(range(40, 71)) and \
+        len(holed) == 140 and 50 not in holed
+    print(f"{'✓' if index_ok else '✗'} Índice en rejilla y polígono con hueco")
+
+    # Dos pasadas separadas por el área: dos tramos con salto entre ellos
+    polygons = [aoi.bbox_polygon(-3.00205, 40.00095, -3.00095, 40.00205),
+                aoi.bbox_polygon(-3.01205, 40.00995, -3.00995, 40.01205)]
+    plan = aoi.plan_aoi(frames_data, polygons, 30.0, 10, merge_gap=0.5)
+    ranges_ok = plan['ranges'] == [(0, 20), (90, 120)]
+
+    aoi_dir = os.path.join(output_dir, "aoi_frames")
+    full_dir = os.path.join(output_dir, "aoi_full")
+    for folder in (aoi_dir, full_dir):
+        os.makedirs(folder, exist_ok=True)
+    frame_extraction.FrameExtractionJob(
+        video_path, aoi_dir, 0, 0, 10, 30.0, ranges=plan['ranges']).run()
+    frame_extraction.FrameExtractionJob(video_path, full_dir, 0, 150, 10,
+                                        30.0).run()
+    names = sorted(os.listdir(aoi_dir))
+    expected = [name for name in sorted(os.listdir(full_dir))
+                if int(name[6:12]) in (10, 20, 100, 110, 120)]
+
+    def read(folder, name):
+        with open(os.path.join(folder, name), 'rb') as f:
+            return f.read()
+
+    extract_ok = names == expected and all([
+        read(aoi_dir, name) == read(full_dir, name) for name in names])
+    print(f"{'✓' if ranges_ok and extract_ok else '✗'} Tramos "
+          f"{plan['ranges']}: {len(names)} fotogramas iguales a la "
+          f"extracción completa")
+    return index_ok and ranges_ok and extract_ok
+
+
+def test_srt_tag_batch(output_dir):
+    """Prueba el etiquetado por lotes de varias carpetas con un manifiesto"""
+    print("\n=== Test: Etiquetado por Lotes ===")
+
+    batch_dir = os.path.join(output_dir, "batch")
+    os.makedirs(batch_dir, exist_ok=True)
+    create_test_srt(os.path.join(batch_dir, "a.srt"))
+    create_test_srt(os.path.join(batch_dir, "b.srt"))
+    encoder = frame_encoders.get_encoder('opencv-jpeg', 'fast')
+    frame = np.full((48, 64, 3), 128, dtype=np.uint8)
+    for name, count in (("a.zip", 3), ("b.zip", 5)):
+        with frame_sinks.open_sink(os.path.join(batch_dir, name)) as sink:
+            for i in range(count):
+                sink.write(f"frame_{i:06d}.jpg", encoder.encode(frame),
+                           {'frame': i * 30, 'timestamp': f"{i:.3f}"})
+    manifest = os.path.join(batch_dir, "lote.csv")
+    with open(manifest, 'w') as f:
+        f.write("# srt, carpeta, fps original\n"
+                "a.srt, a.zip\n"
+                "b.srt, b.zip, 30\n"
+                "falta.srt, a.zip\n")
+
+    jobs = srt_tag.read_batch_manifest(manifest, 30, 'jpg', 1)
+    summaries = srt_tag.tag_batch(jobs, workers=2)
+    members = dict(frame_sinks.iter_archive(os.path.join(batch_dir, "b.zip")))
+    gps = piexif.load(members["frame_000004.jpg"])["GPS"]
+    ok = all([[s['tagged'] for s in summaries] == [3, 5, 0],
+              summaries[0]['error'] is None,
+              summaries[2]['error'] == 'SRT file not found',
+              gps[piexif.GPSIFD.GPSLatitudeRef] == b'N'])
+    print(f"{'✓' if ok else '✗'} Lote de {len(jobs)} trabajos: "
+          f"{[s['tagged'] for s in summaries]} fotogramas etiquetados")
+
+    # Archivo con PNG: se rechaza como en tag_archive, sin llegar al worker
+    png = frame_encoders.get_encoder('png', 'fast')
+    with frame_sinks.open_sink(os.path.join(batch_dir, "c.zip")) as sink:
+        sink.write("frame_000000.png", png.encode(frame),
+                   {'frame': 0, 'timestamp': "0.000"})
+    with open(manifest, 'w') as f:
+        f.write("a.srt, c.zip\n")
+    png_summary = srt_tag.tag_batch(
+        srt_tag.read_batch_manifest(manifest, 30, 'png', 1), workers=1)[0]
+    png_ok = png_summary['tagged'] == 0 and png_summary['error'] == \
+        "tagging inside archives supports jpg and webp, not .png"
+    print(f"{'✓' if png_ok else '✗'} Archivo con PNG: {png_summary['error']}")
+    ok = ok and png_ok
+
+    with open(manifest, 'w') as f:
+        f.write("a.srt, a.zip\n")
+    try:
+        srt_tag.read_batch_manifest(manifest, extension='jpg')
+        print("✗ Manifiesto sin fps no rechazado")
+        ok = False
+    except ValueError:
+        print("✓ Manifiesto sin fps rechazado")
+    return ok
+
+
+def test_output_profiles(video_path, output_dir):
+    """Prueba varias salidas (tamaño, formato, carpeta) con una sola decodificación"""
+    print("\n=== Test: Perfiles de Salida ===")
+
+    track = srt_tag.time_lookup(srt_tag.parse_srt_file(
+        create_test_srt(os.path.join(output_dir, "profiles.srt"))))
+    base = os.path.join(output_dir, "profiles")
+    profiles = [
+        output_profiles.parse_profile(f"full={base}_full"),
+        output_profiles.parse_profile(
+            f"preview={base}_preview.zip,size=320,quality=80"),
+        output_profiles.parse_profile(
+            f"thumb={base}_thumb,size=64,encoder=png,preset=fast"),
+    ]
+    output_profiles.make_output_dirs(profiles)
+    result = frame_extraction.FrameExtractionJob(
+        video_path, None, 0, 60, 30, 30.0, track=track,
+        profiles=profiles).run()
+
+    single_dir = base + "_single"
+    os.makedirs(single_dir, exist_ok=True)
+    frame_extraction.FrameExtractionJob(video_path, single_dir, 0, 60, 30,
+                                        30.0, track=track).run()
+
+    full = sorted(os.listdir(base + "_full"))
+    thumbs = sorted(os.listdir(base + "_thumb"))
+    preview = dict(frame_sinks.iter_archive(base + "_preview.zip"))
+
+    def read(folder, name):
+        with open(os.path.join(folder, name), 'rb') as f:
+            return f.read()
+
+    same = full == sorted(os.listdir(single_dir)) and all(
+        read(base + "_full", name) == read(single_dir, name)
+        for name in full)
+    preview_image = Image.open(io.BytesIO(preview[full[0]]))
+    thumb_image = Image.open(os.path.join(base + "_thumb", thumbs[0]))
+    gps = piexif.load(preview[full[0]])["GPS"]
+    stems = {os.path.splitext(name)[0] for name in full + thumbs}
+    ok = all([result['extracted'] == 2, len(full) == 2, same,
+              len(stems) == 2,
+              preview_image.size == (320, 240), thumb_image.size == (64, 48),
+              abs(exif_gps.dms_to_degrees(
+                  gps[piexif.GPSIFD.GPSLatitude]) - 40.003) < 1e-6,
+              'exif' in thumb_image.info,
+              set(result['outputs']) == {'full', 'preview', 'thumb'}])
+    print(f"{'✓' if ok else '✗'} 3 perfiles desde una decodificación: "
+          f"{len(full)} fotogramas en cada uno, con GPS")
+
+    try:
+        output_profiles.parse_profile("thumb=t/,size=64,encoder=png,quality=5")
+        print("✗ Calidad en PNG no rechazada")
+        ok = False
+    except ValueError:
+        print("✓ Perfil inválido rechazado")
+    return ok
+
+
+def test_undistort(video_path, output_dir):
+    """Prueba la corrección de distorsión con tablas de remapeo en caché"""
+    print("\n=== Test: Corrección de Distorsión ===")
+
+    # Calibración a 1280x960: las intrínsecas se escalan a 640x480
+    camera_path = os.path.join(output_dir, "camera.json")
+    with open(camera_path, 'w') as f:
+        json.dump({'fx': 1000, 'fy': 1000, 'cx': 640, 'cy': 480,
+                   'dist_coeffs': [-0.3, 0.1, 0, 0, 0],
+                   'width': 1280, 'height': 960}, f)
+    cache_dir = os.path.join(output_dir, "remap_cache")
+    undistorter = undistort.load_camera(camera_path, cache_dir=cache_dir)
+
+    plain_dir = os.path.join(output_dir, "undistort_plain")
+    fixed_dir = os.path.join(output_dir, "undistort_fixed")
+    for folder in (plain_dir, fixed_dir):
+        os.makedirs(folder, exist_ok=True)
+    frame_extraction.FrameExtractionJob(video_path, plain_dir, 0, 60, 30,
+                                        30.0).run()
+    frame_extraction.FrameExtractionJob(video_path, fixed_dir, 0, 60, 30,
+                                        30.0, undistort=undistorter).run()
+    names = sorted(os.listdir(fixed_dir))
+    cached = os.listdir(cache_dir)
+
+    cap = cv2.VideoCapture(video_path)
+    ret, frame = cap.read()
+    cap.release()
+    matrix = np.array([[500, 0, 320], [0, 500, 240], [0, 0, 1]], float)
+    coeffs = np.array([-0.3, 0.1, 0, 0, 0])
+    new_matrix, _ = cv2.getOptimalNewCameraMatrix(matrix, coeffs,
+                                                  (640, 480), 0.0)
+    expected = cv2.undistort(frame, matrix, coeffs, None, new_matrix)
+    result = undistorter.apply(frame).astype(int)
+    difference = np.abs(result - expected.astype(int)).mean()
+    changed = np.abs(expected.astype(int) - frame.astype(int)).mean()
+    ok = all([ret, names == sorted(os.listdir(plain_dir)), len(names) == 2,
+              len(cached) == 1, difference < 1.0, changed > 1.0])
+    print(f"{'✓' if ok else '✗'} {len(names)} fotogramas corregidos "
+          f"(diferencia media {difference:.2f} con cv2.undistort)")
+
+    # Otra instancia con los mismos parámetros lee las tablas del disco
+    class NoBuild(undistort.Undistorter):
+        def _build(self, width, height):
+            raise AssertionError("tablas recalculadas")
+
+    reloaded = NoBuild(undistorter.camera_matrix, undistorter.dist_coeffs,
+                       (1280, 960), cache_dir=cache_dir)
+    try:
+        map1, _ = reloaded.maps(640, 480)
+        cache_ok = np.array_equal(map1, undistorter.maps(640, 480)[0])
+    except AssertionError:
+        cache_ok = False
+    print(f"{'✓' if cache_ok else '✗'} Tablas de remapeo leídas de la caché")
+    return ok and cache_ok
+
+
+def test_lazy_imports():
+    """Prueba que los puntos de entrada no cargan módulos pesados al inicio"""
+    print("\n=== Test: Importaciones Diferidas ===")
+
+    heavy = ('cv2', 'numpy', 'piexif', 'tkinter')
+    code = ("import contextlib, io, sys\n"
+            "{}\n"
+            "print(','.join(m for m in {!r} if m in sys.modules))")
+    headless = ("import extractor_main\n"
+                "with contextlib.redirect_stdout(io.StringIO()):\n"
+                "    try:\n"
+                "        extractor_main.main(['tag', '--help'])\n"
+                "    except SystemExit:\n"
+                "        pass")
+    all_ok = True
+    for label, setup, allowed in (
+            ("Comando sin interfaz", headless, ()),
+            ("Módulo de la interfaz", "import video_frame_extractor",
+             ('tkinter',))):
+        result = subprocess.run(
+            [sys.executable, '-c', code.format(setup, heavy)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True)
+        loaded = [m for m in result.stdout.strip().split(',') if m]
+        ok = result.returncode == 0 and set(loaded) <= set(allowed)
+        all_ok = all_ok and ok
+        print(f"{'✓' if ok else '✗'} {label}: cargados "
+              f"{loaded or 'ninguno'}")
+    return all_ok
+
+
+def test_sharded_output(video_path, output_dir):
+    """Prueba la salida en subcarpetas con índice y escritura atómica"""
+    print("\n=== Test: Salida en Subcarpetas ===")
+
+    folder = os.path.join(output_dir, "sharded")
+    frame_sinks.create_sharded_dir(folder, shard_span=60)
+    frame_extraction.FrameExtractionJob(video_path, folder, 0, 150, 30,
+                                        30.0).run()
+    names = frame_sinks.list_frames(folder)
+    shards = sorted(entry.name for entry in os.scandir(folder)
+                    if entry.is_dir())
+    on_disk = sorted(f"{shard}/{name}" for shard in shards
+                     for name in os.listdir(os.path.join(folder, shard)))
+    ok = all([shards == ['0000000', '0000060', '0000120'],
+              names == on_disk, len(names) == 5,
+              names[1].startswith('0000060/frame_000060_')])
+    print(f"{'✓' if ok else '✗'} {len(names)} fotogramas en "
+          f"{len(shards)} subcarpetas, listados desde el índice")
+
+    srt_path = create_test_srt(os.path.join(output_dir, "sharded.srt"))
+    geo_ok = srt_tag.write_geo(srt_path, folder, 30, 'jpg', 1, 'xmp')
+    geo_ok = geo_ok and os.path.exists(os.path.join(
+        folder, os.path.splitext(names[1])[0] + '.xmp'))
+    print(f"{'✓' if geo_ok else '✗'} Sidecars XMP junto a cada imagen")
+
+    # Extracción interrumpida: sin índice se recorren las subcarpetas, y
+    # los archivos temporales a medio escribir no cuentan
+    sink = frame_sinks.open_sink(folder)
+    sink.write("frame_000200_t6.67s.jpg", b'jpeg', {'frame': 200})
+    with open(os.path.join(folder, '0000000', 'frame_000010_t0.33s.jpg.1.tmp'),
+              'wb') as f:
+        f.write(b'a medio')
+    interrupted = [name for name in frame_sinks.list_frames(folder)
+                   if name.endswith('.jpg')]
+    sink.close()
+    index = frame_sinks.read_folder_index(folder)
+    crash_ok = all([
+        index is not None and len(index) == 6,
+        interrupted == sorted(names + ['0000180/frame_000200_t6.67s.jpg']),
+        [record['name'] for record in index] == interrupted])
+    print(f"{'✓' if crash_ok else '✗'} Índice reconstruido tras una "
+          f"interrupción: {len(index)} fotogramas")
+    return ok and geo_ok and crash_ok
+
+
+def test_srt_concat_append(output_dir):
+    """Prueba la concatenación incremental de SRT con estado guardado"""
+    print("\n=== Test: Concatenación SRT Incremental ===")
+
+    concat_dir = os.path.join(output_dir, "concat")
+    os.makedirs(concat_dir, exist_ok=True)
+    clips = [create_test_srt(os.path.join(concat_dir, f"clip{i}.srt"),
+                             total_frames=30 * (i + 1))
+             for i in range(3)]
+    list_path = os.path.join(concat_dir, "lista.txt")
+    full_path = os.path.join(concat_dir, "completo.srt")
+    append_path = os.path.join(concat_dir, "incremental.srt")
+
+    def write_list(paths):
+        with open(list_path, 'w') as f:
+            f.write('\n'.join(paths) + '\n')
+
+    def read(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    write_list(clips)
+    srt_concat.concatenate_srt_files(list_path, full_path)
+    write_list(clips[:2])
+    srt_concat.concatenate_srt_files(list_path, append_path, append=True)
+
+    # Al añadir el tercer clip solo se lee ese archivo
+    read_files = []
+    original_read = srt_concat.read_srt_file
+
+    def tracking_read(path):
+        read_files.append(path)
+        return original_read(path)
+
+    srt_concat.read_srt_file = tracking_read
+    try:
+        write_list(clips)
+        srt_concat.concatenate_srt_files(list_path, append_path, append=True)
+        appended = list(read_files)
+        # Un clip anterior modificado obliga a rehacer todo el archivo
+        create_test_srt(clips[0], total_frames=45)
+        del read_files[:]
+        srt_concat.concatenate_srt_files(list_path, append_path, append=True)
+        rebuilt = list(read_files)
+    finally:
+        srt_concat.read_srt_file = original_read
+
+    with open(srt_concat.state_path(append_path)) as f:
+        state = json.load(f)
+    ok = all([appended == [clips[2]], rebuilt == clips,
+              state['frame_offset'] == 45 + 60 + 90,
+              len(state['inputs']) == 3])
+    srt_concat.concatenate_srt_files(list_path, full_path)
+    same = read(append_path) == read(full_path)
+    print(f"{'✓' if ok else '✗'} Solo se procesa el clip nuevo; un cambio "
+          f"anterior rehace el archivo")
+    print(f"{'✓' if same else '✗'} Resultado idéntico a la concatenación "
+          f"completa ({state['frame_offset']} bloques)")
+    return ok and same
+
+
+def test_frame_cache(video_path, output_dir):
+    """Prueba la caché de fotogramas entre extracciones que se solapan"""
+    print("\n=== Test: Caché de Fotogramas ===")
+
+    track = srt_tag.time_lookup(srt_tag.parse_srt_file(
+        create_test_srt(os.path.join(output_dir, "cache.srt"))))
+    cache = frame_cache.FrameCache(os.path.join(output_dir, "frame_cache"))
+    folders = {}
+    results = {}
+    # La segunda extracción comparte los fotogramas 45 y 60 con la primera
+    for name, start, end, use_cache in (("first", 0, 60, True),
+                                        ("second", 30, 120, True),
+                                        ("plain", 30, 120, False)):
+        folders[name] = os.path.join(output_dir, f"cache_{name}")
+        os.makedirs(folders[name], exist_ok=True)
+        results[name] = frame_extraction.FrameExtractionJob(
+            video_path, folders[name], start, end, 15, 30.0, track=track,
+            cache=cache if use_cache else None).run()
+
+    def read(folder, name):
+        with open(os.path.join(folder, name), 'rb') as f:
+            return f.read()
+
+    names = sorted(os.listdir(folders["second"]))
+    same = names == sorted(os.listdir(folders["plain"])) and all(
+        read(folders["second"], name) == read(folders["plain"], name)
+        for name in names)
+    linked = [name for name in names
+              if os.stat(os.path.join(folders["second"], name)).st_nlink > 1]
+    frames = [record['frame'] for record in results["second"]['records']]
+    ok = all([results["first"]['cached'] == 0,
+              results["second"]['cached'] == 2,
+              results["second"]['extracted'] == 6, same,
+              len(linked) == 2, frames == [45, 60, 75, 90, 105, 120]])
+    print(f"{'✓' if ok else '✗'} Segunda extracción: "
+          f"{results['second']['cached']}/{results['second']['extracted']} "
+          f"fotogramas desde la caché ({len(linked)} enlazados), "
+          f"idénticos a una extracción sin caché")
+
+    small = frame_cache.FrameCache(os.path.join(output_dir, "frame_cache_lru"),
+                                   max_bytes=250)
+    for key in ("a", "b", "c"):
+        small.put(key * 40, bytes(100))
+        time.sleep(0.01)
+    small.get_many(["a" * 40])
+    evicted = small.evict()
+    kept = set(small.get_many(["a" * 40, "b" * 40, "c" * 40]))
+    lru_ok = evicted == 1 and kept == {"a" * 40, "c" * 40} and \
+        small.size() == 200
+    print(f"{'✓' if lru_ok else '✗'} Límite de tamaño: se elimina la "
+          f"entrada usada hace más tiempo")
+
+    # Como en Windows, no se puede borrar ni reemplazar un fichero de solo
+    # lectura; las entradas de la caché lo son
+    remove, replace = os.remove, os.replace
+
+    def is_writable(path):
+        # os.access siempre es cierto para root
+        return bool(os.stat(path).st_mode & stat.S_IWRITE)
+
+    def refuse_read_only(function):
+        def call(*args):
+            target = args[-1]
+            if os.path.exists(target) and not is_writable(target):
+                raise PermissionError(f"read-only: {target}")
+            return function(*args)
+        return call
+
+    os.remove, os.replace = refuse_read_only(remove), refuse_read_only(replace)
+    try:
+        small.put("a" * 40, bytes(150))
+        small.put("d" * 40, bytes(100))
+        evicted = small.evict()
+    finally:
+        os.remove, os.replace = remove, replace
+    entries = {key: os.path.exists(small.entry_path(key * 40))
+               for key in "acd"}
+    with open(small.entry_path("a" * 40), 'rb') as f:
+        rewritten = len(f.read()) == 150
+    read_only = not is_writable(small.entry_path("d" * 40))
+    windows_ok = evicted == 1 and rewritten and read_only and \
+        entries == {"a": True, "c": False, "d": True} and small.size() == 250
+    print(f"{'✓' if windows_ok else '✗'} Entradas de solo lectura: se "
+          f"reemplazan y se eliminan sin errores de permisos")
+
+    # Cada llamada cierra su conexión, sin esperar al recolector
+    gc.disable()
+    try:
+        before = open_files()
+        for key in ("e", "f", "g"):
+            small.put(key * 40, bytes(10))
+        small.get_many(["e" * 40])
+        small.size()
+        small.evict()
+        closed_ok = open_files() == before
+    finally:
+        gc.enable()
+    print(f"{'✓' if closed_ok else '✗'} Conexiones SQLite cerradas")
+    return ok and lru_ok and windows_ok and closed_ok
+
+
+def test_flight_track(output_dir):
+    """Prueba la trayectoria de vuelo simplificada para dibujarla"""
+    print("\n=== Test: Trayectoria de Vuelo ===")
+
+    def reference(x, y, first, last, tolerance, kept):
+        # Douglas-Peucker recursivo clásico
+        if last - first < 2:
+            return
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px = x[first + 1:last] - x[first]
+        py = y[first + 1:last] - y[first]
+        distances = np.abs(px * dy - py * dx) / np.hypot(dx, dy)
+        middle = first + 1 + int(np.argmax(distances))
+        if distances[middle - first - 1] >= tolerance:
+            kept.add(middle)
+            reference(x, y, first, middle, tolerance, kept)
+            reference(x, y, middle, last, tolerance, kept)
+
+    rng = np.random.default_rng(1)
+    x = np.cumsum(rng.normal(0, 1, 300))
+    y = np.cumsum(rng.normal(0, 1, 300))
+    significance = flight_track.significance(x, y)
+    same = True
+    for tolerance in (0.5, 2.0, 8.0):
+        kept = {0, 299}
+        reference(x, y, 0, 299, tolerance, kept)
+        same = same and set(np.flatnonzero(significance >= tolerance)) == kept
+    print(f"{'✓' if same else '✗'} Misma simplificación que Douglas-Peucker "
+          f"a cualquier tolerancia")
+
+    # Trayectoria recta del SRT de prueba: basta con sus dos extremos
+    track = flight_track.FlightTrack.from_srt(
+        create_test_srt(os.path.join(output_dir, "track.srt")))
+    transform = flight_track.CanvasTransform(track, 400, 300)
+    coords = transform.coords(np.arange(len(track)))
+    back = transform.to_track(coords[20], coords[21])
+    ok = all([list(track.decimate(transform.tolerance)) == [0, 149],
+              min(coords) >= 0, max(coords[0::2]) <= 400,
+              max(coords[1::2]) <= 300,
+              track.nearest(*back) == 10,
+              track.index_at(1.0) == 30,
+              list(track.decimate(transform.tolerance, 30, 60)) == [30, 60]])
+    print(f"{'✓' if ok else '✗'} Línea recta de {len(track)} puntos dibujada "
+          f"con 2; clic en el lienzo -> punto 10")
+
+    # Vuelo largo con ruido GPS: pocos puntos visibles en pantalla
+    count = 100000
+    heading = np.cumsum(rng.normal(0, 0.01, count))
+    started = time.perf_counter()
+    long_track = flight_track.FlightTrack(
+        np.arange(count) / 30.0,
+        40.0 + np.cumsum(np.cos(heading)) * 1e-6,
+        -3.7 + np.cumsum(np.sin(heading)) * 1e-6)
+    view = flight_track.CanvasTransform(long_track, 600, 450)
+    drawn = len(long_track.decimate(view.tolerance))
+    elapsed = time.perf_counter() - started
+    long_ok = 2 <= drawn < count // 10
+    print(f"{'✓' if long_ok else '✗'} {count} puntos -> {drawn} dibujados "
+          f"({elapsed * 1000:.0f} ms)")
+    return same and ok and long_ok
+
+
+# ffmpeg simulado: emite fotogramas rawvideo cuyo valor de píxel es el
+# índice del fotograma (módulo 256), respetando -ss, select y -skip_frame
+FFMPEG_STUB = r"""
+import math
+import os
+import re
+import sys
+
+args = sys.argv[1:]
+fps = float(os.environ['STUB_FPS'])
+total = int(os.environ['STUB_FRAMES'])
+keyframes = [int(i) for i in os.environ['STUB_KEYFRAMES'].split(',')]
+width, height = (int(v) for v in os.environ['STUB_SIZE'].split('x'))
+start = 0
+if '-ss' in args:
+    start = math.ceil(float(args[args.index('-ss') + 1]) * fps - 1e-6)
+count = int(args[args.index('-frames:v') + 1])
+if '-skip_frame' in args:
+    indices = [i for i in keyframes if i >= start]
+else:
+    step = 1
+    if '-vf' in args:
+        step = int(re.search(r'n\+1\\,(\d+)', args[args.index('-vf') + 1])
+                   .group(1))
+    indices = [start + n for n in range(total - start) if (n + 1) % step == 0]
+for index in indices[:count]:
+    sys.stdout.buffer.write(bytes([index % 256]) * (width * height * 3))
+"""
+
+
+def test_frame_decoders(video_path, output_dir):
+    """Prueba los decodificadores intercambiables (OpenCV y ffmpeg)"""
+    print("\n=== Test: Decodificadores ===")
+
+    stub_path = os.path.join(output_dir, "ffmpeg_stub.py")
+    with open(stub_path, 'w') as f:
+        f.write(FFMPEG_STUB)
+    keyframes = list(range(0, 150, 6))
+    os.environ.update({'STUB_FPS': '30', 'STUB_FRAMES': '150',
+                       'STUB_SIZE': '64x48',
+                       'STUB_KEYFRAMES': ','.join(map(str, keyframes))})
+    flags = np.zeros(150, dtype=bool)
+    flags[keyframes] = True
+    index = pts_index.PtsIndex(np.arange(150) / 30.0, flags)
+    factory = frame_decoders.get_decoder(
+        'ffmpeg', executable=[sys.executable, stub_path], size=(64, 48))
+
+    def never():
+        return False
+
+    ranges = [(0, 40), (50, 100), (300, 330)]
+    expected = [10, 20, 30, 40, 60, 70, 80, 90, 100]
+    with frame_decoders.get_decoder('opencv')(video_path, 30.0) as decoder:
+        opencv_frames = list(decoder.select(ranges, 10, never))
+    pixels_ok = True
+    with factory(video_path, 30.0) as decoder:
+        ffmpeg_frames = []
+        for number in decoder.select(ranges, 10, never):
+            ffmpeg_frames.append(number)
+            ok, frame = decoder.retrieve()
+            pixels_ok = pixels_ok and ok and frame[0, 0, 0] == number - 1
+    ok = opencv_frames == expected and ffmpeg_frames == expected and pixels_ok
+    print(f"{'✓' if ok else '✗'} OpenCV y ffmpeg seleccionan los mismos "
+          f"fotogramas: {ffmpeg_frames}")
+
+    # Solo fotogramas clave: el 121 va en otro proceso (lejos de los demás)
+    wanted = [7, 19, 121]
+    with factory(video_path, 30.0, index) as decoder:
+        keys = []
+        for number in decoder.select_keyframes(wanted, never):
+            ok_key, frame = decoder.retrieve()
+            if ok_key and frame[0, 0, 0] == number - 1:
+                keys.append(number)
+    cap = cv2.VideoCapture(video_path)
+    sequential = [cap.read()[1] for _ in range(19)]
+    cap.release()
+    with frame_decoders.get_decoder('opencv')(video_path, 30.0) as decoder:
+        seeked = []
+        for number in decoder.select_keyframes([7, 19], never):
+            seeked.append(decoder.retrieve()[1])
+    keys_ok = keys == wanted and len(seeked) == 2 and \
+        np.array_equal(seeked[0], sequential[6]) and \
+        np.array_equal(seeked[1], sequential[18])
+    print(f"{'✓' if keys_ok else '✗'} Modo de fotogramas clave: {keys}")
+
+    # Trabajo completo con el ffmpeg simulado y solo fotogramas clave
+    folder = os.path.join(output_dir, "decoder_keyframes")
+    os.makedirs(folder, exist_ok=True)
+    job = frame_extraction.FrameExtractionJob(
+        video_path, folder, 0, 60, 10, 30.0, pts_index=index,
+        encoder=frame_encoders.get_encoder('png'), decoder=factory,
+        keyframes_only=True)
+    result = job.run()
+    frames = [record['frame'] for record in result['records']]
+    image = cv2.imread(os.path.join(folder, result['records'][-1]['name']))
+    job_ok = frames == [1, 13, 25, 37, 49] and \
+        result['extracted'] == job.total_to_extract() == 5 and \
+        image.shape == (48, 64, 3) and image[0, 0, 0] == 48
+    print(f"{'✓' if job_ok else '✗'} Extracción de fotogramas clave "
+          f"(uno cada 10 como mínimo): {frames}")
+
+    try:
+        frame_decoders.get_decoder('vlc')
+        print("✗ Decodificador desconocido aceptado")
+        return False
+    except ValueError:
+        print("✓ Decodificador desconocido rechazado")
+    return ok and keys_ok and job_ok
+
+
+def test_shm_ring():
+    """Prueba el anillo de memoria compartida entre procesos"""
+    print("\n=== Test: Anillo de Memoria Compartida ===")
+
+    with shm_ring.SharedFrameRing(2, (48, 64, 3)) as ring:
+        slot = ring.acquire()
+        ring.frame(slot)[...] = 7
+        ring.publish(slot, 30)
+        errors = 0
+        try:
+            ring.release(slot)  # publicado pero aún sin consumidor
+        except ValueError:
+            errors += 1
+        got, info = ring.get()
+        view = ring.frame(got)
+        same = got == slot and info == 30 and int(view.max()) == 7 and \
+            ring.state(got) == 'reading'
+        ring.release(got)
+        try:
+            ring.release(got)
+        except ValueError:
+            errors += 1
+        del view
+        ok = same and errors == 2 and ring.state(got) == 'free'
+    print(f"{'✓' if ok else '✗'} Propiedad de las ranuras: liberar una "
+          f"ranura ajena se rechaza")
+
+    # Dos procesos consumidores leen los fotogramas sin copiarlos
+    frames = benchmark.synthetic_frames(3, 64, 48)
+    results = benchmark.bench_handoff(frames, consumers=2, slots=2)
+    handoff_ok = all(matches for _, _, matches in results)
+    print(f"{'✓' if handoff_ok else '✗'} Fotogramas recibidos intactos por "
+          f"2 procesos (cola y anillo)")
+    return ok and handoff_ok
+
+
+def test_frame_preview(video_path):
+    """Prueba la vista previa: caché LRU, fotogramas clave y precarga"""
+    print("\n=== Test: Vista Previa ===")
+
+    lru = frame_preview.PreviewCache(max_bytes=10)
+    lru.put(1, b'aaaa')
+    lru.put(2, b'bbbb')
+    lru.get(1)
+    lru.put(3, b'cccc')  # se descarta el menos usado (2)
+    lru_ok = 1 in lru and 2 not in lru and 3 in lru and lru.nbytes == 8
+    print(f"{'✓' if lru_ok else '✗'} Caché LRU limitada en bytes")
+
+    # Referencia: lectura secuencial reducida igual que la vista previa
+    cap = cv2.VideoCapture(video_path)
+    reference = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        reference.append(frame_preview.to_ppm(frame, (320, 180)))
+    cap.release()
+    size_ok = reference[0].startswith(b'P6 240 180 255\n')
+    print(f"{'✓' if size_ok else '✗'} Fotogramas reducidos a 240x180 (PPM)")
+
+    def wait(previewer, index):
+        while True:
+            result = previewer.poll(timeout=10)
+            if result is None or result[0] == index:
+                return result
+
+    all_ok = lru_ok and size_ok
+    for keyframes in (None, list(range(0, 150, 12))):
+        previewer = frame_preview.FramePreviewer(
+            video_path, len(reference), keyframes=keyframes, step=5,
+            max_size=(320, 180))
+        try:
+            exact = [100, 37, 42, 149]
+            frames_ok = True
+            for index in exact:
+                requested, image = previewer.request(index)
+                result = wait(previewer, index) if image is None else \
+                    (requested, image)
+                frames_ok = frames_ok and result == (index,
+                                                     reference[index])
+            snapped, _ = previewer.request(30, snap=True)
+            wait(previewer, snapped)
+            snap_ok = snapped == (30 if keyframes is None else 24)
+            # Con la precarga, los vecinos acaban en la caché
+            neighbours = (35, 40, 25) if keyframes is None else (36, 48, 12)
+            deadline = time.monotonic() + 10
+            while True:
+                prefetched = all(i in previewer.cache for i in neighbours)
+                if prefetched or time.monotonic() > deadline:
+                    break
+                time.sleep(0.05)
+            cached, image = previewer.request(149)
+            hit_ok = cached == 149 and image == reference[149]
+        finally:
+            previewer.close()
+        ok = frames_ok and snap_ok and prefetched and hit_ok
+        label = "con" if keyframes else "sin"
+        print(f"{'✓' if ok else '✗'} Fotogramas exactos, ajuste y precarga "
+              f"{label} fotogramas clave conocidos")
+        all_ok = all_ok and ok
+    return all_ok
+
+
+def test_srt_parallel(output_dir):
+    """Prueba el análisis en paralelo de un SRT por tramos"""
+    print("\n=== Test: Análisis de SRT por Tramos ===")
+
+    srt_path = create_test_srt(os.path.join(output_dir, "parallel.SRT"))
+    # Saltos de línea de Windows y líneas en blanco de más entre bloques
+    with open(srt_path, 'rb') as f:
+        data = f.read().replace(b'\n\n', b'\n \n\n').replace(b'\n', b'\r\n')
+    with open(srt_path, 'wb') as f:
+        f.write(data)
+
+    chunks = srt_tag.srt_chunks(srt_path, 4)
+    covered = chunks[0][0] == 0 and chunks[-1][1] == len(data) and \
+        all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    at_blank = all(data[start - 2:start] == b'\r\n'
+                   for start, _ in chunks[1:])
+    chunks_ok = len(chunks) == 4 and covered and at_blank
+    print(f"{'✓' if chunks_ok else '✗'} 4 tramos contiguos que empiezan "
+          f"tras una línea en blanco")
+
+    expected = srt_tag.parse_srt_file(srt_path)
+    frames = srt_tag.parse_srt_parallel(srt_path, workers=3, min_bytes=0)
+    same = len(expected) == 150 and frames == expected
+    print(f"{'✓' if same else '✗'} Mismos {len(frames)} bloques y en el "
+          f"mismo orden que parse_srt_file")
+
+    # Como en los servidores: desde un hilo, con otro hilo ocupado
+    from_thread = []
+    busy = threading.Event()
+    worker = threading.Thread(target=busy.wait, args=(5,), daemon=True)
+    worker.start()
+    reader = threading.Thread(target=lambda: from_thread.append(
+        srt_tag.parse_srt_parallel(srt_path, workers=2, min_bytes=0)))
+    reader.start()
+    reader.join(60)
+    busy.set()
+    thread_ok = from_thread == [expected]
+    print(f"{'✓' if thread_ok else '✗'} Análisis en paralelo desde un hilo")
+    return chunks_ok and same and thread_ok
+
+
+GPX_TRACK = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="40.0010" lon="-3.0010"><ele>110</ele>
+      <time>2024-05-01T10:00:02Z</time></trkpt>
+    <trkpt lat="40.0000" lon="-3.0000"><ele>100</ele>
+      <time>2024-05-01T10:00:00Z</time></trkpt>
+    <trkpt lat="40.0030" lon="-3.0030"><ele>130</ele>
+      <time>2024-05-01T12:00:06+02:00</time></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
+
+def test_gps_tracks(video_path, output_dir):
+    """Prueba las trayectorias GPX/CSV/JSON y su posición por fotograma"""
+    print("\n=== Test: Trayectorias GPX/CSV/JSON ===")
+
+    paths = {fmt: os.path.join(output_dir, f"track.{fmt}")
+             for fmt in ('gpx', 'csv', 'jsonl')}
+    with open(paths['gpx'], 'w') as f:
+        f.write(GPX_TRACK)
+    with open(paths['csv'], 'w') as f:
+        f.write("Timestamp;Lat;Lng;Ele\n"
+                "2024-05-01 10:00:00;40.0000;-3.0000;100\n"
+                "2024-05-01 10:00:02;40.0010;-3.0010;110\n"
+                "2024-05-01 10:00:06;40.0030;-3.0030;130\n")
+    with open(paths['jsonl'], 'w') as f:
+        for second, i in ((0, 0), (2, 1), (6, 3)):
+            f.write(json.dumps({'time': 1714557600 + second,
+                                'latitude': 40 + i * 0.001,
+                                'longitude': -3 - i * 0.001,
+                                'altitude': 100 + i * 10}) + "\n")
+
+    tracks = {fmt: gps_tracks.load_track(path) for fmt, path in paths.items()}
+    same = all([np.array_equal(track.times, tracks['gpx'].times)
+                for track in tracks.values()]) and \
+        all([np.allclose(track.latitudes, tracks['gpx'].latitudes)
+             for track in tracks.values()])
+    parse_ok = same and tracks['gpx'].duration == 6.0 and \
+        tracks['gpx'].start == 1714557600.0
+    print(f"{'✓' if parse_ok else '✗'} GPX, CSV y JSON Lines dan la misma "
+          f"trayectoria ordenada por tiempo")
+
+    track = tracks['gpx']
+    lats, _, alts = track.positions(track.start + np.array([1.0, 4.0, 7.0]))
+    interp_ok = np.allclose(lats[:2], [40.0005, 40.002]) and \
+        np.allclose(alts[:2], [105, 120]) and np.isnan(lats[2])
+    lookup = track.lookup(offset=2.0)
+    position = lookup(1.0)
+    offset_ok = lookup(5.0) is None and \
+        abs(position['latitude'] - 40.0015) < 1e-9
+    print(f"{'✓' if interp_ok and offset_ok else '✗'} Interpolación "
+          f"vectorizada, fuera de la trayectoria sin posición y desfase")
+
+    # Un millón de puntos: una sola llamada para todos los fotogramas
+    count = 1000000
+    big = gps_tracks.TrackIndex(np.arange(count, dtype=np.float64)[::-1],
+                                np.linspace(41, 40, count),
+                                np.zeros(count))
+    times = np.linspace(0, count - 1, 5000)
+    big_lats, _, _ = big.positions(times)
+    big_ok = np.allclose(big_lats, 40 + times / (count - 1))
+    print(f"{'✓' if big_ok else '✗'} {count} puntos: 5000 posiciones "
+          f"interpoladas en una llamada")
+
+    # Cada fotograma extraído lleva su propia posición
+    frames_dir = os.path.join(output_dir, "track_frames")
+    os.makedirs(frames_dir, exist_ok=True)
+    # Una sola interpolación vectorizada para todos los fotogramas
+    calls = []
+    positions = track.positions
+    track.positions = lambda times: calls.append(len(times)) or \
+        positions(times)
+    result = frame_extraction.FrameExtractionJob(
+        video_path, frames_dir, 0, 150, 30, 30.0,
+        track=track.lookup()).run()
+    del track.positions
+    latitudes = []
+    for record in result['records']:
+        gps = piexif.load(os.path.join(frames_dir, record['name']))["GPS"]
+        latitudes.append(round(exif_gps.dms_to_degrees(
+            gps[piexif.GPSIFD.GPSLatitude]), 5))
+    extract_ok = latitudes == [40.0005, 40.001, 40.0015, 40.002, 40.0025] \
+        and calls == [5]
+    print(f"{'✓' if extract_ok else '✗'} Posición propia en cada fotograma "
+          f"extraído, interpolada en {len(calls)} llamada(s): {latitudes}")
+
+    # GPX leído en streaming: la memoria no crece con el número de puntos;
+    # los puntos sin lat/lon se saltan
+    big_gpx = os.path.join(output_dir, "track_big.gpx")
+    with open(big_gpx, 'w') as f:
+        f.write('<?xml version="1.0"?>\n<gpx version="1.1" '
+                'xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>\n'
+                '<trkpt><time>0</time></trkpt>\n')
+        for i in range(50000):
+            f.write(f'<trkpt lat="40.{i:06d}" lon="-3.0"><ele>1</ele>'
+                    f'<time>{i}</time></trkpt>\n')
+        f.write('</trkseg></trk></gpx>\n')
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        points = sum(1 for _ in gps_tracks.read_gpx(big_gpx))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    stream_ok = points == 50000 and peak < 2 * 1024 * 1024
+    print(f"{'✓' if stream_ok else '✗'} GPX de {points} puntos leído con "
+          f"{peak / 1e6:.1f} MB como máximo")
+
+    # GPX sin <ele>: sin etiquetas de altitud (no un racional 0/0)
+    no_ele_path = os.path.join(output_dir, "track_no_ele.gpx")
+    with open(no_ele_path, 'w') as f:
+        f.write(GPX_TRACK.replace('<ele>110</ele>', '').replace(
+            '<ele>100</ele>', '').replace('<ele>130</ele>', ''))
+    no_ele_dir = os.path.join(output_dir, "track_no_ele_frames")
+    os.makedirs(no_ele_dir, exist_ok=True)
+    result = frame_extraction.FrameExtractionJob(
+        video_path, no_ele_dir, 0, 60, 30, 30.0,
+        track=gps_tracks.load_track(no_ele_path).lookup()).run()
+    no_ele_ok = result['extracted'] == 2
+    for record in result['records']:
+        gps = piexif.load(os.path.join(no_ele_dir, record['name']))["GPS"]
+        no_ele_ok = no_ele_ok and piexif.GPSIFD.GPSLatitude in gps and \
+            piexif.GPSIFD.GPSAltitude not in gps and \
+            piexif.GPSIFD.GPSAltitudeRef not in gps
+    print(f"{'✓' if no_ele_ok else '✗'} Trayectoria sin altitud: posición "
+          f"sin etiquetas GPSAltitude")
+    return parse_ok and interp_ok and offset_ok and big_ok and extract_ok \
+        and stream_ok and no_ele_ok
+
+
 def run_all_tests():
     """Ejecuta todas las pruebas"""
     print("=" * 50)
@@ -169,6 +1639,8 @@ def run_all_tests():
         video_path = os.path.join(tmpdir, "test_video.mp4")
         output_dir = os.path.join(tmpdir, "output")
         os.makedirs(output_dir, exist_ok=True)
+        # La caché de la sonda de video no sale del directorio temporal
+        os.environ[video_probe.CACHE_ENV] = os.path.join(tmpdir, "probe.sqlite")
 
         # Crear video de prueba
         create_test_video(video_path)
@@ -183,6 +1655,46 @@ def run_all_tests():
                  output_dir)))
         results.append(("GPS Metadata", test_gps_metadata(output_dir)))
         results.append(("JSON GPS Loading", test_json_gps_loading()))
+        results.append(
+            ("Frame Encoders", test_frame_encoders(output_dir)))
+        results.append(
+            ("Archive Output", test_archive_output(output_dir)))
+        results.append(("EXIF GPS Writer", test_exif_gps_writer()))
+        results.append(
+            ("Extraction Job", test_extraction_job(video_path, output_dir)))
+        results.append(
+            ("PTS Index", test_pts_index(video_path, output_dir)))
+        results.append(
+            ("Video Probe", test_video_probe(video_path, output_dir)))
+        results.append(
+            ("Ingest Daemon", test_ingest_daemon(video_path, output_dir)))
+        results.append(
+            ("Job Server", test_job_server(video_path, output_dir)))
+        results.append(
+            ("Shard Extract", test_shard_extract(video_path, output_dir)))
+        results.append(("Geo Outputs", test_geo_outputs(output_dir)))
+        results.append(
+            ("AOI Extraction", test_aoi_extraction(video_path, output_dir)))
+        results.append(("SRT Tag Batch", test_srt_tag_batch(output_dir)))
+        results.append(
+            ("Output Profiles", test_output_profiles(video_path, output_dir)))
+        results.append(
+            ("Undistort", test_undistort(video_path, output_dir)))
+        results.append(("Lazy Imports", test_lazy_imports()))
+        results.append(
+            ("Sharded Output", test_sharded_output(video_path, output_dir)))
+        results.append(
+            ("SRT Concat Append", test_srt_concat_append(output_dir)))
+        results.append(
+            ("Frame Cache", test_frame_cache(video_path, output_dir)))
+        results.append(("Flight Track", test_flight_track(output_dir)))
+        results.append(
+            ("Frame Decoders", test_frame_decoders(video_path, output_dir)))
+        results.append(("Shared Memory Ring", test_shm_ring()))
+        results.append(("Frame Preview", test_frame_preview(video_path)))
+        results.append(("SRT Parallel", test_srt_parallel(output_dir)))
+        results.append(
+            ("GPS Tracks", test_gps_tracks(video_path, output_dir)))
 
         # Resumen
         print("\n" + "=" * 50)
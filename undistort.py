@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Undistort - Lens undistortion of extracted frames with cached remap tables
+
+Wide-angle drone footage often has to be undistorted before photogrammetry
+or measuring tools use it. Undistorting every saved image in a separate
+pass re-reads and re-encodes all of them; instead, an Undistorter is handed
+to the extraction job and each frame is remapped on the encoder threads
+just before it is encoded.
+
+``cv2.initUndistortRectifyMap`` is the expensive part, so its tables are
+computed once per resolution, in the fixed-point format that makes
+``cv2.remap`` fastest, and stored as ``.npz`` files keyed by the camera
+parameters. The cache lives in ``~/.cache/video_to_photo_gps/undistort``;
+set the ``UNDISTORT_CACHE`` environment variable to use another folder.
+
+Camera files are JSON::
+
+    {"camera_matrix": [[fx, 0, cx], [0, fy, cy], [0, 0, 1]],
+     "dist_coeffs": [k1, k2, p1, p2, k3],
+     "width": 3840, "height": 2160}
+
+``width``/``height`` give the calibration resolution; the intrinsics are
+scaled to the size of the frames being extracted. ``fx``, ``fy``, ``cx``
+and ``cy`` may be given instead of ``camera_matrix``.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+CACHE_ENV = 'UNDISTORT_CACHE'
+
+
+def default_cache_dir():
+    """Return the remap table folder (honours UNDISTORT_CACHE)."""
+    if os.environ.get(CACHE_ENV):
+        return os.environ[CACHE_ENV]
+    return os.path.join(os.path.expanduser('~'), '.cache',
+                        'video_to_photo_gps', 'undistort')
+
+
+class Undistorter:
+    """
+    Remaps frames to remove lens distortion.
+
+    ``apply`` may be called from several threads; tables for a new frame
+    size are built (or loaded from the cache) by the first caller.
+
+    Args:
+        camera_matrix: 3x3 intrinsic matrix at the calibration resolution
+        dist_coeffs: OpenCV distortion coefficients (k1, k2, p1, p2[, k3...])
+        calibration_size: Optional ``(width, height)`` of the calibration;
+            the matrix is scaled to other frame sizes
+        alpha: Free scaling between 0 (only valid pixels, cropped) and 1
+            (all source pixels kept, black borders)
+        cache_dir: Folder for remap tables, or False to keep them only in
+            memory (default: default_cache_dir())
+    """
+
+    def __init__(self, camera_matrix, dist_coeffs, calibration_size=None,
+                 alpha=0.0, cache_dir=None):
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64).ravel()
+        if self.camera_matrix.shape != (3, 3):
+            raise ValueError("camera_matrix must be 3x3")
+        if self.dist_coeffs.size not in (4, 5, 8, 12, 14):
+            raise ValueError("dist_coeffs must have 4, 5, 8, 12 or 14 values")
+        if not 0.0 <= alpha <= 1.0:
+            raise ValueError("alpha must be between 0 and 1")
+        self.calibration_size = tuple(calibration_size) \
+            if calibration_size else None
+        self.alpha = alpha
+        self.cache_dir = default_cache_dir() if cache_dir is None \
+            else cache_dir
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def _matrix_for(self, width, height):
+        if self.calibration_size is None:
+            return self.camera_matrix
+        scale = np.array([[width / self.calibration_size[0]],
+                          [height / self.calibration_size[1]],
+                          [1.0]])
+        return self.camera_matrix * scale
+
+    def fingerprint(self):
+        """Return a string identifying the camera parameters."""
+        return json.dumps([self.camera_matrix.tolist(),
+                           self.dist_coeffs.tolist(), self.calibration_size,
+                           self.alpha])
+
+    def _cache_path(self, width, height):
+        key = f"{self.fingerprint()}{width}x{height}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir,
+                            f"remap_{width}x{height}_{digest}.npz")
+
+    def _build(self, width, height):
+        matrix = self._matrix_for(width, height)
+        new_matrix, _ = cv2.getOptimalNewCameraMatrix(
+            matrix, self.dist_coeffs, (width, height), self.alpha)
+        # CV_16SC2 tables are half the size of float maps and remap faster
+        return cv2.initUndistortRectifyMap(
+            matrix, self.dist_coeffs, None, new_matrix, (width, height),
+            cv2.CV_16SC2)
+
+    def maps(self, width, height):
+        """
+        Return the ``(map1, map2)`` remap tables for a frame size.
+
+        Tables come from memory, then from the disk cache, and are built
+        only when neither has them.
+        """
+        size = (width, height)
+        maps = self._maps.get(size)
+        if maps is not None:
+            return maps
+        with self._lock:
+            if size in self._maps:
+                return self._maps[size]
+            path = self._cache_path(width, height) if self.cache_dir \
+                else None
+            maps = None
+            if path and os.path.exists(path):
+                try:
+                    with np.load(path) as data:
+                        maps = (data['map1'], data['map2'])
+                except (OSError, KeyError, ValueError):
+                    maps = None
+            if maps is None:
+                maps = self._build(width, height)
+                if path:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    # Written under a temporary name so that a concurrent
+                    # reader never loads a half-written file
+                    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+                    np.savez(tmp_path, map1=maps[0], map2=maps[1])
+                    os.replace(tmp_path, path)
+            self._maps[size] = maps
+            return maps
+
+    def apply(self, frame):
+        """
+        Return an undistorted copy of a frame.
+
+        Args:
+            frame: Image as a NumPy array
+
+        Returns:
+            New array with the same size as the frame
+        """
+        height, width = frame.shape[:2]
+        map1, map2 = self.maps(width, height)
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR)
+
+
+def load_camera(path, alpha=None, cache_dir=None):
+    """
+    Create an Undistorter from a camera JSON file.
+
+    Args:
+        path: Camera file (see module docstring)
+        alpha: Overrides the file's ``alpha`` (default 0)
+        cache_dir: Remap table folder (see Undistorter)
+
+    Returns:
+        Undistorter instance
+
+    Raises:
+        ValueError: If the file is not a valid camera description
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            camera = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path}: invalid JSON ({e})")
+    if not isinstance(camera, dict):
+        raise ValueError(f"{path}: expected a JSON object")
+    try:
+        if 'camera_matrix' in camera:
+            matrix = camera['camera_matrix']
+        else:
+            matrix = [[camera['fx'], 0, camera['cx']],
+                      [0, camera['fy'], camera['cy']],
+                      [0, 0, 1]]
+        calibration_size = None
+        if 'width' in camera or 'height' in camera:
+            calibration_size = (int(camera['width']), int(camera['height']))
+        if alpha is None:
+            alpha = float(camera.get('alpha', 0.0))
+        return Undistorter(matrix, camera['dist_coeffs'], calibration_size,
+                           alpha, cache_dir)
+    except KeyError as e:
+        raise ValueError(f"{path}: missing {e}")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{path}: {e}")
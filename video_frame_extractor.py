@@ -5,13 +5,37 @@ Video Frame Extractor with GPS Preservation
 Extrae fotogramas de videos manteniendo la georeferenciación
 """
 
+import io
 import os
+import queue
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import cv2
-import piexif
 import json
 
+# Solo módulos ligeros al inicio: OpenCV, NumPy y piexif se cargan al
+# usarlos por primera vez, así la ventana aparece antes
+import frame_decoders
+import frame_encoders
+import video_probe
+
+# Carpeta con archivos sueltos, subcarpetas por tramo de fotogramas con un
+# índice (para cientos de miles de fotogramas), o un único zip/tar por video
+OUTPUT_MODES = ('carpeta', 'subcarpetas', 'zip', 'tar')
+
+# Los JSON más pequeños se leen enteros para ver si son un punto fijo; los
+# demás, y los GPX y CSV, se leen como trayectorias en segundo plano
+STATIC_GPS_MAX_BYTES = 1024 * 1024
+
+# Intervalo de actualización del progreso (~10 Hz)
+PROGRESS_POLL_MS = 100
+# Espera para recibir los fotogramas de la vista previa
+PREVIEW_POLL_MS = 30
+# Tras este tiempo sin mover la barra de la vista previa se decodifica el
+# fotograma exacto en lugar del fotograma clave anterior
+PREVIEW_SETTLE_MS = 150
+
 
 class VideoFrameExtractor:
     def __init__(self, root):
@@ -23,7 +47,14 @@ class VideoFrameExtractor:
         self.video_fps = 0
         self.video_duration = 0
         self.video_total_frames = 0
+        self.video_keyframes = []
+        # True mientras se analiza el video en segundo plano
+        self.video_loading = False
         self.gps_data = None
+        self.gps_track = None
+        self.worker = None
+        self.track_window = None
+        self.preview_window = None
 
         self.setup_ui()
 
@@ -59,6 +90,14 @@ class VideoFrameExtractor:
             column=1,
             padx=5)
 
+        ttk.Button(
+            video_frame,
+            text="Vista Previa",
+            command=self.open_preview).grid(
+            row=0,
+            column=2,
+            padx=5)
+
         # Información del video
         info_frame = ttk.LabelFrame(
             main_frame,
@@ -122,6 +161,28 @@ class VideoFrameExtractor:
             column=3,
             padx=5)
 
+        self.use_pts = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            time_frame,
+            text="Tiempos reales por fotograma (video VFR)",
+            variable=self.use_pts).grid(
+            row=1,
+            column=0,
+            columnspan=4,
+            sticky=tk.W,
+            padx=5)
+
+        self.use_cache = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            time_frame,
+            text="Reutilizar fotogramas de extracciones anteriores (caché)",
+            variable=self.use_cache).grid(
+            row=2,
+            column=0,
+            columnspan=4,
+            sticky=tk.W,
+            padx=5)
+
         # Configuración de extracción - Intervalo de fotogramas
         frame_frame = ttk.LabelFrame(
             main_frame,
@@ -160,6 +221,36 @@ class VideoFrameExtractor:
             sticky=tk.W,
             padx=5)
 
+        ttk.Label(
+            frame_frame,
+            text="Decodificador:").grid(
+            row=1,
+            column=0,
+            sticky=tk.W,
+            padx=5)
+        self.decoder_name = tk.StringVar(value=frame_decoders.DEFAULT_DECODER)
+        ttk.Combobox(
+            frame_frame,
+            textvariable=self.decoder_name,
+            values=list(frame_decoders.DECODERS),
+            state='readonly',
+            width=12).grid(
+            row=1,
+            column=1,
+            padx=5)
+
+        # Con un fotograma clave por segundo (habitual en drones) equivale
+        # a 1 fps sin decodificar ningún otro fotograma
+        self.keyframes_only = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_frame,
+            text="Solo fotogramas clave (rápido)",
+            variable=self.keyframes_only).grid(
+            row=1,
+            column=2,
+            sticky=tk.W,
+            padx=5)
+
         # GPS Data
         gps_frame = ttk.LabelFrame(main_frame, text="Datos GPS", padding="10")
         gps_frame.grid(
@@ -173,7 +264,7 @@ class VideoFrameExtractor:
 
         ttk.Button(
             gps_frame,
-            text="Cargar Datos GPS (JSON)",
+            text="Cargar Datos GPS (JSON, GPX, CSV)",
             command=self.load_gps_data).grid(
             row=0,
             column=0,
@@ -181,7 +272,43 @@ class VideoFrameExtractor:
 
         self.gps_status_label = ttk.Label(
             gps_frame, text="No se han cargado datos GPS")
-        self.gps_status_label.grid(row=0, column=1, sticky=tk.W, padx=5)
+        self.gps_status_label.grid(
+            row=0, column=1, columnspan=2, sticky=tk.W, padx=5)
+
+        # Segundos desde el primer punto de la trayectoria hasta el inicio
+        # del video (negativo si el video empezó antes)
+        ttk.Label(
+            gps_frame,
+            text="Desfase de la trayectoria (s):").grid(
+            row=2,
+            column=0,
+            sticky=tk.W,
+            padx=5,
+            pady=(5, 0))
+        self.track_offset = tk.StringVar(value="0")
+        ttk.Entry(
+            gps_frame,
+            textvariable=self.track_offset,
+            width=15).grid(
+            row=2,
+            column=1,
+            sticky=tk.W,
+            padx=5,
+            pady=(5, 0))
+
+        ttk.Button(
+            gps_frame,
+            text="Ver Trayectoria (SRT)",
+            command=self.load_track).grid(
+            row=1,
+            column=0,
+            padx=5,
+            pady=(5, 0))
+
+        self.track_status_label = ttk.Label(
+            gps_frame, text="No se ha cargado ninguna trayectoria")
+        self.track_status_label.grid(
+            row=1, column=1, sticky=tk.W, padx=5, pady=(5, 0))
 
         # Carpeta de salida
         output_frame = ttk.LabelFrame(
@@ -207,15 +334,81 @@ class VideoFrameExtractor:
             column=1,
             padx=5)
 
-        # Botón de extracción
-        ttk.Button(
+        ttk.Label(
+            output_frame,
+            text="Formato:").grid(
+            row=1,
+            column=0,
+            sticky=tk.W,
+            padx=5)
+        self.encoder_name = tk.StringVar(value=frame_encoders.DEFAULT_ENCODER)
+        ttk.Combobox(
+            output_frame,
+            textvariable=self.encoder_name,
+            values=list(frame_encoders.ENCODERS),
+            state='readonly',
+            width=15).grid(
+            row=1,
+            column=1,
+            padx=5)
+
+        ttk.Label(
+            output_frame,
+            text="Perfil:").grid(
+            row=1,
+            column=2,
+            sticky=tk.W,
+            padx=5)
+        self.encoder_preset = tk.StringVar(
+            value=frame_encoders.DEFAULT_PRESET)
+        ttk.Combobox(
+            output_frame,
+            textvariable=self.encoder_preset,
+            values=list(frame_encoders.PRESET_NAMES),
+            state='readonly',
+            width=10).grid(
+            row=1,
+            column=3,
+            padx=5)
+
+        ttk.Label(
+            output_frame,
+            text="Guardar en:").grid(
+            row=2,
+            column=0,
+            sticky=tk.W,
+            padx=5)
+        self.output_mode = tk.StringVar(value=OUTPUT_MODES[0])
+        ttk.Combobox(
+            output_frame,
+            textvariable=self.output_mode,
+            values=OUTPUT_MODES,
+            state='readonly',
+            width=15).grid(
+            row=2,
+            column=1,
+            padx=5)
+
+        # Botones de extracción y cancelación
+        self.extract_button = ttk.Button(
             main_frame,
             text="Extraer Fotogramas",
             command=self.extract_frames,
-            style='Accent.TButton').grid(
+            style='Accent.TButton')
+        self.extract_button.grid(
             row=6,
             column=0,
-            columnspan=3,
+            columnspan=2,
+            pady=20)
+
+        self.cancel_button = ttk.Button(
+            main_frame,
+            text="Cancelar",
+            command=self.cancel_extraction,
+            state='disabled')
+        self.cancel_button.grid(
+            row=6,
+            column=2,
             pady=20)
 
         # Barra de progreso
@@ -238,64 +431,215 @@ class VideoFrameExtractor:
         )
 
         if filename:
+            self.close_preview()
             self.video_path = filename
             self.video_label.config(text=os.path.basename(filename))
             self.load_video_info()
 
     def load_video_info(self):
-        """Carga información del video"""
-        try:
-            cap = cv2.VideoCapture(self.video_path)
-            self.video_fps = cap.get(cv2.CAP_PROP_FPS)
-            self.video_total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            self.video_duration = self.video_total_frames / \
-                self.video_fps if self.video_fps > 0 else 0
-            cap.release()
-
-            info_text = f"FPS: {
-                self.video_fps:.2f} | Duración: {
-                self.video_duration:.2f}s | Fotogramas totales: {
-                self.video_total_frames}"
+        """Analiza el video en segundo plano y muestra su información"""
+        # El primer análisis lee los fotogramas clave de todo el video y
+        # tarda segundos; después queda en caché y es inmediato
+        video_path = self.video_path
+        results = queue.Queue()
+        self.video_fps = 0
+        self.video_total_frames = 0
+        self.video_duration = 0
+        self.video_keyframes = []
+        self.video_loading = True
+
+        def load():
+            try:
+                results.put(('done', video_probe.probe_video(video_path)))
+            except Exception as e:
+                results.put(('error', str(e)))
+
+        def poll():
+            try:
+                status, value = results.get_nowait()
+            except queue.Empty:
+                self.root.after(PROGRESS_POLL_MS, poll)
+                return
+            if video_path != self.video_path:
+                # Se eligió otro video mientras se analizaba este
+                return
+            self.video_loading = False
+            if status == 'error':
+                self.info_label.config(text="")
+                messagebox.showerror(
+                    "Error", f"Error al cargar información del video: {value}")
+                return
+            self.video_fps = value['fps']
+            self.video_total_frames = value['frame_count']
+            self.video_duration = value['duration']
+            self.video_keyframes = value['keyframes']
+
+            info_text = (f"FPS: {self.video_fps:.2f} | "
+                         f"Duración: {self.video_duration:.2f}s | "
+                         f"Fotogramas totales: {self.video_total_frames} | "
+                         f"{value['width']}x{value['height']} {value['codec']}")
             self.info_label.config(text=info_text)
 
             # Actualizar valor por defecto del tiempo final
             self.end_time.set(str(int(self.video_duration)))
 
-        except Exception as e:
-            messagebox.showerror(
-                "Error",
-                f"Error al cargar información del video: {
-                    str(e)}")
+        self.info_label.config(text="Analizando video...")
+        threading.Thread(target=load, daemon=True).start()
+        self.root.after(PROGRESS_POLL_MS, poll)
+
+    def video_ready(self):
+        """Avisa si el video aún se está analizando"""
+        if self.video_loading:
+            messagebox.showinfo(
+                "Información", "El video aún se está analizando")
+            return False
+        return True
 
     def load_gps_data(self):
-        """Carga datos GPS desde un archivo JSON"""
+        """Carga un punto GPS fijo (JSON) o una trayectoria (GPX, CSV, JSON)"""
         filename = filedialog.askopenfilename(
-            title="Seleccionar archivo GPS JSON",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            title="Seleccionar datos GPS",
+            filetypes=[
+                ("GPS files", "*.json *.jsonl *.gpx *.csv"),
+                ("JSON files", "*.json"),
+                ("All files", "*.*")
+            ]
         )
 
-        if filename:
+        if not filename:
+            return
+        if filename.lower().endswith('.json') and \
+                os.path.getsize(filename) <= STATIC_GPS_MAX_BYTES:
             try:
                 with open(filename, 'r') as f:
                     gps_data = json.load(f)
-                # Validate required GPS fields
-                if not isinstance(
-                        gps_data,
-                        dict) or 'latitude' not in gps_data or \
-                        'longitude' not in gps_data:
-                    messagebox.showerror(
-                        "Error",
-                        "El archivo JSON de GPS debe contener los campos "
-                        "'latitude' y 'longitude'."
-                    )
-                    return
+            except Exception as e:
+                messagebox.showerror("Error",
+                                     f"Error al cargar datos GPS: {str(e)}")
+                return
+            # Un único punto sin tiempo: la misma posición en todas las
+            # imágenes; si no, se lee como trayectoria
+            if isinstance(gps_data, dict) and 'latitude' in gps_data and \
+                    'longitude' in gps_data and 'time' not in gps_data:
                 self.gps_data = gps_data
+                self.gps_track = None
                 self.gps_status_label.config(
                     text=f"GPS cargado: {
                         os.path.basename(filename)}")
+                return
+        self.load_gps_track(filename)
+
+    def load_gps_track(self, filename):
+        """Lee una trayectoria GPX, CSV o JSON en segundo plano"""
+        results = queue.Queue()
+
+        def load():
+            try:
+                import gps_tracks
+                results.put(('done', gps_tracks.load_track(filename)))
             except Exception as e:
-                messagebox.showerror("Error",
-                                     f"Error al cargar datos GPS: {str(e)}")
+                results.put(('error', str(e)))
+
+        def poll():
+            try:
+                status, value = results.get_nowait()
+            except queue.Empty:
+                self.root.after(PROGRESS_POLL_MS, poll)
+                return
+            if status == 'error':
+                self.gps_status_label.config(
+                    text="Error al cargar los datos GPS")
+                messagebox.showerror(
+                    "Error",
+                    "El archivo debe contener 'latitude' y 'longitude', o "
+                    f"una trayectoria con tiempos: {value}")
+                return
+            self.gps_data = None
+            self.gps_track = value
+            self.gps_status_label.config(
+                text=f"Trayectoria: {os.path.basename(filename)} "
+                     f"({len(value)} puntos, {value.duration:.0f}s)")
+
+        self.gps_status_label.config(text="Cargando datos GPS...")
+        threading.Thread(target=load, daemon=True).start()
+        self.root.after(PROGRESS_POLL_MS, poll)
+
+    def load_track(self):
+        """Carga la trayectoria de un SRT y la muestra en otra ventana"""
+        filename = filedialog.askopenfilename(
+            title="Seleccionar archivo SRT",
+            filetypes=[("SRT files", "*.srt *.SRT"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+
+        # El análisis del SRT se hace en un hilo: con 100k puntos tarda
+        # demasiado para la interfaz
+        results = queue.Queue()
+
+        def load():
+            try:
+                import flight_track
+                results.put(('done', flight_track.FlightTrack.from_srt(
+                    filename)))
+            except Exception as e:
+                results.put(('error', str(e)))
+
+        def poll():
+            try:
+                status, value = results.get_nowait()
+            except queue.Empty:
+                self.root.after(PROGRESS_POLL_MS, poll)
+                return
+            if status == 'error':
+                self.track_status_label.config(
+                    text="Error al cargar la trayectoria")
+                messagebox.showerror(
+                    "Error", f"Error al cargar la trayectoria: {value}")
+                return
+            self.track_status_label.config(
+                text=f"{os.path.basename(filename)}: {len(value)} puntos")
+            if self.track_window is not None and \
+                    self.track_window.window.winfo_exists():
+                self.track_window.window.destroy()
+            self.track_window = TrackWindow(
+                self.root, value, self.start_time, self.end_time)
+
+        self.track_status_label.config(text="Cargando trayectoria...")
+        threading.Thread(target=load, daemon=True).start()
+        self.root.after(PROGRESS_POLL_MS, poll)
+
+    def open_preview(self):
+        """Abre la vista previa del video para elegir los tiempos"""
+        if not self.video_ready():
+            return
+        if not self.video_path or self.video_total_frames <= 0:
+            messagebox.showwarning(
+                "Advertencia", "Por favor, seleccione un video")
+            return
+        if self.preview_window is not None and \
+                self.preview_window.window.winfo_exists():
+            self.preview_window.window.lift()
+            return
+
+        import frame_preview
+
+        # Fotogramas clave del análisis (vacía sin ffprobe)
+        previewer = frame_preview.FramePreviewer(
+            self.video_path,
+            self.video_total_frames,
+            keyframes=self.video_keyframes,
+            step=round(self.video_fps))
+        self.preview_window = PreviewWindow(
+            self.root, previewer, self.video_fps,
+            self.start_time, self.end_time)
+
+    def close_preview(self):
+        """Cierra la vista previa si está abierta"""
+        if self.preview_window is not None and \
+                self.preview_window.window.winfo_exists():
+            self.preview_window.window.destroy()
+        self.preview_window = None
 
     def select_output(self):
         """Selecciona la carpeta de salida"""
@@ -304,15 +648,53 @@ class VideoFrameExtractor:
             self.output_folder = folder
             self.output_label.config(text=folder)
 
+    def output_target(self):
+        """Ruta de salida según el modo elegido (carpeta o archivo)"""
+        mode = self.output_mode.get()
+        if mode == 'carpeta':
+            return self.output_folder
+        name = os.path.splitext(os.path.basename(self.video_path))[0]
+        if mode == 'subcarpetas':
+            import frame_sinks
+
+            folder = os.path.join(self.output_folder, f"{name}_frames")
+            frame_sinks.create_sharded_dir(folder)
+            return folder
+        return os.path.join(self.output_folder, f"{name}_frames.{mode}")
+
     def convert_to_degrees(self, value):
         """Convierte coordenadas GPS a formato de grados para EXIF"""
-        d = int(value)
-        m = int((value - d) * 60)
-        s = (value - d - m / 60) * 3600
-        return ((d, 1), (m, 1), (int(s * 100), 100))
+        import exif_gps
+
+        return exif_gps.to_dms(value)
+
+    def build_gps_ifd(self, lat, lon, alt=None):
+        """Construye el bloque GPS de EXIF para unas coordenadas"""
+        import exif_gps
+        import piexif
+
+        gps_ifd = {
+            piexif.GPSIFD.GPSVersionID: (2, 0, 0, 0),
+            piexif.GPSIFD.GPSLatitudeRef: 'N' if lat >= 0 else 'S',
+            piexif.GPSIFD.GPSLatitude: self.convert_to_degrees(abs(lat)),
+            piexif.GPSIFD.GPSLongitudeRef: 'E' if lon >= 0 else 'W',
+            piexif.GPSIFD.GPSLongitude: self.convert_to_degrees(abs(lon)),
+        }
+
+        if alt is not None:
+            gps_ifd[piexif.GPSIFD.GPSAltitudeRef] = 0 if alt >= 0 else 1
+            gps_ifd[piexif.GPSIFD.GPSAltitude] = (
+                int(round(abs(alt) * exif_gps.ALTITUDE_DENOMINATOR)),
+                exif_gps.ALTITUDE_DENOMINATOR)
+
+        return gps_ifd
 
     def add_gps_to_image(self, image_path, lat, lon, alt=None):
         """Agrega datos GPS a una imagen"""
+        import piexif
+
+        import frame_sinks
+
         try:
             # Cargar EXIF existente o crear nuevo
             try:
@@ -335,24 +717,16 @@ class VideoFrameExtractor:
                     "1st": {},
                     "thumbnail": None}
 
-            # Preparar datos GPS
-            gps_ifd = {
-                piexif.GPSIFD.GPSVersionID: (2, 0, 0, 0),
-                piexif.GPSIFD.GPSLatitudeRef: 'N' if lat >= 0 else 'S',
-                piexif.GPSIFD.GPSLatitude: self.convert_to_degrees(abs(lat)),
-                piexif.GPSIFD.GPSLongitudeRef: 'E' if lon >= 0 else 'W',
-                piexif.GPSIFD.GPSLongitude: self.convert_to_degrees(abs(lon)),
-            }
-
-            if alt is not None:
-                gps_ifd[piexif.GPSIFD.GPSAltitudeRef] = 0 if alt >= 0 else 1
-                gps_ifd[piexif.GPSIFD.GPSAltitude] = (int(abs(alt) * 100), 100)
+            exif_dict["GPS"] = self.build_gps_ifd(lat, lon, alt)
 
-            exif_dict["GPS"] = gps_ifd
-
-            # Guardar EXIF en la imagen
+            # Guardar EXIF en la imagen; se reemplaza el archivo en lugar
+            # de reescribirlo, ya que puede ser un enlace a la caché
             exif_bytes = piexif.dump(exif_dict)
-            piexif.insert(exif_bytes, image_path)
+            with open(image_path, 'rb') as f:
+                data = f.read()
+            output = io.BytesIO()
+            piexif.insert(exif_bytes, data, output)
+            frame_sinks.write_atomic(image_path, output.getvalue())
 
         except Exception as e:
             messagebox.showerror(
@@ -360,9 +734,19 @@ class VideoFrameExtractor:
                 f"Error al agregar GPS a {image_path}: {
                     str(e)}")
 
+    def track_lookup(self, offset):
+        """Posición de cada fotograma según la trayectoria cargada (o None)"""
+        if self.gps_track is None:
+            return None
+        # Cada fotograma recibe su posición al extraerse, sin otra pasada
+        return self.gps_track.lookup(offset)
+
     def extract_frames(self):
         """Extrae fotogramas del video"""
         # Validaciones
+        if self.is_extracting() or not self.video_ready():
+            return
+
         if not self.video_path:
             messagebox.showwarning(
                 "Advertencia", "Por favor, seleccione un video")
@@ -385,6 +769,7 @@ class VideoFrameExtractor:
             start = float(self.start_time.get())
             end = float(self.end_time.get())
             interval = int(self.frame_interval.get())
+            track_offset = float(self.track_offset.get())
 
             if start < 0 or end > self.video_duration or start >= end:
                 messagebox.showerror("Error", "Intervalo de tiempo inválido")
@@ -400,78 +785,384 @@ class VideoFrameExtractor:
                 "Error", "Por favor, ingrese valores numéricos válidos")
             return
 
-        # Procesar extracción
         try:
-            cap = cv2.VideoCapture(self.video_path)
+            encoder = frame_encoders.get_encoder(
+                self.encoder_name.get(), self.encoder_preset.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
 
-            start_frame = int(start * self.video_fps)
-            end_frame = int(end * self.video_fps)
+        import frame_extraction
+
+        use_cache = self.use_cache.get()
+        decoder = frame_decoders.get_decoder(self.decoder_name.get())
+        keyframes_only = self.keyframes_only.get()
+        track = self.track_lookup(track_offset)
+        # Estado de Tk leído aquí, una sola vez: el hilo de trabajo solo
+        # recibe valores (y la carpeta con subcarpetas se crea una vez)
+        video_path = self.video_path
+        video_fps = self.video_fps
+        output = self.output_target()
+        gps = self.gps_data
+        use_pts = self.use_pts.get()
+
+        # Procesar extracción en un hilo de trabajo
+        def make_job(index):
+            cache = None
+            if use_cache:
+                import frame_cache
+                cache = frame_cache.FrameCache()
+            return frame_extraction.FrameExtractionJob.for_time_range(
+                video_path,
+                output,
+                start,
+                end,
+                interval,
+                video_fps,
+                pts_index=index,
+                encoder=encoder,
+                gps=gps,
+                track=track,
+                cache=cache,
+                decoder=decoder,
+                keyframes_only=keyframes_only)
 
-            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        try:
+            job = make_job(None)
+            self.progress['maximum'] = job.total_to_extract()
+        except ValueError as e:
+            # Modo de fotogramas clave sin ffprobe para localizarlos
+            messagebox.showerror("Error", str(e))
+            return
+        self.progress['value'] = 0
+        self.status_label.config(text="Iniciando extracción...")
+        self.extract_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+
+        self.cancel_event = threading.Event()
+        self.progress_queue = queue.Queue()
+        self.extraction_started = time.monotonic()
+        self.worker = threading.Thread(
+            target=self._run_extraction,
+            args=(job, make_job if use_pts else None),
+            daemon=True)
+        self.worker.start()
+        self.root.after(PROGRESS_POLL_MS, self._poll_progress)
+
+    def _run_extraction(self, job, make_job=None):
+        """
+        Ejecuta la extracción (hilo de trabajo: sin llamadas a Tk)
+
+        Con ``make_job`` el trabajo se vuelve a crear con el índice de
+        tiempos (PTS) del video, que se construye aquí.
+        """
+        def report(extracted, total):
+            self.progress_queue.put(('progress', extracted, total))
 
-            extracted_count = 0
-            total_to_extract = ((end_frame - start_frame) // interval) + 1
+        try:
+            if make_job is not None:
+                # Una sola pasada; queda en caché junto al video
+                self.progress_queue.put(
+                    ('status', "Indexando tiempos de fotogramas..."))
+                import pts_index
+                job = make_job(pts_index.load_or_build(job.video_path))
+            report(0, job.total_to_extract())
+            result = job.run(progress=report, cancel_event=self.cancel_event)
+            self.progress_queue.put(('done', result))
+        except Exception as e:
+            self.progress_queue.put(('error', str(e)))
 
-            self.progress['maximum'] = total_to_extract
-            self.progress['value'] = 0
+    def _poll_progress(self):
+        """Actualiza la interfaz con el progreso del hilo (~10 Hz)"""
+        latest = None
+        final = None
+        while True:
+            try:
+                message = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == 'progress':
+                latest = message
+            elif message[0] == 'status':
+                self.status_label.config(text=message[1])
+            else:
+                final = message
+
+        if latest:
+            _, extracted, total = latest
+            elapsed = time.monotonic() - self.extraction_started
+            rate = extracted / elapsed if elapsed > 0 else 0
+            eta = (total - extracted) / rate if rate > 0 else 0
+            self.progress['maximum'] = total
+            self.progress['value'] = extracted
+            self.status_label.config(
+                text=f"Extrayendo: {extracted}/{total} fotogramas | "
+                     f"{rate:.1f} fps | Restante: {eta:.0f}s"
+            )
+
+        if final:
+            self._finish_extraction(final)
+        else:
+            self.root.after(PROGRESS_POLL_MS, self._poll_progress)
+
+    def _finish_extraction(self, message):
+        """Restaura la interfaz y muestra el resultado final"""
+        self.worker.join()
+        self.extract_button.config(state='normal')
+        self.cancel_button.config(state='disabled')
+
+        if message[0] == 'error':
+            messagebox.showerror(
+                "Error",
+                f"Error durante la extracción: {message[1]}")
+            self.status_label.config(text="Error en la extracción")
+            return
 
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
+        result = message[1]
+        self.progress['value'] = result['extracted']
+        if result['cancelled']:
+            self.status_label.config(
+                text=f"Extracción cancelada: {result['extracted']} "
+                     f"fotogramas guardados"
+            )
+            return
 
-                current_frame = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        cached = ""
+        if result['cached']:
+            cached = f" ({result['cached']} desde la caché)"
+        self.status_label.config(
+            text=f"¡Extracción completada! {result['extracted']} "
+                 f"fotogramas guardados{cached}"
+        )
+        messagebox.showinfo(
+            "Éxito",
+            f"Se han extraído {result['extracted']} fotogramas\n"
+            f"Guardados en: {result['output']}")
+
+    def is_extracting(self):
+        """Indica si hay una extracción en curso"""
+        return self.worker is not None and self.worker.is_alive()
+
+    def cancel_extraction(self):
+        """Solicita la cancelación de la extracción en curso"""
+        if self.is_extracting():
+            self.cancel_event.set()
+            self.cancel_button.config(state='disabled')
+            self.status_label.config(text="Cancelando...")
+
+    def on_close(self):
+        """Cierra la ventana cancelando antes la extracción en curso"""
+        if self.is_extracting():
+            self.cancel_event.set()
+            self.worker.join()
+        self.close_preview()
+        self.root.destroy()
+
+
+class TrackWindow:
+    """
+    Ventana con la trayectoria del vuelo para elegir el intervalo de tiempo.
+
+    Clic izquierdo fija el inicio y clic derecho (o Mayús+clic) el fin en el
+    punto más cercano de la trayectoria; los campos de tiempo se actualizan
+    y el tramo elegido se resalta. Solo se dibujan los puntos que se ven a
+    la escala actual (Douglas-Peucker, ver flight_track).
+    """
+
+    def __init__(self, root, track, start_var, end_var):
+        self.track = track
+        self.start_var = start_var
+        self.end_var = end_var
+        self.transform = None
+
+        self.window = tk.Toplevel(root)
+        self.window.title("Trayectoria de vuelo")
+        self.canvas = tk.Canvas(self.window, width=600, height=450,
+                                background='white', highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.info_label = ttk.Label(self.window, text="")
+        self.info_label.pack(fill=tk.X, padx=5, pady=2)
+
+        self.canvas.bind('<Configure>', lambda event: self.redraw())
+        self.canvas.bind('<Button-1>',
+                         lambda event: self.pick(event, self.start_var))
+        self.canvas.bind('<Shift-Button-1>',
+                         lambda event: self.pick(event, self.end_var))
+        self.canvas.bind('<Button-3>',
+                         lambda event: self.pick(event, self.end_var))
+        # Los tiempos escritos a mano también mueven el tramo resaltado
+        self._traces = [
+            (var, var.trace_add('write', lambda *args: self.draw_range()))
+            for var in (start_var, end_var)]
+        self.window.bind('<Destroy>', self._on_destroy)
+
+    def _on_destroy(self, event):
+        if event.widget is self.window:
+            for var, trace in self._traces:
+                var.trace_remove('write', trace)
+
+    def _time(self, var, default):
+        try:
+            return float(var.get())
+        except (tk.TclError, ValueError):
+            return default
 
-                if current_frame > end_frame:
-                    break
+    def redraw(self):
+        """Dibuja la trayectoria completa al tamaño actual del lienzo"""
+        import flight_track
 
-                if (current_frame - start_frame) % interval == 0:
-                    # Guardar fotograma
-                    timestamp = current_frame / self.video_fps
-                    filename = f"frame_{
-                        current_frame:06d}_t{
-                        timestamp:.2f}s.jpg"
-                    filepath = os.path.join(self.output_folder, filename)
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width < 2 or height < 2:
+            return
+        self.transform = flight_track.CanvasTransform(
+            self.track, width, height)
+        indices = self.track.decimate(self.transform.tolerance)
+        self.canvas.delete('all')
+        if len(indices) > 1:
+            self.canvas.create_line(self.transform.coords(indices),
+                                    fill='#999999', width=1, tags='track')
+        self.info_label.config(
+            text=f"{len(self.track)} puntos, {len(indices)} dibujados | "
+                 f"Clic: inicio, clic derecho: fin")
+        self.draw_range()
+
+    def draw_range(self):
+        """Resalta el tramo entre los tiempos de inicio y fin"""
+        if self.transform is None:
+            return
+        self.canvas.delete('range')
+        first = self.track.index_at(self._time(self.start_var, 0.0))
+        last = self.track.index_at(
+            self._time(self.end_var, float(self.track.times[-1])))
+        if last < first:
+            return
+        indices = self.track.decimate(self.transform.tolerance, first, last)
+        if len(indices) > 1:
+            self.canvas.create_line(self.transform.coords(indices),
+                                    fill='#1f6fd1', width=3, tags='range')
+        for index, color in ((first, '#2ca02c'), (last, '#d62728')):
+            x, y = self.transform.coords([index])
+            self.canvas.create_oval(x - 5, y - 5, x + 5, y + 5, fill=color,
+                                    outline='', tags='range')
+
+    def pick(self, event, var):
+        """Fija un tiempo en el punto de la trayectoria más cercano al clic"""
+        if self.transform is None:
+            return
+        index = self.track.nearest(
+            *self.transform.to_track(event.x, event.y))
+        var.set(f"{self.track.times[index]:.2f}")
 
-                    cv2.imwrite(filepath, frame)
 
-                    # Agregar GPS si está disponible
-                    if self.gps_data:
-                        lat = self.gps_data.get('latitude', 0)
-                        lon = self.gps_data.get('longitude', 0)
-                        alt = self.gps_data.get('altitude')
-                        self.add_gps_to_image(filepath, lat, lon, alt)
+class PreviewWindow:
+    """
+    Ventana de vista previa con una barra de tiempo.
 
-                    extracted_count += 1
-                    self.progress['value'] = extracted_count
-                    self.status_label.config(
-                        text=f"Extrayendo: {extracted_count}/"
-                             f"{total_to_extract} fotogramas"
-                    )
-                    self.root.update()
+    Mientras se arrastra la barra se muestra el fotograma clave anterior
+    (un solo fotograma que decodificar) y, al detenerse, el fotograma
+    exacto. La decodificación se hace en otro hilo, con los fotogramas
+    reducidos en una caché en memoria y los vecinos precargados (ver
+    frame_preview). Los botones copian el tiempo actual a los campos de
+    inicio y fin.
+    """
 
-            cap.release()
+    def __init__(self, root, previewer, fps, start_var, end_var):
+        self.root = root
+        self.previewer = previewer
+        self.fps = fps
+        self.start_var = start_var
+        self.end_var = end_var
+        self.index = 0
+        self.shown = None
+        self.image = None
+        self._settle = None
+        self._poll = None
+
+        self.window = tk.Toplevel(root)
+        self.window.title("Vista previa")
+        self.image_label = ttk.Label(self.window, anchor=tk.CENTER)
+        self.image_label.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.scale = ttk.Scale(
+            self.window,
+            from_=0,
+            to=previewer.frame_count - 1,
+            orient=tk.HORIZONTAL,
+            command=self.on_scrub)
+        self.scale.pack(fill=tk.X, padx=5)
+
+        controls = ttk.Frame(self.window)
+        controls.pack(fill=tk.X, padx=5, pady=5)
+        self.time_label = ttk.Label(controls, text="")
+        self.time_label.pack(side=tk.LEFT)
+        ttk.Button(
+            controls,
+            text="Fijar fin",
+            command=lambda: self.set_time(self.end_var)).pack(
+            side=tk.RIGHT, padx=5)
+        ttk.Button(
+            controls,
+            text="Fijar inicio",
+            command=lambda: self.set_time(self.start_var)).pack(
+            side=tk.RIGHT, padx=5)
 
-            self.status_label.config(
-                text=f"¡Extracción completada! {extracted_count} "
-                     f"fotogramas guardados"
-            )
-            messagebox.showinfo(
-                "Éxito",
-                f"Se han extraído {extracted_count} fotogramas\nGuardados en: {
-                    self.output_folder}")
+        self.window.bind('<Destroy>', self._on_destroy)
+        self.show(0, snap=False)
+        self._poll = self.window.after(PREVIEW_POLL_MS, self.poll)
 
-        except Exception as e:
-            messagebox.showerror(
-                "Error",
-                f"Error durante la extracción: {
-                    str(e)}")
-            self.status_label.config(text="Error en la extracción")
+    def _on_destroy(self, event):
+        if event.widget is not self.window:
+            return
+        for job in (self._settle, self._poll):
+            if job is not None:
+                self.window.after_cancel(job)
+        self.previewer.close()
+
+    def on_scrub(self, value):
+        """Muestra el fotograma clave y programa el exacto al detenerse"""
+        self.index = int(float(value))
+        self.show(self.index, snap=True)
+        if self._settle is not None:
+            self.window.after_cancel(self._settle)
+        self._settle = self.window.after(
+            PREVIEW_SETTLE_MS, lambda: self.show(self.index, snap=False))
+
+    def show(self, index, snap):
+        """Pide un fotograma y lo muestra si ya está en la caché"""
+        if not snap:
+            self._settle = None
+        self.shown, image = self.previewer.request(index, snap=snap)
+        if image is not None:
+            self.display(image)
+        self.time_label.config(
+            text=f"Fotograma {self.shown} | {self.shown / self.fps:.2f}s")
+
+    def display(self, image):
+        """Muestra los datos PPM de un fotograma"""
+        # Se guarda la referencia: Tk no conserva la imagen por sí mismo
+        self.image = tk.PhotoImage(data=image)
+        self.image_label.config(image=self.image)
+
+    def poll(self):
+        """Muestra los fotogramas decodificados por el hilo de trabajo"""
+        while True:
+            result = self.previewer.poll()
+            if result is None:
+                break
+            index, image = result
+            if index == self.shown and image is not None:
+                self.display(image)
+        self._poll = self.window.after(PREVIEW_POLL_MS, self.poll)
+
+    def set_time(self, var):
+        """Copia el tiempo del fotograma mostrado a un campo de tiempo"""
+        var.set(f"{self.index / self.fps:.2f}")
 
 
 def main():
     root = tk.Tk()
-    VideoFrameExtractor(root)
+    app = VideoFrameExtractor(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
 
 
@@ -0,0 +1,84 @@
+# -*- mode: python ; coding: utf-8 -*-
+#
+# One-folder build tuned for startup time:
+#   pyinstaller video_frame_extractor_onedir.spec
+#
+# The one-file build unpacks itself into a temporary folder on every launch
+# and UPX makes every DLL pay a decompression on load. Here the files are
+# installed once in dist/VideoFrameExtractor/ and loaded in place, without
+# UPX. Two executables share the same folder: VideoFrameExtractor (GUI,
+# windowed) and vfe (console, for the headless commands of extractor_main).
+
+block_cipher = None
+
+# Tools started by name through extractor_main.COMMANDS
+HEADLESS_MODULES = ['srt_tag', 'srt_concat', 'aoi', 'ingest_daemon',
+                    'job_server', 'shard_extract', 'benchmark']
+
+a = Analysis(
+    ['extractor_main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=HEADLESS_MODULES,
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    # Pulled in by optional imports of the dependencies, never used here
+    excludes=['matplotlib', 'scipy', 'pandas', 'IPython', 'pytest'],
+    win_no_prefer_redirects=False,
+    win_private_assemblies=False,
+    cipher=block_cipher,
+    noarchive=False,
+)
+pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
+
+gui = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='VideoFrameExtractor',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=None,
+)
+
+cli = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='vfe',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=None,
+)
+
+coll = COLLECT(
+    gui,
+    cli,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='VideoFrameExtractor',
+)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Video Probe - Shared video metadata probe with a persistent cache
+
+Returns frame rate, frame count, duration, resolution, codec and keyframe
+positions of a video, using ffprobe when it is installed and OpenCV
+otherwise. Results are stored in a SQLite cache keyed by the absolute path,
+size and modification time of the file, so reopening a clip library or
+rerunning a tool does not probe the same files again.
+
+The cache lives in ``~/.cache/video_to_photo_gps/probe.sqlite``; set the
+``VIDEO_PROBE_CACHE`` environment variable to use another file.
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+import subprocess
+
+CACHE_ENV = 'VIDEO_PROBE_CACHE'
+# Bump when the stored fields change so old entries are probed again
+CACHE_VERSION = 1
+
+
+def default_cache_path():
+    """Return the cache file path (honours VIDEO_PROBE_CACHE)."""
+    if os.environ.get(CACHE_ENV):
+        return os.environ[CACHE_ENV]
+    return os.path.join(os.path.expanduser('~'), '.cache',
+                        'video_to_photo_gps', 'probe.sqlite')
+
+
+class ProbeCache:
+    """
+    SQLite store of probe results.
+
+    Every call opens its own short-lived connection, so one cache can be
+    shared by several threads and processes.
+
+    Args:
+        path: Cache file (default: default_cache_path())
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_cache_path()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS probes ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                'version INTEGER, data TEXT)')
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A connection used as a context manager only commits; close it too
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, video_path):
+        """
+        Return the cached probe of a file if it is still current.
+
+        Args:
+            video_path: Path to video file
+
+        Returns:
+            Probe dict, or None if missing or stale
+        """
+        key, size, mtime_ns = _file_key(video_path)
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT size, mtime_ns, version, data FROM probes '
+                'WHERE path = ?', (key,)).fetchone()
+        if row is None or tuple(row[:3]) != (size, mtime_ns, CACHE_VERSION):
+            return None
+        return json.loads(row[3])
+
+    def put(self, video_path, info):
+        """
+        Store the probe of a file.
+
+        Args:
+            video_path: Path to video file
+            info: Probe dict as returned by probe_uncached
+        """
+        key, size, mtime_ns = _file_key(video_path)
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?)',
+                (key, size, mtime_ns, CACHE_VERSION, json.dumps(info)))
+
+
+def _file_key(video_path):
+    stat = os.stat(video_path)
+    return os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns
+
+
+def ffprobe_packets(video_path):
+    """
+    Read the timestamps and keyframe flags of all video packets.
+
+    This only parses the container, it does not decode any frame.
+
+    Args:
+        video_path: Path to video file
+
+    Returns:
+        (times, keyframes) NumPy arrays in display order, with times in
+        seconds relative to the first frame
+
+    Raises:
+        FileNotFoundError: If ffprobe is not installed
+        subprocess.CalledProcessError: If ffprobe fails
+    """
+    import numpy as np
+
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0',
+         video_path],
+        capture_output=True, text=True, check=True)
+    times = []
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or parts[0] in ('', 'N/A'):
+            continue
+        times.append(float(parts[0]))
+        keyframes.append('K' in parts[1])
+    # Packets come in decode order; sort into display order
+    order = np.argsort(times, kind='stable')
+    times = np.asarray(times, dtype=np.float64)[order]
+    if len(times):
+        times -= times[0]
+    return times, np.asarray(keyframes, dtype=bool)[order]
+
+
+def _parse_rate(rate):
+    num, _, den = rate.partition('/')
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _probe_with_ffprobe(video_path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries',
+         'stream=codec_name,width,height,avg_frame_rate,r_frame_rate'
+         ':format=duration',
+         '-of', 'json', video_path],
+        capture_output=True, text=True, check=True)
+    data = json.loads(result.stdout)
+    if not data.get('streams'):
+        raise ValueError(f"No video stream in {video_path}")
+    stream = data['streams'][0]
+
+    times, keyframes = ffprobe_packets(video_path)
+    fps = _parse_rate(stream.get('avg_frame_rate', '0/0')) or \
+        _parse_rate(stream.get('r_frame_rate', '0/0'))
+    duration = float(data.get('format', {}).get('duration') or 0)
+    if not duration and fps > 0:
+        duration = len(times) / fps
+    return {
+        'fps': fps,
+        'frame_count': len(times),
+        'duration': duration,
+        'width': int(stream.get('width', 0)),
+        'height': int(stream.get('height', 0)),
+        'codec': stream.get('codec_name', ''),
+        'keyframes': [int(i) for i, key in enumerate(keyframes) if key],
+    }
+
+
+def _probe_with_opencv(video_path):
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        codec = ''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4))
+        return {
+            'fps': fps,
+            'frame_count': frame_count,
+            'duration': frame_count / fps if fps > 0 else 0,
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'codec': codec.strip('\x00 ').lower(),
+            # OpenCV cannot list keyframes without decoding the whole file
+            'keyframes': [],
+        }
+    finally:
+        cap.release()
+
+
+def probe_uncached(video_path):
+    """
+    Probe a video without using the cache.
+
+    Args:
+        video_path: Path to video file
+
+    Returns:
+        Dict with ``fps``, ``frame_count``, ``duration`` (seconds),
+        ``width``, ``height``, ``codec`` and ``keyframes`` (0-based frame
+        indices; empty if they could not be determined)
+
+    Raises:
+        ValueError: If the file cannot be opened as a video
+    """
+    try:
+        return _probe_with_ffprobe(video_path)
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return _probe_with_opencv(video_path)
+
+
+def probe_video(video_path, cache=None):
+    """
+    Probe a video, reusing the cached result when the file is unchanged.
+
+    Args:
+        video_path: Path to video file
+        cache: ProbeCache instance, None for the default cache, or False to
+            bypass caching
+
+    Returns:
+        Probe dict (see probe_uncached)
+    """
+    if cache is False:
+        return probe_uncached(video_path)
+    try:
+        cache = cache or ProbeCache()
+        info = cache.get(video_path)
+    except (OSError, sqlite3.Error):
+        # Unwritable home or locked database: probing still works
+        return probe_uncached(video_path)
+    if info is None:
+        info = probe_uncached(video_path)
+        try:
+            cache.put(video_path, info)
+        except (OSError, sqlite3.Error):
+            pass
+    return info